@@ -10,15 +10,19 @@ from django.http.request import HttpRequest, QueryDict
 from django.utils.functional import cached_property
 from django_client_framework import exceptions as e
 from django_client_framework import permissions as p
+from django_client_framework.permissions import rls
 from django_client_framework.models.abstract import Searchable
 from ipromise import overrides
 from rest_framework.exceptions import MethodNotAllowed, NotFound
 from rest_framework.generics import GenericAPIView, get_object_or_404
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.conf import settings
 
+from .count_cache import CachedCountPaginator, make_count_key
+
 LOG = getLogger(__name__)
 
 
@@ -40,6 +44,16 @@ class ApiPagination(PageNumberPagination):
     page_size_query_param = "_limit"
     page_size = 50
     max_page_size = 1000
+    count_key = None
+
+    def django_paginator_class(self, queryset, page_size):
+        return CachedCountPaginator(queryset, page_size, count_key=self.count_key)
+
+    @overrides(PageNumberPagination)
+    def paginate_queryset(self, queryset, request, view=None):
+        if view is not None:
+            self.count_key = make_count_key(view.user_object, queryset, request)
+        return super().paginate_queryset(queryset, request, view=view)
 
     @overrides(PageNumberPagination)
     def get_paginated_response(self, data):
@@ -48,6 +62,7 @@ class ApiPagination(PageNumberPagination):
                 "page": self.page.number,
                 "limit": self.get_page_size(self.request),
                 "total": self.page.paginator.count,
+                "approximate": self.page.paginator.approximate,
                 "previous": self.get_previous_link(),
                 "next": self.get_next_link(),
                 "objects": data,
@@ -74,6 +89,13 @@ class BaseModelAPI(GenericAPIView):
         except APIPermissionDenied as error:
             self.__handle_permission_denied(error)
 
+    @overrides(APIView)
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # the policies only filter reads, and would hide the rows a write matches
+        if request.method in SAFE_METHODS and rls.get_rls_models():
+            rls.set_principal(self.user_object)
+
     def get_request_data(self, request: HttpRequest):
         """
         Excludes special keys and returns only the instance related data.
@@ -0,0 +1,126 @@
+"""
+Pagination totals of the collection APIs.
+
+Counting a permission-filtered collection often costs more than fetching a page
+of it. When the shared permission cache is enabled, see
+permissions.shared_cache, and settings.DCF_COUNT_CACHE_TIMEOUT is a positive
+number of seconds, totals are cached for that long. Keys embed the permission
+generations of the requesting user on the model, so totals are recounted as soon
+as permissions change, along with the request path and the filter parameters.
+Objects created or deleted without touching permissions are only reflected once
+the entry expires, which is why the timeout should stay short.
+
+When settings.DCF_APPROXIMATE_COUNT_THRESHOLD is set and a collection is not
+filtered at all, neither by parameters nor by permissions, including row-level
+security policies, see permissions.rls, PostgreSQL's estimate
+of the table's rows is used instead whenever it reaches the threshold, and the
+response says so with "approximate": true.
+"""
+
+import hashlib
+import json
+from logging import getLogger
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django_client_framework.permissions import perm_cache, rls, shared_cache
+from django_client_framework.permissions.site_permission import (
+    get_permission_filter_backend,
+)
+
+LOG = getLogger(__name__)
+
+KEY_PREFIX = "dcf:count"
+
+# parameters that don't change the total
+IGNORED_PARAMS = ("_page", "_limit", "_order_by")
+
+
+def get_timeout():
+    return getattr(settings, "DCF_COUNT_CACHE_TIMEOUT", 0)
+
+
+def get_approximate_threshold():
+    return getattr(settings, "DCF_APPROXIMATE_COUNT_THRESHOLD", None)
+
+
+def make_count_key(user_or_group, queryset, request):
+    """
+    Returns the key of the total of queryset as listed by request for
+    user_or_group, or None if counts are not cached.
+    """
+    if shared_cache.get_cache() is None or not get_timeout():
+        return None
+    params = sorted(
+        (key, request.query_params.getlist(key))
+        for key in request.query_params
+        if key not in IGNORED_PARAMS
+    )
+    digest = hashlib.sha1(json.dumps([request.path, params]).encode()).hexdigest()
+    model_label = queryset.model._meta.label_lower
+    principal_key = perm_cache.principal_key(user_or_group)
+    generations = shared_cache.get_generations(model_label, principal_key)
+    label, pk = principal_key
+    return f"{KEY_PREFIX}:{generations}:{label}:{pk}:{model_label}:{digest}"
+
+
+def estimate_count(queryset):
+    """
+    Returns PostgreSQL's estimate of the rows of queryset, or None if queryset is
+    filtered or the table was never analyzed. Querysets of models using the rls
+    backend are filtered by the database, so that their estimate would count rows
+    the user cannot see.
+    """
+    query = queryset.query
+    if (
+        query.where
+        or query.distinct
+        or query.combinator
+        or query.low_mark
+        or query.high_mark is not None
+    ):
+        return None
+    if get_permission_filter_backend(queryset.model) == "rls" or rls.has_principal(
+        queryset.db
+    ):
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [connection.ops.quote_name(queryset.model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class CachedCountPaginator(Paginator):
+    """A Paginator whose count is cached under count_key, or estimated."""
+
+    def __init__(self, object_list, per_page, count_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.approximate = False
+
+    @cached_property
+    def count(self):
+        threshold = get_approximate_threshold()
+        if threshold is not None:
+            estimate = estimate_count(self.object_list)
+            if estimate is not None and estimate >= threshold:
+                self.approximate = True
+                return estimate
+        if self.count_key is None:
+            return Paginator.count.func(self)
+        cache = shared_cache.get_cache()
+        count = cache.get(self.count_key)
+        if count is None:
+            count = Paginator.count.func(self)
+            cache.set(self.count_key, count, timeout=get_timeout())
+        return count
@@ -3,6 +3,7 @@ from logging import getLogger
 from django.db.models.fields.related import ForeignKey
 from django_client_framework import exceptions as e
 from django_client_framework import permissions as p
+from django_client_framework.permissions import perm_cache
 from ipromise import overrides
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -25,7 +26,8 @@ class ModelCollectionAPI(BaseModelAPI):
     def get(self, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
         page = self.paginator.paginate_queryset(queryset, self.request, view=self)
-        return self.paginator.get_paginated_response([obj.json() for obj in page])
+        perm_cache.defer_object_perms(self.user_object, page)
+        return self.paginator.get_paginated_response(self.model.serialize_many(page))
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(
@@ -33,14 +35,22 @@ class ModelCollectionAPI(BaseModelAPI):
             context={"request": request},
         )
         serializer.is_valid(raise_exception=True)
-        # make sure user write permission to related fields
+        # make sure user write permission to related fields, related objects are
+        # checked in batches of the same model and reverse field
+        related_objects = {}
         for field_name, field_instance in serializer.validated_data.items():
             model_field = self.get_model_field(field_name)
             if model_field and isinstance(model_field, ForeignKey) and field_instance:
                 related_name = model_field.related_query_name()
-                if not p.has_perms_shortcut(
-                    self.user_object, field_instance, "w", field_name=related_name
-                ):
+                related_objects.setdefault(
+                    (model_field.related_model, related_name), []
+                ).append(field_instance)
+        for (_model, related_name), instances in related_objects.items():
+            has_write = p.has_perms_many(
+                self.user_object, instances, "w", field_name=related_name
+            )
+            for field_instance in instances:
+                if not has_write[field_instance.pk]:
                     raise APIPermissionDenied(field_instance, "w", field=related_name)
 
         instance = serializer.save()
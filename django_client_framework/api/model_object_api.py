@@ -28,6 +28,8 @@ class ModelObjectAPI(BaseModelAPI):
     def get(self, request, *args, **kwargs):
         if not p.has_perms_shortcut(self.user_object, self.model_object, "r"):
             raise APIPermissionDenied(self.model_object, "r")
+        if self.model.caches_object_serializations():
+            return Response(self.model_object.serialize())
         serializer = self.get_serializer(
             self.model_object,
             context={"request": request},
@@ -45,41 +47,48 @@ class ModelObjectAPI(BaseModelAPI):
         if not serializer.is_valid(raise_exception=True):
             raise e.ValidationError("Validation Error")
         # User can have either write permission to model, object, or to a field
-        # check permission for related objects
-        for field_name, field_val in serializer.validated_data.items():
+        fields = {}
+        for field_name in serializer.validated_data:
             field = self.get_model_field(field_name, None)
-            if not field:
-                continue
-            if not p.has_perms_shortcut(
-                self.user_object, self.model_object, "w", field_name
-            ):
+            if field:
+                fields[field_name] = field
+        # the permission matrix of the fields and related objects being changed is
+        # computed upfront, with a number of queries that doesn't grow with the
+        # number of fields
+        writable = p.has_field_perms(
+            self.user_object, self.model_object, "w", fields.keys()
+        )
+        for field_name in fields:
+            if not writable[field_name]:
                 raise APIPermissionDenied(self.model_object, "w", field=field_name)
+        # check permission for related objects
+        related_objs = {}
+        for field_name, field in fields.items():
             if isinstance(field, ForeignKey):
                 old_related_obj = getattr(self.model_object, field_name, None)
-                new_related_obj = field_val
+                new_related_obj = serializer.validated_data[field_name]
+                key = (field.related_model, field.related_query_name())
                 for related_obj in filter(
                     bool, [old_related_obj, new_related_obj]
                 ):  # remove None
-                    if not p.has_perms_shortcut(
-                        self.user_object,
-                        related_obj,
-                        "w",
-                        field_name=field.related_query_name(),
-                    ):
-                        if p.has_perms_shortcut(
-                            self.user_object,
-                            related_obj,
-                            "r",
-                            field_name=field.related_query_name(),
-                        ):
-                            raise e.PermissionDenied(
-                                f"To change related field {field_name},"
-                                f" you need write permission on object {related_obj.pk}.",
-                            )
-                        else:
-                            raise e.NotFound(
-                                f"Related object {related_obj.pk} does not exist."
-                            )
+                    related_objs.setdefault(key, []).append((field_name, related_obj))
+        for (related_model, related_name), pairs in related_objs.items():
+            can_write = p.has_perms_many(
+                self.user_object, [obj for _, obj in pairs], "w", related_name
+            )
+            denied = [(name, obj) for name, obj in pairs if not can_write[obj.pk]]
+            if not denied:
+                continue
+            field_name, related_obj = denied[0]
+            if p.has_perms_shortcut(
+                self.user_object, related_obj, "r", field_name=related_name
+            ):
+                raise e.PermissionDenied(
+                    f"To change related field {field_name},"
+                    f" you need write permission on object {related_obj.pk}.",
+                )
+            else:
+                raise e.NotFound(f"Related object {related_obj.pk} does not exist.")
         # when permited
         serializer.save()
 
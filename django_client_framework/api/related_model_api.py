@@ -10,6 +10,7 @@ from django.http.response import JsonResponse
 from django.utils.functional import cached_property
 from django_client_framework import exceptions as e
 from django_client_framework import permissions as p
+from django_client_framework.permissions import perm_cache
 from ipromise import overrides
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
@@ -81,12 +82,13 @@ class RelatedModelAPI(BaseModelAPI):
             return self.field_val.all()
 
     def __assert_write_perm_for_rel_objects(self, queryset=None):
-        find_has_write = p.filter_queryset_by_perms_shortcut(
-            "w", self.user_object, queryset, self.reverse_field_name
+        instances = list(queryset)
+        has_write = p.has_perms_many(
+            self.user_object, instances, "w", self.reverse_field_name
         )
-        find_no_write = queryset.difference(find_has_write).first()
-        if find_no_write:
-            raise APIPermissionDenied(find_no_write, "w")
+        for instance in instances:
+            if not has_write[instance.pk]:
+                raise APIPermissionDenied(instance, "w")
 
     def __return_get_result_if_permitted(self, request, *args, **kwargs):
         if p.has_perms_shortcut(
@@ -113,6 +115,8 @@ class RelatedModelAPI(BaseModelAPI):
                 self.__assert_object_field_perm(
                     self.field_val, "r", self.field.related_query_name()
                 )
+                if self.field_model.caches_object_serializations():
+                    return Response(self.field_val.serialize())
                 serializer = self.get_serializer(
                     self.field_val,
                     context={"request": self.request},
@@ -123,8 +127,9 @@ class RelatedModelAPI(BaseModelAPI):
         else:
             queryset = self.filter_queryset(self.get_queryset())
             page = self.paginator.paginate_queryset(queryset, self.request, view=self)
+            perm_cache.defer_object_perms(self.user_object, page)
             return self.paginator.get_paginated_response(
-                [obj.cached_serialized_data for obj in page]
+                self.field_model.serialize_many(page)
             )
 
     def post(self, request, *args, **kwargs):
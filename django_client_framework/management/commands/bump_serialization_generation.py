@@ -0,0 +1,43 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django_client_framework.models.abstract import Serializable
+
+
+class Command(BaseCommand):
+    help = (
+        "Invalidates every cached serialization of the models, for example after"
+        " QuerySet.update() or a migration running raw SQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models",
+            nargs="*",
+            metavar="MODEL",
+            help="Labels of the models to invalidate, e.g. myapp.product."
+            " Defaults to every serializable model.",
+        )
+
+    def handle(self, *args, models, **options):
+        if models:
+            selected = []
+            for label in models:
+                try:
+                    model = apps.get_model(label)
+                except (LookupError, ValueError) as error:
+                    raise CommandError(error)
+                if not issubclass(model, Serializable):
+                    raise CommandError(f"{label} is not serializable")
+                selected.append(model)
+        else:
+            selected = [
+                model for model in apps.get_models() if issubclass(model, Serializable)
+            ]
+        for model in selected:
+            model.bump_serialization_generation()
+            self.stdout.write(f"{model._meta.label_lower}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"The cached serializations of {len(selected)} models are invalidated."
+            )
+        )
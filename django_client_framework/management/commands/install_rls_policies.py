@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django_client_framework.api import BaseModelAPI
+from django_client_framework.permissions.rls import (
+    drop_policies,
+    get_rls_models,
+    install_policies,
+)
+from django_client_framework.permissions.rules import get_permission_rules
+
+
+class Command(BaseCommand):
+    help = (
+        "Installs or refreshes the PostgreSQL row-level security policies of the"
+        " registered models using the rls permission filter backend, and removes"
+        " them from the other registered models."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Remove the policies from every registered model instead.",
+        )
+
+    def handle(self, *args, drop, **options):
+        if drop:
+            dropped = drop_policies(BaseModelAPI.models)
+            for model in dropped:
+                self.stdout.write(f"dropped policy of {model._meta.label_lower}")
+            self.stdout.write(self.style.SUCCESS("Policies have been removed."))
+            return
+
+        models = get_rls_models()
+        for model in models:
+            if get_permission_rules(model):
+                raise CommandError(
+                    f"{model._meta.label_lower} declares permission rules, which"
+                    " row-level security policies do not support."
+                )
+        installed = install_policies(models)
+        if len(installed) != len(models):
+            raise CommandError("Row-level security policies require PostgreSQL.")
+        for model in installed:
+            self.stdout.write(f"installed policy of {model._meta.label_lower}")
+        for model in drop_policies(
+            [model for model in BaseModelAPI.models if model not in models]
+        ):
+            self.stdout.write(f"dropped policy of {model._meta.label_lower}")
+        self.stdout.write(self.style.SUCCESS("Policies have been installed."))
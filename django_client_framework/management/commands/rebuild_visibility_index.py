@@ -0,0 +1,57 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django_client_framework.permissions.visibility_index import (
+    check_visibility_index,
+    get_indexed_models,
+    rebuild_visibility_index,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recreates the materialized visibility index from the object permissions,"
+        " or checks that it is consistent with them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models",
+            nargs="*",
+            metavar="MODEL",
+            help="Labels of the models to process, e.g. myapp.store."
+            " Defaults to every model using the index filter backend.",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report entries that differ from the object permissions.",
+        )
+
+    def handle(self, *args, models, check, **options):
+        indexed = get_indexed_models()
+        selected = None
+        if models:
+            selected = []
+            for label in models:
+                try:
+                    model = apps.get_model(label)
+                except (LookupError, ValueError) as error:
+                    raise CommandError(error)
+                if model not in indexed:
+                    raise CommandError(f"{label} does not use the visibility index")
+                selected.append(model)
+
+        if check:
+            mismatches = check_visibility_index(selected)
+            for mismatch in mismatches:
+                self.stdout.write(str(mismatch))
+            if mismatches:
+                raise CommandError(
+                    f"The visibility index has {len(mismatches)} inconsistent entries."
+                )
+            self.stdout.write(self.style.SUCCESS("The visibility index is consistent."))
+        else:
+            rebuild_visibility_index(selected)
+            self.stdout.write(
+                self.style.SUCCESS("The visibility index has been rebuilt.")
+            )
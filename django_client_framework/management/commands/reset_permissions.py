@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django_client_framework.permissions.rebuild import rebuild_permissions
+
+
+class Command(BaseCommand):
+    help = "Clears and recreates the permissions of every AccessControlled instance."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of instances written and committed together.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Number of worker processes rebuilding chunks of a model.",
+        )
+        parser.add_argument(
+            "--resume",
+            metavar="MODEL:PK",
+            help="Resume from a checkpoint printed by a previous run,"
+            " e.g. myapp.store:1000. Permissions are not cleared.",
+        )
+
+    def handle(self, *args, chunk_size, processes, resume, **options):
+        resume_from = None
+        if resume:
+            label, sep, pk = resume.rpartition(":")
+            if not sep or not label:
+                raise CommandError(f"--resume expects MODEL:PK, got {resume!r}")
+            resume_from = (label, pk)
+
+        def progress(progress):
+            self.stdout.write(str(progress))
+
+        try:
+            rebuild_permissions(
+                chunk_size=chunk_size,
+                processes=processes,
+                resume_from=resume_from,
+                progress=progress,
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS("Permissions have been reset."))
@@ -0,0 +1,90 @@
+# Generated by Django 3.2.25 on 2026-10-16 23:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("django_client_framework", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VisibilityEntry",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("object_pk", models.CharField(max_length=255)),
+                (
+                    "field_name",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                ("perms", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "content_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+                (
+                    "group",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="auth.group",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="visibilityentry",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("user__isnull", False)),
+                fields=("content_type", "object_pk", "field_name", "user"),
+                name="dcf_visibility_unique_user",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="visibilityentry",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("group__isnull", False)),
+                fields=("content_type", "object_pk", "field_name", "group"),
+                name="dcf_visibility_unique_group",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="visibilityentry",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("group__isnull", True), ("user__isnull", False)),
+                    models.Q(("group__isnull", False), ("user__isnull", True)),
+                    _connector="OR",
+                ),
+                name="dcf_visibility_one_principal",
+            ),
+        ),
+    ]
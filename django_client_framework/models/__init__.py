@@ -4,6 +4,7 @@ from django.db.models import *
 
 from .abstract import AccessControlled, Serializable, Searchable
 from .search_feature import SearchFeature
+from .visibility_entry import VisibilityEntry
 
 from .fields import PriceField, UniqueForeignKey
 from .lookup import *
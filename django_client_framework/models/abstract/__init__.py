@@ -1,6 +1,7 @@
 from .access_controlled import *
 from .searchable import *
 from .serializable import *
+from . import serialization_dependencies
 
 
 def check_integrity():
@@ -1,9 +1,19 @@
 from logging import getLogger
 
+from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericRelation
+from django.contrib.contenttypes.models import ContentType
 from django.db import models as m
-from guardian.models import UserObjectPermission
+from guardian.models import GroupObjectPermission, UserObjectPermission
 
+from ...permissions import (
+    group_snapshot,
+    perm_cache,
+    perm_collector,
+    shared_cache,
+    visibility_index,
+)
+from ...permissions.site_permission import bulk_assign_grants
 
 LOG = getLogger(__name__)
 
@@ -17,14 +27,113 @@ class AccessControlled(m.Model):
     )
 
     class PermissionManager:
+        # When True, reset_perms() computes the difference between the permissions
+        # declared by add_perms() and the existing rows, and only writes the
+        # difference. add_perms() must then only grant permissions through
+        # add_perms_shortcut().
+        incremental = False
+        # PermissionRule declarations, evaluated when checking and filtering by
+        # permissions instead of being written as rows, see permissions.rules.
+        rules = []
+
         def add_perms(self, instance):
             raise NotImplementedError()
 
         def reset_perms(self, instance):
+            if self.incremental:
+                return self.sync_perms(instance)
             LOG.debug(f"resetting permission for {instance}")
             instance.userobjectpermissions.all().delete()
+            visibility_index.forget_users(instance._meta.model, [instance.pk])
+            perm_cache.invalidate()
+            shared_cache.bump_model(instance._meta.label_lower)
             self.add_perms(instance)
 
+        def sync_perms(self, instance):
+            """
+            Brings the object permissions of instance in line with add_perms(), using
+            one bulk insert and one delete at most.
+            """
+            with perm_collector.collect_perms() as grants:
+                self.add_perms(instance)
+
+            content_type = ContentType.objects.get_for_model(instance)
+            User = get_user_model()
+            desired_user_perms = set()
+            desired_group_perms = set()
+            snapshotted_group_ids = set()
+            # grants on other objects, querysets and models
+            other_grants = []
+            for grant in grants:
+                if (
+                    isinstance(grant.target, m.Model)
+                    and grant.target._meta.concrete_model
+                    is instance._meta.concrete_model
+                    and grant.target.pk == instance.pk
+                ):
+                    if isinstance(grant.user_or_group, User):
+                        desired_user_perms.add(
+                            (grant.user_or_group.pk, grant.permission.pk)
+                        )
+                    else:
+                        desired_group_perms.add(
+                            (grant.user_or_group.pk, grant.permission.pk)
+                        )
+                        if group_snapshot.is_snapshotted(grant.user_or_group):
+                            snapshotted_group_ids.add(grant.user_or_group.pk)
+                else:
+                    other_grants.append(grant)
+            if other_grants:
+                # also updates the visibility index and the caches of their models
+                bulk_assign_grants(other_grants)
+
+            existing_user_perms = set(
+                instance.userobjectpermissions.values_list("user_id", "permission_id")
+            )
+            existing_group_perms = set(
+                GroupObjectPermission.objects.filter(
+                    content_type=content_type, object_pk=str(instance.pk)
+                ).values_list("group_id", "permission_id")
+            )
+            to_delete = existing_user_perms - desired_user_perms
+            to_add_users = desired_user_perms - existing_user_perms
+            # like reset_perms(), group permissions are only ever added
+            to_add_groups = desired_group_perms - existing_group_perms
+
+            if to_delete:
+                condition = m.Q()
+                for user_id, permission_id in to_delete:
+                    condition |= m.Q(user_id=user_id, permission_id=permission_id)
+                instance.userobjectpermissions.filter(condition).delete()
+            UserObjectPermission.objects.bulk_create(
+                UserObjectPermission(
+                    user_id=user_id,
+                    permission_id=permission_id,
+                    content_type=content_type,
+                    object_pk=str(instance.pk),
+                )
+                for user_id, permission_id in to_add_users
+            )
+            GroupObjectPermission.objects.bulk_create(
+                GroupObjectPermission(
+                    group_id=group_id,
+                    permission_id=permission_id,
+                    content_type=content_type,
+                    object_pk=str(instance.pk),
+                )
+                for group_id, permission_id in to_add_groups
+            )
+            LOG.debug(
+                f"synced permissions for {instance}: {len(to_delete)} deleted,"
+                f" {len(to_add_users) + len(to_add_groups)} added"
+            )
+            visibility_index.refresh(instance._meta.model, [instance.pk])
+            perm_cache.invalidate()
+            # bulk_create() sends no post_save to invalidate the snapshots
+            if any(group_id in snapshotted_group_ids for group_id, _ in to_add_groups):
+                group_snapshot.invalidate()
+            shared_cache.bump_model(instance._meta.label_lower)
+
     @classmethod
     def get_permissionmanager_class(cls):
         """
@@ -1,16 +1,345 @@
+import hashlib
+from collections import Counter
 from logging import getLogger
+from math import inf, log
+from random import random
+from threading import Event, Lock
+from time import monotonic, perf_counter, sleep, time, time_ns
+from typing import NamedTuple
 
 from django.conf import settings
 from django.core.cache import cache
 from django.db import models as m
+from django.db import transaction
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.utils.functional import cached_property
 
 LOG = getLogger(__name__)
 
+# serialization cache policies, see Serializable.serialization_cache_policy
+SERIALIZATION_CACHE_OFF = "off"
+SERIALIZATION_CACHE_PER_OBJECT = "object"
+SERIALIZATION_CACHE_PAGE = "page"
+SERIALIZATION_CACHE_POLICIES = (
+    SERIALIZATION_CACHE_OFF,
+    SERIALIZATION_CACHE_PER_OBJECT,
+    SERIALIZATION_CACHE_PAGE,
+)
+
+_stats_lock = Lock()
+# (model label, "hits" or "misses") -> count
+_stats = Counter()
+
+
+def count_serialization_cache_access(model, hits, misses):
+    with _stats_lock:
+        _stats[(model._meta.label_lower, "hits")] += hits
+        _stats[(model._meta.label_lower, "misses")] += misses
+
+
+def get_serialization_cache_stats():
+    """Returns {model label: {"hits": int, "misses": int}} since the last reset."""
+    with _stats_lock:
+        stats = {}
+        for (label, kind), count in _stats.items():
+            stats.setdefault(label, {"hits": 0, "misses": 0})[kind] = count
+        return stats
+
+
+def reset_serialization_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# model -> hash of the fields of its serializer
+_layout_hashes = {}
+
+
+def describe_serializer_fields(serializer):
+    """Returns the names, types and sources of the fields of serializer, nested."""
+    serializer = getattr(serializer, "child", serializer)
+    fields = getattr(serializer, "fields", None)
+    if fields is None:
+        return type(serializer).__qualname__
+    return [
+        (
+            name,
+            f"{type(field).__module__}.{type(field).__qualname__}",
+            field.source,
+            describe_serializer_fields(field),
+        )
+        for name, field in sorted(fields.items())
+    ]
+
+
+def get_serializer_layout_hash(model):
+    """
+    Returns a short hash of the fields of model.serializer_class(), so that the
+    serializations cached by a previous version of the code are never read. It is
+    computed once per process.
+    """
+    if model not in _layout_hashes:
+        serializer_class = model.serializer_class()
+        try:
+            layout = describe_serializer_fields(serializer_class())
+        except Exception:
+            # serializers delegating to other serializers per instance have no
+            # fields on their own
+            LOG.debug(f"cannot describe the fields of {serializer_class}")
+            layout = None
+        description = repr(
+            (serializer_class.__module__, serializer_class.__qualname__, layout)
+        )
+        _layout_hashes[model] = hashlib.sha1(description.encode()).hexdigest()[:8]
+    return _layout_hashes[model]
+
+
+def get_serialization_generation_key(model):
+    return f"serialization_generation_{model._meta.label_lower}"
+
+
+def get_serialization_generation(model):
+    key = get_serialization_generation_key(model)
+    generation = cache.get(key)
+    if generation is None:
+        # generations start from the clock, so that evicting the counter never
+        # brings back the serializations cached under an older generation
+        cache.add(key, time_ns(), timeout=None)
+        generation = cache.get(key, 0)
+    return generation
+
+
+def _incr_generation(model):
+    key = get_serialization_generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, time_ns(), timeout=None):
+            cache.incr(key)
+
+
+def bump_serialization_generation(model):
+    """
+    Invalidates every cached serialization of model, like shared_cache.bump(): now,
+    and again after the current transaction commits.
+    """
+    LOG.debug(f"bump the serialization generation of {model}")
+    _incr_generation(model)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _incr_generation(model))
+
+
+class CachedSerialization(NamedTuple):
+    data: dict
+    # time() when the entry expires
+    expiry: float
+    # seconds it took to serialize
+    delta: float
+
+    def is_due(self, beta):
+        """
+        Returns True if the entry should be refreshed before it expires, with a
+        probability rising as it gets closer to expiry and the longer it took to
+        serialize, see "Optimal Probabilistic Cache Stampede Prevention" (Vattani
+        et al.). beta 0 never refreshes early.
+        """
+        return (
+            beta > 0 and time() - self.delta * beta * log(1 - random()) >= self.expiry
+        )
+
+
+def make_cached_serialization(data, delta, timeout):
+    return CachedSerialization(
+        data, inf if timeout is None else time() + timeout, delta
+    )
+
+
+def get_early_refresh_beta():
+    return getattr(settings, "DCF_SERIALIZATION_EARLY_REFRESH_BETA", 0)
+
+
+def get_lock_timeout():
+    return getattr(settings, "DCF_SERIALIZATION_LOCK_TIMEOUT", 10)
+
+
+def get_lock_wait():
+    return getattr(settings, "DCF_SERIALIZATION_LOCK_WAIT", 1)
+
+
+LOCK_POLL_INTERVAL = 0.05
+
+
+class _Flight:
+    def __init__(self):
+        self.done = Event()
+        self.data = None
+        self.failed = False
+
+
+_flights_lock = Lock()
+# cache key -> _Flight of the thread serializing it
+_flights = {}
+
+
+def serialize_once(key, serialize, timeout, stale=None):
+    """
+    Returns serialize() and caches it under key. A single thread per process, and
+    a single process while the cache lock of key lasts, serializes it at a time.
+    The others return stale if given, or wait up to settings.DCF_SERIALIZATION_LOCK_WAIT
+    seconds for the result before serializing on their own.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leading = flight is None
+        if leading:
+            flight = _flights[key] = _Flight()
+    if not leading:
+        if stale is not None:
+            return stale.data
+        if flight.done.wait(get_lock_wait()) and not flight.failed:
+            return flight.data
+        return serialize()
+    try:
+        flight.data = _serialize_locked(key, serialize, timeout, stale)
+        return flight.data
+    except BaseException:
+        flight.failed = True
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+def _serialize_locked(key, serialize, timeout, stale):
+    lock_key = f"{key}_lock"
+    if not cache.add(lock_key, 1, timeout=get_lock_timeout()):
+        if stale is not None:
+            return stale.data
+        # another process is serializing it
+        deadline = monotonic() + get_lock_wait()
+        while monotonic() < deadline:
+            sleep(LOCK_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry.data
+        # the holder of the lock caches it
+        return serialize()
+    try:
+        start = perf_counter()
+        data = serialize()
+        entry = make_cached_serialization(data, perf_counter() - start, timeout)
+        cache.set(key, entry, timeout=timeout)
+        return data
+    finally:
+        cache.delete(lock_key)
+
+
+def _serialize_instance(instance):
+    return instance.serializer_class()(instance=instance).data
+
+
+def serialize_many_once(instances, stale):
+    """
+    Returns {key: serialization} for instances, a {key: instance} dict, like
+    serialize_once() for each of them: the keys whose flight and cache lock are
+    taken are serialized and cached with one set_many() per timeout, while those
+    held by another thread or process return their stale entry if any, or wait
+    together up to settings.DCF_SERIALIZATION_LOCK_WAIT seconds for the result.
+    """
+    flights = {}
+    # key -> _Flight of another thread
+    followed = {}
+    with _flights_lock:
+        for key in instances:
+            flight = _flights.get(key)
+            if flight is None:
+                flights[key] = _flights[key] = _Flight()
+            else:
+                followed[key] = flight
+    results = {}
+    locked = []
+    try:
+        held = []
+        for key in flights:
+            if cache.add(f"{key}_lock", 1, timeout=get_lock_timeout()):
+                locked.append(key)
+            elif stale.get(key) is not None:
+                results[key] = stale[key].data
+            else:
+                held.append(key)
+        # timeout -> {key: CachedSerialization}
+        entries = {}
+        for key in locked:
+            instance = instances[key]
+            start = perf_counter()
+            results[key] = _serialize_instance(instance)
+            timeout = instance.get_serialization_cache_timeout()
+            entries.setdefault(timeout, {})[key] = make_cached_serialization(
+                results[key], perf_counter() - start, timeout
+            )
+        for timeout, serializations in entries.items():
+            cache.set_many(serializations, timeout=timeout)
+        # other processes are serializing them
+        deadline = monotonic() + get_lock_wait()
+        while held and monotonic() < deadline:
+            sleep(LOCK_POLL_INTERVAL)
+            for key, entry in cache.get_many(held).items():
+                results[key] = entry.data
+            held = [key for key in held if key not in results]
+        # the holders of the locks cache them
+        for key in held:
+            results[key] = _serialize_instance(instances[key])
+        for key, flight in flights.items():
+            flight.data = results[key]
+    except BaseException:
+        for flight in flights.values():
+            flight.failed = True
+        raise
+    finally:
+        if locked:
+            cache.delete_many([f"{key}_lock" for key in locked])
+        with _flights_lock:
+            for key in flights:
+                del _flights[key]
+        for flight in flights.values():
+            flight.done.set()
+    deadline = monotonic() + get_lock_wait()
+    for key, flight in followed.items():
+        if stale.get(key) is not None:
+            results[key] = stale[key].data
+        elif flight.done.wait(max(0, deadline - monotonic())) and not flight.failed:
+            results[key] = flight.data
+        else:
+            results[key] = _serialize_instance(instances[key])
+    return results
+
 
 class Serializable(m.Model):
+    """
+    The APIs serialize instances with serialize() and serialize_many(), which
+    honor serialization_cache_policy: "off" serializes every time, "object" caches
+    the serialization of every instance on its own, and "page" also reads and
+    writes the cache once per page. None uses settings.DCF_SERIALIZATION_CACHE_POLICY,
+    "page" by default. Models whose serializers depend on the request should
+    turn the cache off. The object APIs honor the same policy once it is chosen,
+    by the model or the setting, and otherwise serialize with the request.
+
+    Cache keys embed a generation of the model and a hash of its serializer
+    fields. Saving or deleting an instance drops its own serialization, while
+    bump_serialization_generation() drops those of every instance at once, which
+    is needed after QuerySet.update(), bulk_update() or raw SQL.
+
+    Serializations embedding related objects are also dropped when these change,
+    see serialization_dependencies for the paths the serializer reads.
+    """
+
+    serialization_cache_policy = None
+
+    # lookup paths of the related objects read by the serializer, such as
+    # "brand__name", in addition to those inferred from its fields
+    serialization_dependencies = ()
+
     class Meta:
         abstract = True
 
@@ -38,25 +367,119 @@ class Serializable(m.Model):
     def __str__(self):
         return f"<{self.__class__.__name__}:{self.pk}>"
 
+    @classmethod
+    def get_serialization_cache_policy(cls):
+        policy = cls.serialization_cache_policy or getattr(
+            settings, "DCF_SERIALIZATION_CACHE_POLICY", SERIALIZATION_CACHE_PAGE
+        )
+        if policy not in SERIALIZATION_CACHE_POLICIES:
+            raise ValueError(f"{cls} has invalid serialization cache policy {policy}")
+        return policy
+
+    @classmethod
+    def caches_object_serializations(cls):
+        """
+        Returns True if the object APIs serve cached serializations, which are
+        built without the request, instead of serializing with it. Unlike the
+        collection APIs, they don't cache under the default policy.
+        """
+        if cls.serialization_cache_policy is None and not hasattr(
+            settings, "DCF_SERIALIZATION_CACHE_POLICY"
+        ):
+            return False
+        return cls.get_serialization_cache_policy() != SERIALIZATION_CACHE_OFF
+
+    def serialize(self):
+        """Returns the serialization of self, according to the cache policy."""
+        if self.get_serialization_cache_policy() == SERIALIZATION_CACHE_OFF:
+            return self.json()
+        return self.get_or_create_cached_serialization()
+
+    @classmethod
+    def serialize_many(cls, instances):
+        """Returns the serializations of instances, according to the cache policy."""
+        policy = cls.get_serialization_cache_policy()
+        if policy == SERIALIZATION_CACHE_OFF:
+            return [instance.json() for instance in instances]
+        elif policy == SERIALIZATION_CACHE_PER_OBJECT:
+            return [
+                instance.get_or_create_cached_serialization() for instance in instances
+            ]
+        return cls.get_or_create_cached_serializations(instances)
+
     def get_serialization_cache_timeout(self):
         return 3600 * 24 * 7
 
     def get_or_create_cached_serialization(self):
-        result = cache.get(self.cache_key_for_serialization, None)
-        if result:
-            return result
-        else:
-            ser = self.serializer_class()(instance=self)
-            cache.add(
-                self.cache_key_for_serialization,
-                ser.data,
-                timeout=self.get_serialization_cache_timeout(),
+        """
+        Returns the cached serialization of self, serializing it once across
+        concurrent requests when it is missing or due for an early refresh, see
+        serialize_once().
+        """
+        key = self.cache_key_for_serialization
+        entry = cache.get(key, None)
+        if entry is not None and not entry.is_due(get_early_refresh_beta()):
+            count_serialization_cache_access(self._meta.model, 1, 0)
+            return entry.data
+        count_serialization_cache_access(self._meta.model, 0, 1)
+        return serialize_once(
+            key,
+            lambda: self.serializer_class()(instance=self).data,
+            self.get_serialization_cache_timeout(),
+            stale=entry,
+        )
+
+    @classmethod
+    def get_or_create_cached_serializations(cls, instances):
+        """
+        Returns the serializations of instances in order, like
+        get_or_create_cached_serialization(), reading the cache with a single
+        get_many() and serializing the missing or due ones once across concurrent
+        requests, see serialize_many_once().
+        """
+        instances = list(instances)
+        prefix = cls.get_serialization_cache_key_prefix()
+        keys = [f"{prefix}_{instance.pk}" for instance in instances]
+        cached = cache.get_many(keys)
+        beta = get_early_refresh_beta()
+        results = {}
+        # key -> CachedSerialization if due, None if missing
+        stale = {}
+        for key in keys:
+            entry = cached.get(key)
+            if entry is None or entry.is_due(beta):
+                stale[key] = entry
+            else:
+                results[key] = entry.data
+        if stale:
+            results.update(
+                serialize_many_once(
+                    {
+                        key: instance
+                        for key, instance in zip(keys, instances)
+                        if key in stale
+                    },
+                    stale,
+                )
             )
-            return ser.data
+        count_serialization_cache_access(cls, len(keys) - len(stale), len(stale))
+        return [results[key] for key in keys]
+
+    @classmethod
+    def get_serialization_cache_key_prefix(cls):
+        model = cls._meta.model
+        return (
+            f"serialization_{model._meta.model_name}"
+            f"_{get_serialization_generation(model)}_{get_serializer_layout_hash(model)}"
+        )
 
-    @cached_property
+    @property
     def cache_key_for_serialization(self):
-        return f"serialization_{self._meta.model_name}_{self.pk}"
+        return f"{self.get_serialization_cache_key_prefix()}_{self.pk}"
+
+    @classmethod
+    def bump_serialization_generation(cls):
+        bump_serialization_generation(cls._meta.model)
 
     def invalidate_serialization_cache(self):
         cache.delete(self.cache_key_for_serialization)
@@ -64,7 +487,8 @@ class Serializable(m.Model):
 
 @receiver(post_save)
 def auto_invalidate_cached_serialization_post_save(sender, instance, created, **kwargs):
-    if not created and isinstance(instance, Serializable):
+    # created instances are invalidated too, in case their pk was reused
+    if isinstance(instance, Serializable):
         LOG.debug(f"invalidate cache for {instance}")
         instance.invalidate_serialization_cache()
 
@@ -0,0 +1,312 @@
+"""
+Invalidation of the cached serializations that embed related objects.
+
+A serializer reading related objects, e.g. the name of the brand of a product,
+leaves the cached serializations of products stale whenever a brand changes. The
+dependencies of a model are inferred from the dotted sources, the nested
+serializers and the many related fields of its serializer, and extended with the
+lookup paths listed in Serializable.serialization_dependencies, such as "brand" or
+"brand__name", for what the serializer reads otherwise, e.g. in method fields.
+
+A reverse index maps every model along these paths, and the through model of every
+many-to-many relation on them, to the serializations depending on it. Saving or
+deleting one of its instances, or changing the relation, deletes the affected
+serializations with one query per dependency and one delete_many() per dependent
+model. When more than settings.DCF_SERIALIZATION_DEPENDENTS_MAX_KEYS (1000 by
+default) serializations of a model are affected, its generation is bumped instead.
+Like the serialization of an instance, they are deleted again after the current
+transaction commits.
+"""
+
+from logging import getLogger
+from threading import Lock
+from typing import NamedTuple, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import ManyToManyField, ManyToManyRel, ManyToOneRel
+from django.db.models.signals import m2m_changed, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework.relations import ManyRelatedField
+from rest_framework.serializers import BaseSerializer
+
+from .serializable import Serializable
+
+LOG = getLogger(__name__)
+
+
+class Dependency(NamedTuple):
+    dependent: type
+    # lookup from the dependent model to the changed model
+    lookup: str
+    # names of the fields of the changed model that are read, None if any
+    fields: Optional[frozenset]
+    # whether the changed model holds the foreign key of the last relation, so
+    # that saving it can also move it away from dependents
+    holds_link: bool
+
+
+class ManyToManyDependency(NamedTuple):
+    dependent: type
+    # lookup from the dependent model to the side of the relation it reaches
+    # first, "" if it is the dependent model itself
+    lookup: str
+    field: ManyToManyField
+    # whether that side is the model declaring field
+    from_owner: bool
+
+
+class DependencyIndex(NamedTuple):
+    # concrete model -> [Dependency]
+    saves: dict
+    # through model -> [ManyToManyDependency]
+    m2m: dict
+
+
+_lock = Lock()
+_index = None
+
+
+def get_max_keys():
+    return getattr(settings, "DCF_SERIALIZATION_DEPENDENTS_MAX_KEYS", 1000)
+
+
+def resolve_field(model, name):
+    """Returns the field of model named name, or the relation with that accessor."""
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        for field in model._meta.get_fields():
+            if field.auto_created and not field.concrete:
+                if field.get_accessor_name() == name:
+                    return field
+    return None
+
+
+def infer_paths(serializer, prefix=()):
+    """Yields the paths of the related objects read by serializer, as tuples."""
+    serializer = getattr(serializer, "child", serializer)
+    for field in serializer.fields.values():
+        attrs = () if field.source == "*" else tuple(field.source.split("."))
+        inner = getattr(field, "child", field)
+        if isinstance(inner, BaseSerializer):
+            if attrs:
+                yield prefix + attrs
+            yield from infer_paths(inner, prefix + attrs)
+        elif len(attrs) > 1 or (attrs and isinstance(field, ManyRelatedField)):
+            yield prefix + attrs
+
+
+def get_paths(model):
+    paths = {tuple(path.split("__")) for path in model.serialization_dependencies}
+    serializer_class = model.serializer_class()
+    try:
+        paths.update(infer_paths(serializer_class()))
+    except Exception:
+        # serializers delegating to other serializers per instance have no
+        # fields on their own
+        LOG.debug(f"cannot infer the dependencies of {serializer_class}")
+    return paths
+
+
+def resolve_path(model, path):
+    """
+    Returns the relations along path, and the field of the last related model it
+    ends with, None if it may read any of them.
+    """
+    relations = []
+    current = model
+    for i, name in enumerate(path):
+        field = resolve_field(current, name)
+        if field is None:
+            # e.g. a property
+            break
+        if not field.is_relation or field.related_model is None:
+            return relations, field if i == len(path) - 1 else None
+        relations.append(field)
+        current = field.related_model
+    return relations, None
+
+
+def add_path(index, model, path):
+    relations, last_field = resolve_path(model, path)
+    for i, field in enumerate(relations):
+        lookup = "__".join(relation.name for relation in relations[:i])
+        if isinstance(field, ManyToManyField):
+            index.m2m.setdefault(field.remote_field.through, []).append(
+                ManyToManyDependency(model, lookup, field, True)
+            )
+        elif isinstance(field, ManyToManyRel):
+            index.m2m.setdefault(field.through, []).append(
+                ManyToManyDependency(model, lookup, field.field, False)
+            )
+        if i < len(relations) - 1:
+            # only the foreign key to the next model matters
+            following = relations[i + 1]
+            fields = (
+                {following.name, following.attname}
+                if following.concrete and not following.many_to_many
+                else set()
+            )
+        elif last_field is not None:
+            fields = {last_field.name, last_field.attname}
+        else:
+            fields = None
+        holds_link = isinstance(field, ManyToOneRel)
+        if fields is not None and holds_link:
+            fields |= {field.field.name, field.field.attname}
+        if fields is None or fields:
+            index.saves.setdefault(field.related_model._meta.concrete_model, []).append(
+                Dependency(
+                    model,
+                    "__".join(relation.name for relation in relations[: i + 1]),
+                    None if fields is None else frozenset(fields),
+                    holds_link,
+                )
+            )
+
+
+def build_dependency_index():
+    index = DependencyIndex({}, {})
+    for model in apps.get_models():
+        if issubclass(model, Serializable):
+            for path in sorted(get_paths(model)):
+                add_path(index, model, path)
+    return index
+
+
+def get_dependency_index() -> DependencyIndex:
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = build_dependency_index()
+    return _index
+
+
+def clear_dependency_index():
+    global _index
+    with _lock:
+        _index = None
+
+
+def _delete_keys(keys):
+    cache.delete_many(keys)
+
+
+def invalidate_dependents(querysets):
+    """
+    Deletes the serializations of the pks yielded by querysets, which are
+    (dependent model, values_list queryset) pairs.
+    """
+    limit = get_max_keys()
+    pks = {}
+    for model, queryset in querysets:
+        model_pks = pks.setdefault(model, set())
+        if model_pks is None:
+            continue
+        model_pks.update(queryset[: limit + 1])
+        if len(model_pks) > limit:
+            pks[model] = None
+    for model, model_pks in pks.items():
+        if model_pks is None:
+            model.bump_serialization_generation()
+        elif model_pks:
+            prefix = model.get_serialization_cache_key_prefix()
+            keys = [f"{prefix}_{pk}" for pk in model_pks]
+            LOG.debug(f"invalidate {len(keys)} serializations of {model}")
+            _delete_keys(keys)
+            if transaction.get_connection().in_atomic_block:
+                transaction.on_commit(lambda keys=keys: _delete_keys(keys))
+
+
+def get_dependent_querysets(instance, update_fields=None, holding_link=False):
+    model = instance._meta.concrete_model
+    for dependency in get_dependency_index().saves.get(model, ()):
+        if holding_link and not dependency.holds_link:
+            continue
+        if (
+            update_fields is not None
+            and dependency.fields is not None
+            and dependency.fields.isdisjoint(update_fields)
+        ):
+            continue
+        yield dependency.dependent, dependency.dependent._default_manager.filter(
+            **{dependency.lookup: instance.pk}
+        ).values_list("pk", flat=True).distinct()
+
+
+@receiver(pre_save)
+def auto_invalidate_dependent_serializations_pre_save(
+    sender, instance, update_fields=None, **kwargs
+):
+    # the dependents the instance is moved away from
+    if instance.pk is not None and not instance._state.adding:
+        invalidate_dependents(
+            get_dependent_querysets(instance, update_fields, holding_link=True)
+        )
+
+
+@receiver(post_save)
+def auto_invalidate_dependent_serializations_post_save(
+    sender, instance, update_fields=None, **kwargs
+):
+    invalidate_dependents(get_dependent_querysets(instance, update_fields))
+
+
+@receiver(pre_delete)
+def auto_invalidate_dependent_serializations_pre_delete(sender, instance, **kwargs):
+    invalidate_dependents(get_dependent_querysets(instance))
+
+
+def get_m2m_pks(field, instance, reverse, pk_set):
+    """Returns the pks of the owners of field and of their related objects."""
+    if pk_set is None:
+        # cleared, read the pairs before they are deleted
+        this, other = field.m2m_field_name(), field.m2m_reverse_field_name()
+        if reverse:
+            this, other = other, this
+        pk_set = set(
+            field.remote_field.through._default_manager.filter(
+                **{this: instance.pk}
+            ).values_list(other, flat=True)
+        )
+    if reverse:
+        owner_pks, target_pks = set(pk_set), {instance.pk}
+    else:
+        owner_pks, target_pks = {instance.pk}, set(pk_set)
+    if field.remote_field.symmetrical:
+        owner_pks = target_pks = owner_pks | target_pks
+    return owner_pks, target_pks
+
+
+@receiver(m2m_changed)
+def auto_invalidate_dependent_serializations_on_m2m_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    dependencies = get_dependency_index().m2m.get(sender)
+    if not dependencies:
+        return
+    querysets = []
+    for dependency in dependencies:
+        owner_pks, target_pks = get_m2m_pks(dependency.field, instance, reverse, pk_set)
+        pks = owner_pks if dependency.from_owner else target_pks
+        if dependency.lookup:
+            querysets.append(
+                (
+                    dependency.dependent,
+                    dependency.dependent._default_manager.filter(
+                        **{f"{dependency.lookup}__in": pks}
+                    )
+                    .values_list("pk", flat=True)
+                    .distinct(),
+                )
+            )
+        else:
+            querysets.append((dependency.dependent, list(pks)))
+    invalidate_dependents(querysets)
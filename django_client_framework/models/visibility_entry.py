@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.db import models as m
+
+
+class VisibilityEntry(m.Model):
+    """
+    A row of the materialized visibility index: the object permissions a user or a
+    group holds on one object, as a bitmask. Rows are maintained by
+    permissions.visibility_index for models using the "index" filter backend.
+    """
+
+    content_type = m.ForeignKey(ContentType, on_delete=m.CASCADE)
+    object_pk = m.CharField(max_length=255)
+    user = m.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=m.CASCADE, null=True, related_name="+"
+    )
+    group = m.ForeignKey(Group, on_delete=m.CASCADE, null=True, related_name="+")
+    # empty for object permissions, the field's name for field permissions
+    field_name = m.CharField(max_length=255, blank=True, default="")
+    perms = m.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            m.UniqueConstraint(
+                fields=["content_type", "object_pk", "field_name", "user"],
+                condition=m.Q(user__isnull=False),
+                name="dcf_visibility_unique_user",
+            ),
+            m.UniqueConstraint(
+                fields=["content_type", "object_pk", "field_name", "group"],
+                condition=m.Q(group__isnull=False),
+                name="dcf_visibility_unique_group",
+            ),
+            m.CheckConstraint(
+                check=m.Q(user__isnull=False, group__isnull=True)
+                | m.Q(user__isnull=True, group__isnull=False),
+                name="dcf_visibility_one_principal",
+            ),
+        ]
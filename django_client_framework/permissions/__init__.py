@@ -1,3 +1,9 @@
 from .auto import *
 from .default_users import *
 from .site_permission import *
+from .async_shortcuts import (
+    aadd_perms_shortcut,
+    afilter_queryset_by_perms_shortcut,
+    ahas_perms_shortcut,
+)
+from .rules import PermissionRule
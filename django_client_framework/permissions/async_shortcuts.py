@@ -0,0 +1,181 @@
+"""
+Async variants of the permission shortcuts, for async views under ASGI.
+
+ahas_perms_shortcut() answers every permission letter with a single EXISTS query
+run through the async ORM on Django 4.1 and later, so that several checks can be
+awaited concurrently, e.g. with asyncio.gather(). The Permission objects, the
+anyone group and the user's groups are resolved in one sync_to_async call
+beforehand, mostly from the process-wide caches. On older Django versions, which
+have no async ORM, queries are run with sync_to_async.
+
+afilter_queryset_by_perms_shortcut() and aadd_perms_shortcut() run their sync
+counterparts with sync_to_async: building the filter needs a few lookups but the
+returned queryset is lazy and can be iterated with the async ORM, and guardian
+only has a sync API for writing permissions.
+"""
+
+from typing import NamedTuple
+
+import django
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import models as m
+from django.db.models.base import ModelBase
+from guardian import models as gm
+
+from . import perm_cache, rules, tracing
+from .default_groups import default_groups
+from .site_permission import (
+    add_perms_shortcut,
+    filter_queryset_by_perms_shortcut,
+    get_permission_for_model,
+)
+
+HAS_ASYNC_ORM = django.VERSION >= (4, 1)
+
+
+class DecisionContext(NamedTuple):
+    # permission letter -> ids of the object and field permissions
+    perm_ids: dict
+    # ids of the groups whose permissions apply, including anyone
+    group_ids: list
+    # None for groups and inactive users
+    user_id: object
+    content_type_id: int
+
+
+async def aexists(queryset):
+    if HAS_ASYNC_ORM:
+        return await queryset.aexists()
+    return await sync_to_async(queryset.exists)()
+
+
+def resolve_decision_context(user_or_group, model, perms, field_name=None):
+    perm_ids = {
+        s: [
+            get_permission_for_model(s, model, field_name=f).pk
+            for f in set([None, field_name])
+        ]
+        for s in perms
+    }
+    group_ids = [default_groups.anyone.pk]
+    user_id = None
+    if isinstance(user_or_group, Group):
+        group_ids.append(user_or_group.pk)
+    elif user_or_group.is_active:
+        user_id = user_or_group.pk
+        group_ids += list(user_or_group.groups.values_list("pk", flat=True))
+    content_type = ContentType.objects.get_for_model(model, for_concrete_model=False)
+    return DecisionContext(perm_ids, group_ids, user_id, content_type.pk)
+
+
+def perm_granted_queryset(context: DecisionContext, perm, instance):
+    """
+    Returns a queryset that is not empty when one of the principals of context
+    holds perm on the model or on instance.
+    """
+    perm_ids = context.perm_ids[perm]
+    principals = m.Q(group__in=context.group_ids)
+    if context.user_id is not None:
+        principals |= m.Q(user=context.user_id)
+    if instance is not None:
+        object_perms = {
+            "permission_id__in": perm_ids,
+            "content_type_id": context.content_type_id,
+            "object_pk": str(instance.pk),
+        }
+        principals |= m.Q(
+            m.Exists(
+                gm.GroupObjectPermission.objects.filter(
+                    group_id__in=context.group_ids, **object_perms
+                )
+            )
+        )
+        if context.user_id is not None:
+            principals |= m.Q(
+                m.Exists(
+                    gm.UserObjectPermission.objects.filter(
+                        user_id=context.user_id, **object_perms
+                    )
+                )
+            )
+    return Permission.objects.filter(principals, pk__in=perm_ids)
+
+
+async def arule_grants(user_or_group, instance, perm, field_name=None):
+    for predicate in rules.rule_predicates(
+        instance._meta.model, user_or_group, perm, field_name
+    ):
+        matches = rules.evaluate_predicate(predicate, instance)
+        if matches is None:
+            matches = await aexists(
+                instance._meta.model._default_manager.filter(pk=instance.pk).filter(
+                    predicate
+                )
+            )
+        if matches:
+            return True
+    return False
+
+
+async def ahas_perms_shortcut(user_or_group, model_or_instance, perms, field_name=None):
+    """
+    Async variant of has_perms_shortcut(). Decisions are memoized in perm_cache,
+    but the shared cache is not consulted.
+    """
+    User = get_user_model()
+
+    if isinstance(model_or_instance, m.Model):
+        instance = model_or_instance
+        model = instance._meta.model
+    elif model_or_instance.__class__ is ModelBase:
+        instance = None
+        model = model_or_instance
+    else:
+        raise TypeError(f"model_or_instance has wrong type: {type(model_or_instance)}")
+
+    if isinstance(user_or_group, User) and user_or_group.is_superuser:
+        return True
+
+    perms = perms.lower()
+    context = None
+    for s in perms:
+        key = perm_cache.make_key(user_or_group, model, instance, s, field_name)
+        decision = perm_cache.get_decision(key)
+        if decision is None:
+            if context is None:
+                context = await sync_to_async(resolve_decision_context)(
+                    user_or_group, model, perms, field_name
+                )
+            decision = await aexists(perm_granted_queryset(context, s, instance))
+            if not decision and instance is not None:
+                decision = await arule_grants(user_or_group, instance, s, field_name)
+            perm_cache.set_decision(key, decision)
+            source = "async" if decision else "denied"
+        else:
+            source = "cache"
+        if tracing.is_active():
+            tracing.record(*key, decision, source)
+        if not decision:
+            return False
+    return True
+
+
+async def afilter_queryset_by_perms_shortcut(
+    perms, user_or_group, queryset, field_name=None
+):
+    """Async variant of filter_queryset_by_perms_shortcut()."""
+    return await sync_to_async(filter_queryset_by_perms_shortcut)(
+        perms, user_or_group, queryset, field_name
+    )
+
+
+async def aadd_perms_shortcut(
+    user_or_group, model_or_instance_or_queryset, perms, field_name=None
+):
+    """Async variant of add_perms_shortcut()."""
+    return await sync_to_async(add_perms_shortcut)(
+        user_or_group, model_or_instance_or_queryset, perms, field_name
+    )
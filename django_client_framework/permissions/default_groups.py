@@ -1,4 +1,7 @@
 from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
 
 
 def register_default_group(group_name):
@@ -13,21 +16,51 @@ def do_nothing(group):
 
 
 class DefaultGroups:
+    """
+    Default groups are resolved once per process. A group is only remembered once
+    it is known to be committed, so a rolled back transaction cannot leave a
+    stale group behind.
+    """
+
     group_names = {
         "anyone": do_nothing,
         "logged_in": do_nothing,
     }
 
+    def __init__(self):
+        self._cache = {}
+
     def __getattr__(self, name):
         if name in self.group_names:
-            return Group.objects.get_or_create(name=name)[0]
+            group = self._cache.get(name)
+            if group is None:
+                group = Group.objects.get_or_create(name=name)[0]
+                transaction.on_commit(lambda: self._cache.setdefault(name, group))
+            return group
         else:
             raise AttributeError(f"{name} is not a default group")
 
     def setup(self):
+        self.clear_cache()
         for name, config_func in self.group_names.items():
             group = Group.objects.get_or_create(name=name)[0]
             config_func(group)
 
+    def clear_cache(self):
+        self._cache.clear()
+
 
 default_groups = DefaultGroups()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def auto_forget_changed_default_group(sender, instance, **kwargs):
+    for name, group in list(default_groups._cache.items()):
+        if group.pk == instance.pk:
+            default_groups._cache.pop(name, None)
+
+
+@receiver(post_migrate)
+def auto_clear_default_groups_after_migrate(*args, **kwargs):
+    default_groups.clear_cache()
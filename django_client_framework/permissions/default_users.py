@@ -1,4 +1,10 @@
+from copy import deepcopy
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
 
 
 def register_default_user(username):
@@ -13,23 +19,54 @@ def do_nothing(group):
 
 
 class DefaultUsers:
+    """
+    Default users are resolved once per process, see DefaultGroups. Every access
+    returns a copy of the cached user so that per-instance caches, such as the
+    permission cache of ModelBackend, don't live as long as the process.
+    """
 
     usernames = {}
 
+    def __init__(self):
+        self._cache = {}
+
     def __getattr__(self, name):
         if name in self.usernames:
-            return get_user_model().objects.get_or_create(username=name)[0]
+            user = self._cache.get(name)
+            if user is None:
+                user = get_user_model().objects.get_or_create(username=name)[0]
+                cached = deepcopy(user)
+                transaction.on_commit(lambda: self._cache.setdefault(name, cached))
+                return user
+            return deepcopy(user)
         else:
             raise AttributeError(f"{name} is not a default user")
 
     def setup(self):
+        self.clear_cache()
         for name, config_func in self.usernames.items():
             user = get_user_model().objects.get_or_create(username=name)[0]
             config_func(user)
 
+    def clear_cache(self):
+        self._cache.clear()
+
     @property
     def anonymous(self):
         return get_user_model().get_anonymous()
 
 
 default_users = DefaultUsers()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def auto_forget_changed_default_user(sender, instance, **kwargs):
+    for name, user in list(default_users._cache.items()):
+        if user.pk == instance.pk:
+            default_users._cache.pop(name, None)
+
+
+@receiver(post_migrate)
+def auto_clear_default_users_after_migrate(*args, **kwargs):
+    default_users.clear_cache()
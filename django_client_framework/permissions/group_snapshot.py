@@ -0,0 +1,192 @@
+"""
+In-memory snapshots of the permissions of the anyone and logged_in groups.
+
+Every permission check consults the anyone group, and most public objects are
+shared through these two groups, whose permissions rarely change. A snapshot
+holds the model permissions of such a group and, per permission, the pks of the
+objects it is granted on, so that has_perms_shortcut() answers these checks with
+set lookups. Groups with more object permissions than
+settings.DCF_GROUP_SNAPSHOT_MAX_OBJECT_PERMS (10000 by default) only snapshot
+their model permissions.
+
+Snapshots are process-wide and immutable. They are only loaded from committed
+rows, outside of atomic blocks, and are dropped whenever the permissions of the
+groups change, either through signals or explicitly by the bulk writers of
+site_permission, which bypass them. invalidate() also bumps a generation in the
+cache, and other processes drop their snapshots once they see it change, see
+shared_cache.GenerationWatch.
+"""
+
+from logging import getLogger
+from threading import RLock
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from guardian import models as gm
+
+from . import shared_cache
+from .default_groups import default_groups
+
+LOG = getLogger(__name__)
+
+SNAPSHOT_GROUPS = ("anyone", "logged_in")
+
+_lock = RLock()
+# group name -> GroupSnapshot
+_snapshots = {}
+# pks of the groups that were ever snapshotted
+_group_ids = set()
+# bumped by invalidate(), so that snapshots loaded concurrently are not kept
+_generation = 0
+# the generation of shared_cache.snapshot_watch the snapshots belong to
+_watched_generation = None
+
+
+class GroupSnapshot(NamedTuple):
+    group_id: int
+    model_perm_ids: frozenset
+    # permission id -> object pks, None if the group has too many object permissions
+    object_pks: Optional[Mapping[int, frozenset]]
+
+    def has_object_perm(self, perm: Permission, object_pk) -> Optional[bool]:
+        """Returns None if the object permissions are not in the snapshot."""
+        if self.object_pks is None:
+            return None
+        return str(object_pk) in self.object_pks.get(perm.pk, ())
+
+
+def get_max_object_perms():
+    return getattr(settings, "DCF_GROUP_SNAPSHOT_MAX_OBJECT_PERMS", 10000)
+
+
+def load_snapshot(group) -> GroupSnapshot:
+    model_perm_ids = frozenset(group.permissions.values_list("pk", flat=True))
+    limit = get_max_object_perms()
+    rows = list(
+        gm.GroupObjectPermission.objects.filter(group=group).values_list(
+            "permission_id", "object_pk"
+        )[: limit + 1]
+    )
+    if len(rows) > limit:
+        LOG.info(f"{group} has more than {limit} object permissions, not snapshotted")
+        return GroupSnapshot(group.pk, model_perm_ids, None)
+    object_pks = {}
+    for permission_id, object_pk in rows:
+        object_pks.setdefault(permission_id, set()).add(object_pk)
+    return GroupSnapshot(
+        group.pk,
+        model_perm_ids,
+        MappingProxyType(
+            {permission_id: frozenset(pks) for permission_id, pks in object_pks.items()}
+        ),
+    )
+
+
+def sync():
+    """Drops the snapshots if another process invalidated them."""
+    global _watched_generation
+    generation = shared_cache.snapshot_watch.current()
+    if generation != _watched_generation:
+        with _lock:
+            _watched_generation = generation
+        _drop()
+
+
+def get_snapshot(group) -> Optional[GroupSnapshot]:
+    """
+    Returns the snapshot of group, or None if group is not one of the default
+    groups or its snapshot cannot be loaded inside the current atomic block.
+    """
+    if group.name not in SNAPSHOT_GROUPS:
+        return None
+    sync()
+    snapshot = _snapshots.get(group.name)
+    if snapshot is not None and snapshot.group_id == group.pk:
+        return snapshot
+    if transaction.get_connection().in_atomic_block:
+        # rows read here may be uncommitted
+        return None
+    with _lock:
+        _group_ids.add(group.pk)
+        generation = _generation
+    snapshot = load_snapshot(group)
+    with _lock:
+        if generation == _generation:
+            _snapshots[group.name] = snapshot
+    return snapshot
+
+
+def get_default_snapshot(name) -> Optional[GroupSnapshot]:
+    """
+    Returns the snapshot of the default group name, without resolving the group
+    when the snapshot cannot be loaded.
+    """
+    sync()
+    snapshot = _snapshots.get(name)
+    if snapshot is not None:
+        return snapshot
+    if transaction.get_connection().in_atomic_block:
+        return None
+    return get_snapshot(getattr(default_groups, name))
+
+
+def _drop():
+    global _generation
+    with _lock:
+        _generation += 1
+        _snapshots.clear()
+
+
+def invalidate():
+    """
+    Drops the snapshots of every process now, and again after the current
+    transaction commits.
+    """
+    _drop()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(_drop)
+    shared_cache.bump_snapshots()
+
+
+def is_snapshotted(user_or_group):
+    """Returns True if the permissions of user_or_group are held in snapshots."""
+    return isinstance(user_or_group, Group) and user_or_group.name in SNAPSHOT_GROUPS
+
+
+def is_member(user, group_id):
+    """
+    Returns True if user belongs to the group with pk group_id. The groups of user
+    are memoized on the instance, like the model permissions memoized by the auth
+    backend.
+    """
+    if not hasattr(user, "_dcf_group_ids"):
+        user._dcf_group_ids = frozenset(user.groups.values_list("pk", flat=True))
+    return group_id in user._dcf_group_ids
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def auto_invalidate_group_snapshots_on_model_perm_change(
+    sender, instance, action, **kwargs
+):
+    if action.startswith("post_") and (
+        not isinstance(instance, Group) or instance.pk in _group_ids
+    ):
+        invalidate()
+
+
+@receiver(post_save, sender=gm.GroupObjectPermission)
+@receiver(post_delete, sender=gm.GroupObjectPermission)
+def auto_invalidate_group_snapshots_on_object_perm_change(sender, instance, **kwargs):
+    if instance.group_id in _group_ids:
+        invalidate()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def auto_invalidate_group_snapshots_on_delete(sender, instance, **kwargs):
+    invalidate()
@@ -0,0 +1,187 @@
+"""
+Request-scoped memoization of permission decisions.
+
+A decision cache is opened when a request starts and discarded when it finishes,
+so every view handling the request shares the same answers. Outside of a request
+nothing is cached.
+
+Views rendering a page of objects can also prime guardian ObjectPermissionChecker
+instances with prefetch_object_perms(), so that has_perms_shortcut() reads the
+object permissions of every object of the page from memory. Pages whose objects
+may not be checked at all are registered with defer_object_perms() instead, and
+are only prefetched by the first object permission check on one of them.
+"""
+
+from contextlib import contextmanager
+from logging import getLogger
+from typing import NamedTuple
+
+from asgiref.local import Local
+from django.core.signals import request_finished, request_started
+from django.dispatch import receiver
+from guardian.core import ObjectPermissionChecker
+from guardian.ctypes import get_content_type
+
+LOG = getLogger(__name__)
+
+_state = Local()
+
+
+def principal_key(user_or_group):
+    return (user_or_group._meta.label_lower, user_or_group.pk)
+
+
+def make_key(user_or_group, model, instance, perm, field_name=None):
+    return (
+        principal_key(user_or_group),
+        model._meta.label_lower,
+        instance.pk if instance is not None else None,
+        perm,
+        field_name,
+    )
+
+
+def is_active():
+    return getattr(_state, "decisions", None) is not None
+
+
+def get_decision(key):
+    """Returns the cached decision for key, or None if it is not cached."""
+    decisions = getattr(_state, "decisions", None)
+    if decisions is None:
+        return None
+    return decisions.get(key)
+
+
+def set_decision(key, decision):
+    decisions = getattr(_state, "decisions", None)
+    if decisions is not None:
+        decisions[key] = decision
+
+
+class PrimedChecker(NamedTuple):
+    checker: ObjectPermissionChecker
+    # guardian cache keys of the objects whose permissions were prefetched
+    primed: set
+
+
+def prefetch_object_perms(user_or_group, instances):
+    """
+    Loads the object permissions of user_or_group and of the anyone group on
+    instances, which must all belong to the same model, with one or two queries
+    per principal.
+    """
+    from .default_groups import default_groups
+
+    checkers = getattr(_state, "checkers", None)
+    instances = list(instances)
+    if checkers is None or not instances:
+        return
+    for principal in set([default_groups.anyone, user_or_group]):
+        key = principal_key(principal)
+        if key not in checkers:
+            checkers[key] = PrimedChecker(ObjectPermissionChecker(principal), set())
+        checker, primed = checkers[key]
+        missing = [
+            instance
+            for instance in instances
+            if checker.get_local_cache_key(instance) not in primed
+        ]
+        if missing:
+            checker.prefetch_perms(missing)
+            primed.update(checker.get_local_cache_key(instance) for instance in missing)
+
+
+def object_key(instance):
+    """Returns the key of instance in the caches of ObjectPermissionChecker."""
+    return (get_content_type(instance).pk, str(instance.pk))
+
+
+def defer_object_perms(user_or_group, instances):
+    """
+    Like prefetch_object_perms(), but only once the object permissions on one of
+    instances are checked, without running any query before.
+    """
+    deferred = getattr(_state, "deferred", None)
+    instances = list(instances)
+    if deferred is None or not instances:
+        return
+    batch = (user_or_group, instances)
+    for instance in instances:
+        deferred[object_key(instance)] = batch
+
+
+def get_primed_checker(user_or_group, instance):
+    """
+    Returns the ObjectPermissionChecker of user_or_group if it holds the object
+    permissions on instance, or None. Prefetches the object permissions of the
+    instances deferred with instance first.
+    """
+    checkers = getattr(_state, "checkers", None)
+    if checkers is None:
+        return None
+    key = object_key(instance)
+    entry = checkers.get(principal_key(user_or_group))
+    if entry is None or key not in entry.primed:
+        batch = _state.deferred.get(key)
+        if batch is None:
+            return None
+        from .default_groups import default_groups
+
+        deferred_user_or_group, instances = batch
+        if user_or_group not in (deferred_user_or_group, default_groups.anyone):
+            return None
+        prefetch_object_perms(deferred_user_or_group, instances)
+        entry = checkers.get(principal_key(user_or_group))
+    return entry.checker
+
+
+def invalidate():
+    """Drops every cached decision and primed checker of the current request."""
+    decisions = getattr(_state, "decisions", None)
+    if decisions:
+        LOG.debug(f"invalidating {len(decisions)} cached permission decisions")
+        decisions.clear()
+    checkers = getattr(_state, "checkers", None)
+    if checkers:
+        checkers.clear()
+
+
+def activate():
+    _state.decisions = {}
+    _state.checkers = {}
+    _state.deferred = {}
+
+
+def deactivate():
+    _state.decisions = None
+    _state.checkers = None
+    _state.deferred = None
+
+
+@contextmanager
+def permission_cache_scope():
+    """
+    Caches permission decisions made inside the block, for code running outside of
+    a request such as management commands and background jobs.
+    """
+    previous = (
+        getattr(_state, "decisions", None),
+        getattr(_state, "checkers", None),
+        getattr(_state, "deferred", None),
+    )
+    activate()
+    try:
+        yield
+    finally:
+        _state.decisions, _state.checkers, _state.deferred = previous
+
+
+@receiver(request_started)
+def auto_activate_permission_cache_on_request(*args, **kwargs):
+    activate()
+
+
+@receiver(request_finished)
+def auto_deactivate_permission_cache_after_request(*args, **kwargs):
+    deactivate()
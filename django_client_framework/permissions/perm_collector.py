@@ -0,0 +1,39 @@
+"""
+Collects the permissions that add_perms_shortcut would grant, instead of writing
+them, so that callers can compare them against existing rows or write them in bulk.
+"""
+
+from contextlib import contextmanager
+from typing import NamedTuple, Optional, Union
+
+from asgiref.local import Local
+from django.contrib.auth.models import Permission
+from django.db import models as m
+
+_state = Local()
+
+
+class PermGrant(NamedTuple):
+    user_or_group: m.Model
+    permission: Permission
+    # None for model permissions
+    target: Optional[Union[m.Model, m.QuerySet]]
+
+
+def get_collection():
+    """Returns the list grants are collected into, or None if not collecting."""
+    return getattr(_state, "collection", None)
+
+
+@contextmanager
+def collect_perms():
+    """
+    Inside the block, add_perms_shortcut appends PermGrant tuples to the yielded list
+    instead of writing to the database.
+    """
+    previous = get_collection()
+    _state.collection = []
+    try:
+        yield _state.collection
+    finally:
+        _state.collection = previous
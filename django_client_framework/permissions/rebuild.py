@@ -0,0 +1,218 @@
+"""
+Rebuilds the permissions of every AccessControlled instance.
+
+Instances are streamed in chunks ordered by pk. The permissions declared by
+PermissionManager.add_perms() for a chunk are collected and written in bulk, and
+every chunk is committed on its own, so a rebuild can be resumed from the last
+reported checkpoint after an interruption.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from logging import getLogger
+from time import perf_counter
+from typing import NamedTuple, Optional, Tuple
+
+import django
+from django.apps import apps
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, connections, transaction
+from guardian.models import UserObjectPermission
+
+from . import perm_collector, shared_cache, visibility_index
+from .default_groups import default_groups
+from .default_users import default_users
+from .registry import permission_registry
+from .site_permission import bulk_assign_grants, clear_permissions
+
+LOG = getLogger(__name__)
+
+
+class RebuildProgress(NamedTuple):
+    model: str
+    # resume a rebuild from (model, last_pk) with rebuild_permissions(resume_from=...)
+    last_pk: object
+    done: int
+    total: int
+    elapsed: float
+
+    @property
+    def rate(self):
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.model}: {self.done}/{self.total} instances,"
+            f" {self.rate:.1f}/s, checkpoint {self.model}:{self.last_pk}"
+        )
+
+
+def log_progress(progress: RebuildProgress):
+    LOG.info(f"rebuilding permissions... {progress}")
+
+
+def get_access_controlled_models():
+    """Returns the AccessControlled models, ordered by label."""
+    from django_client_framework.models import AccessControlled
+
+    return sorted(
+        (
+            model
+            for model in AccessControlled.__subclasses__()
+            if not model._meta.abstract
+        ),
+        key=lambda model: model._meta.label_lower,
+    )
+
+
+def rebuild_instances(model, instances):
+    """
+    Resets the permissions of instances, which must all belong to model, with one
+    delete and bulk inserts.
+    """
+    from django_client_framework.models import AccessControlled
+
+    manager = model.get_permissionmanager_class()()
+    if type(manager).reset_perms is not AccessControlled.PermissionManager.reset_perms:
+        # customized reset, cannot be batched
+        for instance in instances:
+            manager.reset_perms(instance)
+        return
+    UserObjectPermission.objects.filter(
+        content_type=ContentType.objects.get_for_model(model),
+        object_pk__in=[str(instance.pk) for instance in instances],
+    ).delete()
+    visibility_index.forget_users(model, [instance.pk for instance in instances])
+    shared_cache.bump_model(model._meta.label_lower)
+    with perm_collector.collect_perms() as grants:
+        for instance in instances:
+            manager.add_perms(instance)
+    bulk_assign_grants(grants)
+
+
+def create_permissions():
+    """
+    Creates the model and field permissions of every model, as named by
+    get_permission_for_model(), so that chunks find them in the registry and
+    worker processes never race to create them.
+    """
+    existing = set(Permission.objects.values_list("content_type_id", "codename"))
+    missing = []
+    for model in apps.get_models():
+        content_type = ContentType.objects.get_for_model(
+            model, for_concrete_model=False
+        )
+        names = [model._meta.model_name] + [
+            f"{model._meta.model_name}__{field.name}"
+            for field in model._meta.get_fields()
+        ]
+        for action in ["view", "change", "add", "delete"]:
+            for name in names:
+                codename = f"{action}_{name}"
+                if (content_type.pk, codename) not in existing:
+                    missing.append(
+                        Permission(content_type=content_type, codename=codename)
+                    )
+    Permission.objects.bulk_create(missing, ignore_conflicts=True)
+
+
+def rebuild_chunk(model_label, pks):
+    """Rebuilds the instances of model_label with the given pks in a transaction."""
+    model = apps.get_model(model_label)
+    with transaction.atomic():
+        rebuild_instances(model, list(model.objects.filter(pk__in=pks).order_by("pk")))
+    return len(pks), pks[-1]
+
+
+def iter_chunks(iterable, chunk_size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def rebuild_permissions(
+    chunk_size=1000,
+    processes=1,
+    resume_from: Optional[Tuple[str, object]] = None,
+    progress=None,
+):
+    """
+    Clears and recreates every permission.
+
+    chunk_size: number of instances collected, written and committed together.
+    processes: when larger than 1, the chunks of each model are rebuilt by a pool
+        of worker processes. This needs a database that accepts concurrent
+        writers, such as PostgreSQL, and raises ValueError on SQLite.
+    resume_from: a (model label, pk) checkpoint reported by progress. Permissions
+        are not cleared and the rebuild continues after that instance.
+    progress: called with a RebuildProgress after every chunk, logs by default.
+
+    Unlike the per-instance reset this replaces, chunks are committed one by one,
+    so permissions are partially missing while the rebuild is running.
+    """
+    progress = progress or log_progress
+    if processes > 1 and connection.vendor == "sqlite":
+        raise ValueError("SQLite does not accept concurrent writers, use processes=1")
+    models = get_access_controlled_models()
+    if resume_from is None:
+        with transaction.atomic():
+            LOG.info("resetting permissions...")
+            clear_permissions()
+            LOG.info("recreating permissions...")
+            default_groups.setup()
+            default_users.setup()
+    else:
+        resume_label, resume_pk = resume_from
+        labels = [model._meta.label_lower for model in models]
+        if resume_label.lower() not in labels:
+            raise ValueError(f"cannot resume from unknown model {resume_label}")
+        models = models[labels.index(resume_label.lower()) :]
+    # the registry and the default groups only remember rows read outside of the
+    # atomic blocks of the chunks, and workers must not race to create permissions
+    create_permissions()
+    permission_registry.preload()
+    for name in default_groups.group_names:
+        getattr(default_groups, name)
+
+    for model in models:
+        label = model._meta.label_lower
+        queryset = model.objects.order_by("pk")
+        if resume_from is not None and label == resume_from[0].lower():
+            queryset = queryset.filter(pk__gt=resume_from[1])
+        total = queryset.count()
+        done = 0
+        start = perf_counter()
+        pk_chunks = iter_chunks(
+            queryset.values_list("pk", flat=True).iterator(chunk_size=chunk_size),
+            chunk_size,
+        )
+        if processes > 1:
+            # the pks are read before forking since workers must not share our
+            # connections
+            pk_chunks = list(pk_chunks)
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=processes, initializer=django.setup
+            ) as executor:
+                for count, last_pk in executor.map(
+                    rebuild_chunk, repeat(label), pk_chunks
+                ):
+                    done += count
+                    progress(
+                        RebuildProgress(
+                            label, last_pk, done, total, perf_counter() - start
+                        )
+                    )
+        else:
+            for pks in pk_chunks:
+                count, last_pk = rebuild_chunk(label, pks)
+                done += count
+                progress(
+                    RebuildProgress(label, last_pk, done, total, perf_counter() - start)
+                )
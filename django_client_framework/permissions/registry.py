@@ -0,0 +1,128 @@
+"""
+Process-wide registry of Permission objects.
+
+Permissions of a content type are loaded with a single query on first use and
+served from memory afterwards. Only permissions that are not in the database yet,
+such as new field permissions, fall back to get_or_create.
+
+Rows are remembered only once they are known to be committed, so that a rolled
+back transaction can never leave a stale Permission in the registry.
+clear_permissions() recreates every Permission with new pks, and bumps a
+generation in the cache so that the registries of other processes are cleared
+too, see shared_cache.GenerationWatch.
+"""
+
+from logging import getLogger
+from threading import RLock
+
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from . import shared_cache
+
+LOG = getLogger(__name__)
+
+
+class PermissionRegistry:
+    def __init__(self):
+        self.__lock = RLock()
+        self.__permissions = {}
+        self.__loaded_content_types = set()
+        # the generation of shared_cache.registry_watch the permissions belong to
+        self.__generation = None
+
+    def __remember(self, content_type_id, permissions):
+        with self.__lock:
+            for perm in permissions:
+                self.__permissions[(content_type_id, perm.codename)] = perm
+
+    def __remember_on_commit(self, content_type_id, permissions):
+        transaction.on_commit(lambda: self.__remember(content_type_id, permissions))
+
+    def preload(self, content_type=None):
+        """
+        Loads every permission of content_type, or of all content types if
+        content_type is None, into memory.
+        """
+        if connection.in_atomic_block:
+            # rows read here may be uncommitted
+            return
+        # the rows are at least as recent as the generation read now, which also
+        # covers the bumps of this process, e.g. by clear_permissions()
+        self.sync(refresh=True)
+        queryset = Permission.objects.select_related("content_type")
+        if content_type is not None:
+            queryset = queryset.filter(content_type=content_type)
+        loaded = {}
+        for perm in queryset:
+            loaded.setdefault(perm.content_type_id, []).append(perm)
+        with self.__lock:
+            for content_type_id, permissions in loaded.items():
+                self.__remember(content_type_id, permissions)
+            if content_type is None:
+                self.__loaded_content_types.update(
+                    ContentType.objects.values_list("pk", flat=True)
+                )
+            else:
+                self.__loaded_content_types.add(content_type.pk)
+
+    def sync(self, refresh=False):
+        """Forgets every permission if another process cleared the registry."""
+        watch = shared_cache.registry_watch
+        generation = watch.refresh() if refresh else watch.current()
+        if generation != self.__generation:
+            with self.__lock:
+                self.__generation = generation
+                self.__permissions.clear()
+                self.__loaded_content_types.clear()
+
+    def get_permission(self, content_type: ContentType, codename: str) -> Permission:
+        self.sync()
+        key = (content_type.pk, codename)
+        perm = self.__permissions.get(key)
+        if perm is not None:
+            return perm
+        if content_type.pk not in self.__loaded_content_types:
+            self.preload(content_type)
+            perm = self.__permissions.get(key)
+            if perm is not None:
+                return perm
+        perm, _created = Permission.objects.get_or_create(
+            content_type=content_type, codename=codename
+        )
+        self.__remember_on_commit(content_type.pk, [perm])
+        return perm
+
+    def forget(self, content_type_id, codename):
+        with self.__lock:
+            self.__permissions.pop((content_type_id, codename), None)
+
+    def clear(self):
+        with self.__lock:
+            self.__permissions.clear()
+            self.__loaded_content_types.clear()
+
+
+permission_registry = PermissionRegistry()
+
+
+@receiver(post_delete, sender=Permission)
+def auto_forget_deleted_permission(sender, instance, **kwargs):
+    permission_registry.forget(instance.content_type_id, instance.codename)
+
+
+@receiver(post_save, sender=Permission)
+def auto_clear_permission_registry_on_change(sender, instance, created, **kwargs):
+    if not created:
+        # the codename may have changed, we don't know the old key
+        permission_registry.clear()
+
+
+@receiver(post_migrate)
+def auto_clear_permission_registry_after_migrate(*args, **kwargs):
+    permission_registry.clear()
+    # migrations may have recreated permissions under running processes
+    shared_cache.bump_registry()
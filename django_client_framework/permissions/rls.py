@@ -0,0 +1,236 @@
+"""
+PostgreSQL row-level security for models using the "rls" permission filter
+backend.
+
+install_policies() creates a SELECT policy on the table of every such model,
+along with permissive INSERT, UPDATE and DELETE policies so that writes, which
+the APIs check on their own, keep working once row-level security is enabled. The
+SELECT policy reads the guardian tables and the model permissions of the principal
+whose user id is stored in the dcf.user_id session variable, and lets every row
+through while the variable is empty. BaseModelAPI stores the requesting user in
+the variable when a read request starts and it is reset when the request finishes,
+so that the collection APIs are filtered by the database planner instead of by
+filter_queryset_by_perms_shortcut().
+
+The policies only cover the view permission on objects and models. Read
+filtering by field permissions, other permissions, writes and code running outside
+of a read request fall back to the "exists" backend. While a principal is set, rows it can
+only see through field permissions or permission rules are hidden by the
+database, so models with permission rules should not use this backend. The
+connecting role must not be a superuser nor have BYPASSRLS, since PostgreSQL
+never applies policies to those.
+"""
+
+from logging import getLogger
+
+from asgiref.local import Local
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.signals import request_finished
+from django.db import connections, router, transaction
+from django.dispatch import receiver
+from guardian import models as gm
+
+LOG = getLogger(__name__)
+
+POLICY_NAME = "dcf_read"
+
+# name -> clauses of the policies letting every write through
+WRITE_POLICIES = {
+    "dcf_insert": "FOR INSERT WITH CHECK (true)",
+    "dcf_update": "FOR UPDATE USING (true) WITH CHECK (true)",
+    "dcf_delete": "FOR DELETE USING (true)",
+}
+
+SESSION_VARIABLE = "dcf.user_id"
+
+_state = Local()
+
+
+def get_rls_models():
+    """Returns the models of BaseModelAPI.models using the rls filter backend."""
+    from django_client_framework.api import BaseModelAPI
+
+    from .site_permission import get_permission_filter_backend
+
+    return [
+        model
+        for model in BaseModelAPI.models
+        if get_permission_filter_backend(model) == "rls"
+    ]
+
+
+def set_principal(user, using="default"):
+    """
+    Makes the policies filter rows for user on the connection using. Superusers
+    are not set as principal and see every row.
+    """
+    if connections[using].vendor != "postgresql":
+        return
+    value = "" if user.is_superuser else str(user.pk)
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT set_config(%s, %s, false)", [SESSION_VARIABLE, value])
+    principals = getattr(_state, "principals", None) or {}
+    principals[using] = user.pk if value else None
+    _state.principals = principals
+
+
+def clear_principal():
+    """Lets every row through the policies again, on every connection used."""
+    principals = getattr(_state, "principals", None)
+    if not principals:
+        return
+    for using in principals:
+        if connections[using].connection is None:
+            # the session, and the variable with it, is already gone
+            continue
+        with connections[using].cursor() as cursor:
+            cursor.execute("SELECT set_config(%s, '', false)", [SESSION_VARIABLE])
+    _state.principals = None
+
+
+def has_principal(using="default"):
+    """Returns True if the policies currently filter rows on the connection using."""
+    principals = getattr(_state, "principals", None) or {}
+    return principals.get(using) is not None
+
+
+def is_principal(user_or_group, model):
+    """Returns True if the policies on model currently filter rows for user_or_group."""
+    if isinstance(user_or_group, Group):
+        return False
+    principals = getattr(_state, "principals", None) or {}
+    pk = principals.get(router.db_for_read(model))
+    return pk is not None and pk == user_or_group.pk
+
+
+def policy_sql(model, connection):
+    """Returns the statements (re)creating the read and write policies of model."""
+    qn = connection.ops.quote_name
+    User = get_user_model()
+    table = qn(model._meta.db_table)
+    object_pk = f"{table}.{qn(model._meta.pk.column)}::text"
+    content_type = ContentType.objects.get_for_model(model, for_concrete_model=False)
+    user_groups = User.groups.through._meta
+    principal = f"nullif(current_setting('{SESSION_VARIABLE}', true), '')::integer"
+    groups = (
+        f"(SELECT {qn(user_groups.get_field('group').column)}"
+        f" FROM {qn(user_groups.db_table)}"
+        f" WHERE {qn(user_groups.get_field('user').column)} = {principal}"
+        f" UNION SELECT id FROM {qn(Group._meta.db_table)} WHERE name = 'anyone')"
+    )
+    user_perms = User.user_permissions.through._meta
+    group_perms = Group.permissions.through._meta
+    uop = qn(gm.UserObjectPermission._meta.db_table)
+    gop = qn(gm.GroupObjectPermission._meta.db_table)
+    # permissions are matched by codename, since clear_permissions() recreates
+    # them with new ids
+    condition = f"""
+        nullif(current_setting('{SESSION_VARIABLE}', true), '') IS NULL
+        OR EXISTS (
+            SELECT 1 FROM {qn(Permission._meta.db_table)} perm
+            WHERE perm.content_type_id = {content_type.pk}
+            AND perm.codename = 'view_{model._meta.model_name}'
+            AND (
+                EXISTS (
+                    SELECT 1 FROM {qn(user_perms.db_table)} up
+                    WHERE up.{qn(user_perms.get_field('permission').column)} = perm.id
+                    AND up.{qn(user_perms.get_field('user').column)} = {principal}
+                )
+                OR EXISTS (
+                    SELECT 1 FROM {qn(group_perms.db_table)} gp
+                    WHERE gp.{qn(group_perms.get_field('permission').column)} = perm.id
+                    AND gp.{qn(group_perms.get_field('group').column)} IN {groups}
+                )
+                OR EXISTS (
+                    SELECT 1 FROM {uop} uop
+                    WHERE uop.permission_id = perm.id
+                    AND uop.content_type_id = {content_type.pk}
+                    AND uop.object_pk = {object_pk}
+                    AND uop.user_id = {principal}
+                )
+                OR EXISTS (
+                    SELECT 1 FROM {gop} gop
+                    WHERE gop.permission_id = perm.id
+                    AND gop.content_type_id = {content_type.pk}
+                    AND gop.object_pk = {object_pk}
+                    AND gop.group_id IN {groups}
+                )
+            )
+        )
+    """
+    statements = [
+        f"DROP POLICY IF EXISTS {POLICY_NAME} ON {table}",
+        f"CREATE POLICY {POLICY_NAME} ON {table} FOR SELECT USING ({condition})",
+    ]
+    # rows a write reads, e.g. in the WHERE clause of an UPDATE or a DELETE or
+    # with RETURNING, are still filtered by the read policy
+    for name, clauses in WRITE_POLICIES.items():
+        statements += [
+            f"DROP POLICY IF EXISTS {name} ON {table}",
+            f"CREATE POLICY {name} ON {table} {clauses}",
+        ]
+    return statements + [
+        f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY",
+        # also apply the policies to the table owner, usually the role Django uses
+        f"ALTER TABLE {table} FORCE ROW LEVEL SECURITY",
+    ]
+
+
+def drop_policy_sql(model, connection):
+    table = connection.ops.quote_name(model._meta.db_table)
+    return [
+        f"ALTER TABLE {table} NO FORCE ROW LEVEL SECURITY",
+        f"ALTER TABLE {table} DISABLE ROW LEVEL SECURITY",
+        f"DROP POLICY IF EXISTS {POLICY_NAME} ON {table}",
+    ] + [f"DROP POLICY IF EXISTS {name} ON {table}" for name in WRITE_POLICIES]
+
+
+def install_policies(models=None):
+    """
+    Creates or refreshes the policies of the given models, every model using
+    the rls backend by default. Returns the models that got a policy.
+    """
+    installed = []
+    for model in get_rls_models() if models is None else models:
+        alias = router.db_for_write(model)
+        connection = connections[alias]
+        if connection.vendor != "postgresql":
+            LOG.warning(f"skipping {model}, row-level security needs PostgreSQL")
+            continue
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            for statement in policy_sql(model, connection):
+                cursor.execute(statement)
+        installed.append(model)
+    return installed
+
+
+def drop_policies(models):
+    """
+    Removes the policies of the given models and disables row-level security
+    on their tables. Tables without a policy installed by install_policies() are
+    left alone.
+    """
+    dropped = []
+    for model in models:
+        alias = router.db_for_write(model)
+        connection = connections[alias]
+        if connection.vendor != "postgresql":
+            continue
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_policies WHERE tablename = %s AND policyname = %s",
+                [model._meta.db_table, POLICY_NAME],
+            )
+            if cursor.fetchone() is None:
+                continue
+            for statement in drop_policy_sql(model, connection):
+                cursor.execute(statement)
+        dropped.append(model)
+    return dropped
+
+
+@receiver(request_finished)
+def auto_clear_rls_principal_after_request(*args, **kwargs):
+    clear_principal()
@@ -0,0 +1,204 @@
+"""
+Declarative permission rules.
+
+A PermissionManager can declare rules granting permissions on the instances that
+match a predicate, instead of writing guardian rows for every instance:
+
+    class PermissionManager(AccessControlled.PermissionManager):
+        rules = [
+            PermissionRule("r", Q(published=True)),
+            PermissionRule(
+                "rw",
+                lambda user_or_group: Q(owner=user_or_group)
+                if isinstance(user_or_group, User)
+                else None,
+            ),
+        ]
+
+A predicate is a Q object over the model's own fields, or a callable receiving
+the user or group being checked and returning such a Q object, or None if the
+rule doesn't apply to it, e.g. to a group. Comparing a relation with an instance
+of another model never matches. filter_queryset_by_perms_shortcut() adds the predicates
+to the SQL filter and has_perms_shortcut() evaluates them against the instance,
+in Python when the lookups allow it and with a query otherwise. Rules coexist
+with guardian rows, which remain useful for exceptions.
+"""
+
+import operator
+from typing import Callable, NamedTuple, Optional, Union
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models as m
+
+RulePredicate = Union[m.Q, Callable[[m.Model], Optional[m.Q]]]
+
+
+class PermissionRule(NamedTuple):
+    perms: str
+    predicate: RulePredicate
+    # the rule grants field permissions on field_name if given
+    field_name: Optional[str] = None
+
+
+LOOKUP_OPERATORS = {
+    "exact": operator.eq,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "in": lambda actual, value: actual in value,
+    "isnull": lambda actual, value: (actual is None) == value,
+}
+
+
+def get_permission_rules(model):
+    manager = getattr(model, "PermissionManager", None)
+    return getattr(manager, "rules", None) or []
+
+
+def resolve_predicate(rule: PermissionRule, user_or_group) -> Optional[m.Q]:
+    if isinstance(rule.predicate, m.Q):
+        return rule.predicate
+    return rule.predicate(user_or_group)
+
+
+def rule_predicates(model, user_or_group, perm, field_name=None):
+    """
+    Returns the predicates of the rules of model granting perm, a single letter, to
+    user_or_group on the object or on field_name.
+    """
+    predicates = []
+    for rule in get_permission_rules(model):
+        if perm not in rule.perms.lower():
+            continue
+        if rule.field_name is not None and rule.field_name != field_name:
+            continue
+        predicate = resolve_predicate(rule, user_or_group)
+        if predicate is not None:
+            predicates.append(predicate)
+    return predicates
+
+
+def rule_condition(model, user_or_group, perm, field_name=None) -> Optional[m.Q]:
+    """
+    Returns a Q matching the instances of model on which a rule grants perm to
+    user_or_group, or None if no rule applies.
+    """
+    condition = None
+    for predicate in rule_predicates(model, user_or_group, perm, field_name):
+        condition = predicate if condition is None else condition | predicate
+    return condition
+
+
+def rule_grants(user_or_group, instance, perm, field_name=None):
+    """Returns True if a rule grants perm to user_or_group on instance."""
+    return rule_grants_many(user_or_group, instance, [(perm, field_name)])[
+        (perm, field_name)
+    ]
+
+
+def rule_grants_many(user_or_group, instance, checks):
+    """
+    Returns {(perm, field_name): decision} for the (perm, field_name) pairs in
+    checks, like rule_grants(), evaluating the predicates that cannot be evaluated
+    in Python with a single query.
+    """
+    model = instance._meta.model
+    decisions = {}
+    # predicates left to the database
+    unresolved = []
+    # check -> indexes into unresolved
+    pending = {}
+    for check in checks:
+        if check in decisions:
+            continue
+        decisions[check] = False
+        for predicate in rule_predicates(model, user_or_group, *check):
+            matches = evaluate_predicate(predicate, instance)
+            if matches is None:
+                if predicate not in unresolved:
+                    unresolved.append(predicate)
+                pending.setdefault(check, []).append(unresolved.index(predicate))
+            elif matches:
+                decisions[check] = True
+                pending.pop(check, None)
+                break
+    if pending:
+        manager = model._default_manager
+        used = {index for indexes in pending.values() for index in indexes}
+        row = (
+            manager.filter(pk=instance.pk)
+            .values(
+                **{
+                    f"rule_{index}": m.Exists(
+                        manager.filter(unresolved[index], pk=m.OuterRef("pk"))
+                    )
+                    for index in used
+                }
+            )
+            .first()
+        )
+        for check, indexes in pending.items():
+            decisions[check] = row is not None and any(
+                row[f"rule_{index}"] for index in indexes
+            )
+    return decisions
+
+
+def evaluate_predicate(predicate: m.Q, instance) -> Optional[bool]:
+    """
+    Evaluates predicate against the field values of instance. Returns None if the
+    predicate uses lookups that cannot be evaluated in Python, such as lookups
+    spanning relations or expressions.
+    """
+    results = []
+    for child in predicate.children:
+        if isinstance(child, m.Q):
+            result = evaluate_predicate(child, instance)
+        else:
+            result = evaluate_lookup(instance, *child)
+        if result is None:
+            return None
+        results.append(result)
+    if predicate.connector == m.Q.AND:
+        result = all(results)
+    else:
+        result = any(results)
+    return not result if predicate.negated else result
+
+
+def evaluate_lookup(instance, lookup, value) -> Optional[bool]:
+    parts = lookup.split("__")
+    lookup_name = "exact"
+    if len(parts) > 1 and parts[-1] in LOOKUP_OPERATORS:
+        lookup_name = parts.pop()
+    if len(parts) != 1 or hasattr(value, "resolve_expression"):
+        return None
+    if parts[0] == "pk":
+        parts[0] = instance._meta.pk.name
+    try:
+        field = instance._meta.get_field(parts[0])
+    except FieldDoesNotExist:
+        return None
+    if not field.concrete or field.many_to_many:
+        return None
+    if field.is_relation:
+        # instances of other models never match, unlike their pks
+        related_model = field.related_model
+        if lookup_name == "in":
+            value = [
+                v.pk if isinstance(v, m.Model) else v
+                for v in value
+                if not isinstance(v, m.Model) or isinstance(v, related_model)
+            ]
+        elif isinstance(value, m.Model):
+            if not isinstance(value, related_model):
+                return False
+            value = value.pk
+    actual = getattr(instance, field.attname)
+    if actual is None and lookup_name not in ("exact", "isnull"):
+        return False
+    try:
+        return bool(LOOKUP_OPERATORS[lookup_name](actual, value))
+    except TypeError:
+        return None
@@ -0,0 +1,246 @@
+"""
+Optional permission decision cache shared by every process, built on Django's cache
+framework. Enable it by naming a cache alias in settings.DCF_PERMISSION_CACHE;
+entries expire after settings.DCF_PERMISSION_CACHE_TIMEOUT seconds (300 by
+default).
+
+Keys embed generation counters instead of being deleted one by one: a global
+generation bumped by clear_permissions(), one generation per model bumped whenever
+permissions on the model or its instances change, and one generation per
+principal bumped when its groups, model permissions or user row change.
+
+Two more generations are kept even when the shared cache is disabled, in the
+default cache then: those of the permission registry and of the group snapshots.
+They tell every process when another one invalidated these process-wide caches,
+see GenerationWatch.
+"""
+
+from logging import getLogger
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+LOG = getLogger(__name__)
+
+KEY_PREFIX = "dcf:perm"
+
+
+def get_cache():
+    """Returns the configured cache, or None if the shared cache is disabled."""
+    alias = getattr(settings, "DCF_PERMISSION_CACHE", None)
+    return caches[alias] if alias else None
+
+
+def get_generation_cache():
+    """Returns the shared cache if enabled, and the default cache otherwise."""
+    return get_cache() or caches[DEFAULT_CACHE_ALIAS]
+
+
+def get_timeout():
+    return getattr(settings, "DCF_PERMISSION_CACHE_TIMEOUT", 300)
+
+
+def global_generation_key():
+    return f"{KEY_PREFIX}:gen"
+
+
+def model_generation_key(model_label):
+    return f"{KEY_PREFIX}:gen:model:{model_label}"
+
+
+def principal_generation_key(principal_key):
+    label, pk = principal_key
+    return f"{KEY_PREFIX}:gen:principal:{label}:{pk}"
+
+
+def registry_generation_key():
+    return f"{KEY_PREFIX}:gen:registry"
+
+
+def snapshot_generation_key():
+    return f"{KEY_PREFIX}:gen:snapshots"
+
+
+def _incr(cache, key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # missing keys count as generation 0
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def bump(key, cache=None):
+    """
+    Bumps a generation now, so that this transaction stops reading stale entries,
+    and again after commit, so that entries other processes cached from the
+    uncommitted state in between are discarded too.
+    """
+    cache = get_cache() if cache is None else cache
+    if cache is None:
+        return
+    _incr(cache, key)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _incr(cache, key))
+
+
+def bump_global():
+    bump(global_generation_key())
+
+
+def bump_model(model_label):
+    bump(model_generation_key(model_label))
+
+
+def bump_principal(principal_key):
+    bump(principal_generation_key(principal_key))
+
+
+def bump_registry():
+    bump(registry_generation_key(), get_generation_cache())
+
+
+def bump_snapshots():
+    bump(snapshot_generation_key(), get_generation_cache())
+
+
+class GenerationWatch:
+    """
+    Follows a generation of the generation cache for a process-wide cache, which
+    compares current() with the generation it was loaded under. The generation is
+    read at most every settings.DCF_PROCESS_CACHE_CHECK_INTERVAL seconds (1 by
+    default), or whenever update() receives it from a read of the caller.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.__lock = Lock()
+        self.__generation = None
+        self.__checked_at = None
+
+    def current(self):
+        interval = getattr(settings, "DCF_PROCESS_CACHE_CHECK_INTERVAL", 1)
+        checked_at = self.__checked_at
+        if checked_at is None or monotonic() - checked_at >= interval:
+            return self.refresh()
+        return self.__generation
+
+    def refresh(self):
+        """Reads the generation now, e.g. before loading from committed rows."""
+        self.update(get_generation_cache().get(self.key, 0))
+        return self.__generation
+
+    def update(self, generation):
+        with self.__lock:
+            self.__generation = generation
+            self.__checked_at = monotonic()
+
+
+registry_watch = GenerationWatch(registry_generation_key())
+
+snapshot_watch = GenerationWatch(snapshot_generation_key())
+
+
+def get_generations(model_label, principal_key):
+    """
+    Returns the global, model, principal and group snapshot generations as a
+    string, changing whenever permissions of principal_key on model_label may have
+    changed. The snapshot generation is passed on to snapshot_watch, so that
+    decisions are never cached from outdated group snapshots.
+    """
+    gen_keys = [
+        global_generation_key(),
+        model_generation_key(model_label),
+        principal_generation_key(principal_key),
+        snapshot_generation_key(),
+    ]
+    gens = get_cache().get_many(gen_keys)
+    snapshot_watch.update(gens.get(snapshot_generation_key(), 0))
+    return ".".join(str(gens.get(key, 0)) for key in gen_keys)
+
+
+def make_cache_key(decision_key):
+    """
+    Turns a perm_cache decision key into a key of the shared cache, embedding the
+    current generations. Returns None if the shared cache is disabled.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    principal_key, model_label, pk, perm, field_name = decision_key
+    generations = get_generations(model_label, principal_key)
+    label, principal_pk = principal_key
+    return (
+        f"{KEY_PREFIX}:{generations}:{label}:{principal_pk}:{model_label}:{pk}"
+        f":{perm}:{field_name or ''}"
+    )
+
+
+def get_decision(cache_key):
+    if cache_key is None:
+        return None
+    return get_cache().get(cache_key)
+
+
+def set_decision(cache_key, decision):
+    if cache_key is not None:
+        get_cache().set(cache_key, decision, timeout=get_timeout())
+
+
+def principal_keys_for_users(user_pks):
+    label = get_user_model()._meta.label_lower
+    return [(label, pk) for pk in user_pks]
+
+
+@receiver(m2m_changed)
+def auto_bump_generation_on_principal_change(
+    sender, instance, action, pk_set, **kwargs
+):
+    """
+    Bumps the generations of users whose groups or model permissions changed, and
+    the global generation when the model permissions of a group changed.
+    """
+    if get_cache() is None or not action.startswith("post_"):
+        return
+    User = get_user_model()
+    if sender is Group.permissions.through:
+        bump_global()
+    elif sender in (User.groups.through, User.user_permissions.through):
+        if isinstance(instance, User):
+            bump_principal((instance._meta.label_lower, instance.pk))
+        elif pk_set is None:
+            # cleared from the reverse side, we don't know the users
+            bump_global()
+        else:
+            for key in principal_keys_for_users(pk_set):
+                bump_principal(key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def auto_bump_generation_on_user_change(
+    sender, instance, created, update_fields=None, **kwargs
+):
+    """
+    Bumps the generation of a saved user, since decisions depend on is_active and
+    is_superuser. Saves only updating other fields, e.g. last_login, are skipped.
+    """
+    if get_cache() is None or created:
+        return
+    if update_fields is not None and not {"is_active", "is_superuser"} & set(
+        update_fields
+    ):
+        return
+    bump_principal((instance._meta.label_lower, instance.pk))
+
+
+@receiver(post_delete, sender=Group)
+def auto_bump_generation_on_group_delete(sender, **kwargs):
+    if get_cache() is not None:
+        bump_global()
@@ -1,15 +1,31 @@
+from itertools import chain
 from logging import getLogger
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
 from django.db import models as m
 from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.db.models.base import ModelBase
+from django.db.models.functions import Cast
 from guardian import models as gm
 from guardian import shortcuts as gs
 from deprecation import deprecated
-from . import default_groups
+from . import (
+    default_groups,
+    group_snapshot,
+    perm_cache,
+    perm_collector,
+    rls,
+    rules,
+    shared_cache,
+    tracing,
+    visibility_index,
+)
+from .registry import permission_registry
 
 LOG = getLogger(__name__)
 
@@ -20,6 +36,7 @@ def get_permission_for_model(
     """
     Returns permission object for model and field.
     If string is True, then returns the Permission object's full codename as string.
+    Permission objects are served from the process-wide permission_registry.
     """
     action_shortcuts = {
         "r": "view",
@@ -34,13 +51,11 @@ def get_permission_for_model(
             raise AttributeError(
                 f'field named "{field_name}" not found on model {model}'
             )
-        p, _created = Permission.objects.get_or_create(
-            content_type=c, codename=f"{action}_{model._meta.model_name}__{field_name}"
+        p = permission_registry.get_permission(
+            c, f"{action}_{model._meta.model_name}__{field_name}"
         )
     else:
-        p, _created = Permission.objects.get_or_create(
-            content_type=c, codename=f"{action}_{model._meta.model_name}"
-        )
+        p = permission_registry.get_permission(c, f"{action}_{model._meta.model_name}")
     if string:
         if app_label:
             return f"{c.app_label}.{p.codename}"
@@ -50,6 +65,29 @@ def get_permission_for_model(
         return p
 
 
+PERMISSION_FILTER_BACKENDS = ("guardian", "exists", "index", "rls")
+
+
+def get_permission_filter_backend(model):
+    """
+    Returns the name of the engine used to filter querysets of model by permission.
+    A model can choose its engine with a permission_filter_backend class attribute,
+    otherwise settings.DCF_PERMISSION_FILTER_BACKEND applies, which defaults to
+    "guardian". The "index" backend reads the materialized visibility index, see
+    visibility_index, and the "rls" backend relies on PostgreSQL row-level
+    security policies, see rls.
+    """
+    backend = getattr(model, "permission_filter_backend", None) or getattr(
+        settings, "DCF_PERMISSION_FILTER_BACKEND", "guardian"
+    )
+    if backend not in PERMISSION_FILTER_BACKENDS:
+        raise ImproperlyConfigured(
+            f"Unknown permission filter backend {backend!r} for {model},"
+            f" valid backends are: {PERMISSION_FILTER_BACKENDS}"
+        )
+    return backend
+
+
 def filter_queryset_by_perms_shortcut(perms, user_or_group, queryset, field_name=None):
     r"""
     Filters queryset by keeping objects that user_or_group has all permissions
@@ -65,6 +103,61 @@ def filter_queryset_by_perms_shortcut(perms, user_or_group, queryset, field_name
         B0 = A0 union A1, g=0
         B1 = A0 union A1, g=1
         B0 union B1
+
+    The filtering engine is chosen by get_permission_filter_backend(). Superusers
+    and holders of the model permissions, directly, through a group or through
+    the anyone group, get the queryset back unfiltered. Objects matching the
+    permission rules of the model are kept as well, see rules.
+    """
+    if has_perms_shortcut(user_or_group, queryset.model, perms, field_name):
+        return queryset
+    if not rules.get_permission_rules(queryset.model):
+        return filter_queryset_by_perms_backend(
+            perms, user_or_group, queryset, field_name
+        )
+    # every permission is either granted by a rule or by the backend
+    condition = m.Q()
+    for s in perms.lower():
+        if has_perms_shortcut(user_or_group, queryset.model, s, field_name):
+            continue
+        granted = filter_queryset_by_perms_backend(
+            s, user_or_group, queryset.model._default_manager.all(), field_name
+        )
+        letter_condition = m.Q(pk__in=granted.values("pk"))
+        rule_condition = rules.rule_condition(
+            queryset.model, user_or_group, s, field_name
+        )
+        if rule_condition is not None:
+            letter_condition |= rule_condition
+        condition &= letter_condition
+    return queryset.filter(condition)
+
+
+def filter_queryset_by_perms_backend(perms, user_or_group, queryset, field_name=None):
+    """
+    Filters queryset with the engine chosen by get_permission_filter_backend(),
+    without considering permission rules.
+    """
+    backend = get_permission_filter_backend(queryset.model)
+    if backend == "exists":
+        return filter_queryset_by_perms_exists(
+            perms, user_or_group, queryset, field_name
+        )
+    elif backend == "index":
+        return filter_queryset_by_perms_index(
+            perms, user_or_group, queryset, field_name
+        )
+    elif backend == "rls":
+        return filter_queryset_by_perms_rls(perms, user_or_group, queryset, field_name)
+    else:
+        return filter_queryset_by_perms_guardian(
+            perms, user_or_group, queryset, field_name
+        )
+
+
+def filter_queryset_by_perms_guardian(perms, user_or_group, queryset, field_name=None):
+    """
+    Unions the querysets returned by guardian.shortcuts.get_objects_for_user/group.
     """
     union = queryset.model.objects.none()
     for u in set([user_or_group, default_groups.anyone]):  # B
@@ -87,12 +180,131 @@ def filter_queryset_by_perms_shortcut(perms, user_or_group, queryset, field_name
     return union
 
 
+def filter_queryset_by_perms_exists(perms, user_or_group, queryset, field_name=None):
+    """
+    Produces the same result as filter_queryset_by_perms_guardian(), but as a single
+    queryset filtered by correlated EXISTS subqueries against the guardian object
+    permission tables. Permissions held globally are checked up front and need no
+    subquery; if they cover all perms the queryset is returned unfiltered.
+    """
+    User = get_user_model()
+    if isinstance(user_or_group, User) and user_or_group.is_superuser:
+        return queryset
+    object_pk = Cast(OuterRef("pk"), output_field=m.CharField())
+    condition = None
+    for u in set([user_or_group, default_groups.anyone]):
+        # group ids are resolved up front so that the subqueries can use the
+        # (group, permission, object_pk) unique index
+        group_ids = (
+            None
+            if isinstance(u, Group)
+            else list(u.groups.values_list("pk", flat=True))
+        )
+        for f in set([None, field_name]):
+            branch = m.Q()
+            for s in perms.lower():
+                perm = get_permission_for_model(s, queryset.model, field_name=f)
+                if not has_model_perm(u, perm):
+                    branch &= m.Q(object_perm_exists(u, perm, object_pk, group_ids))
+            if not branch:
+                # every permission is granted on the model
+                return queryset
+            condition = branch if condition is None else condition | branch
+    return queryset.filter(condition)
+
+
+def filter_queryset_by_perms_index(perms, user_or_group, queryset, field_name=None):
+    """
+    Produces the same result as filter_queryset_by_perms_exists(), but the
+    subqueries read the materialized visibility index, where every permission of
+    a principal on an object is one row of a single table.
+    """
+    User = get_user_model()
+    if isinstance(user_or_group, User) and user_or_group.is_superuser:
+        return queryset
+    content_type = visibility_index.get_content_type(queryset.model)
+    object_pk = Cast(OuterRef("pk"), output_field=m.CharField())
+    condition = None
+    for u in set([user_or_group, default_groups.anyone]):
+        if isinstance(u, Group):
+            principals = m.Q(group=u)
+        else:
+            principals = m.Q(user=u) | m.Q(
+                group_id__in=list(u.groups.values_list("pk", flat=True))
+            )
+        for f in set([None, field_name]):
+            branch = m.Q()
+            for s in perms.lower():
+                perm = get_permission_for_model(s, queryset.model, field_name=f)
+                if not has_model_perm(u, perm):
+                    branch &= m.Q(
+                        visibility_index.entry_exists(
+                            content_type, object_pk, principals, s, f
+                        )
+                    )
+            if not branch:
+                # every permission is granted on the model
+                return queryset
+            condition = branch if condition is None else condition | branch
+    return queryset.filter(condition)
+
+
+def filter_queryset_by_perms_rls(perms, user_or_group, queryset, field_name=None):
+    """
+    Returns queryset as is when the row-level security policy of its model already
+    filters rows readable by user_or_group, see rls. Other checks are delegated to
+    filter_queryset_by_perms_exists().
+    """
+    if perms.lower() == "r" and not field_name:
+        if rls.is_principal(user_or_group, queryset.model):
+            return queryset
+    return filter_queryset_by_perms_exists(perms, user_or_group, queryset, field_name)
+
+
+def has_model_perm(user_or_group, perm: Permission):
+    """
+    Returns True if user_or_group holds perm on the model level, either directly or
+    through one of the user's groups.
+    """
+    if isinstance(user_or_group, Group):
+        return user_or_group.permissions.filter(pk=perm.pk).exists()
+    else:
+        return user_or_group.has_perm(f"{perm.content_type.app_label}.{perm.codename}")
+
+
+def object_perm_exists(user_or_group, perm: Permission, object_pk, group_ids=None):
+    """
+    Returns an Exists expression that is true when user_or_group, or one of the
+    user's groups, holds perm on the object whose primary key is object_pk. The
+    user's group ids are looked up unless group_ids is given.
+    """
+    group_perms = gm.GroupObjectPermission.objects.filter(
+        permission=perm, content_type_id=perm.content_type_id, object_pk=object_pk
+    )
+    if isinstance(user_or_group, Group):
+        return Exists(group_perms.filter(group=user_or_group))
+    exists = Exists(
+        gm.UserObjectPermission.objects.filter(
+            user=user_or_group,
+            permission=perm,
+            content_type_id=perm.content_type_id,
+            object_pk=object_pk,
+        )
+    )
+    if group_ids is None:
+        group_ids = list(user_or_group.groups.values_list("pk", flat=True))
+    if group_ids:
+        exists |= Exists(group_perms.filter(group_id__in=group_ids))
+    return exists
+
+
 def add_perms_shortcut(
     user_or_group, model_or_instance_or_queryset, perms, field_name=None
 ):
     """
     Adds model or object permission depending on whether model_or_instance_or_queryset
-    is a model.
+    is a model. Inside perm_collector.collect_perms(), the permissions are collected
+    instead of written.
     """
     LOG.debug(f"{user_or_group=} {model_or_instance_or_queryset=} {perms=}")
 
@@ -109,9 +321,30 @@ def add_perms_shortcut(
         raise TypeError(
             f"model_or_instance_or_queryset has wrong type: {type(model_or_instance_or_queryset)}"
         )
+    collection = perm_collector.get_collection()
     for s in perms.lower():
-        permstr = get_permission_for_model(s, model, string=True, field_name=field_name)
-        gs.assign_perm(permstr, user_or_group, obj=instance)
+        perm = get_permission_for_model(s, model, field_name=field_name)
+        if collection is not None:
+            collection.append(perm_collector.PermGrant(user_or_group, perm, instance))
+        else:
+            gs.assign_perm(perm, user_or_group, obj=instance)
+    if collection is None:
+        if isinstance(instance, m.Model):
+            visibility_index.grant(
+                user_or_group, model, [instance.pk], perms, field_name
+            )
+        elif instance is not None:
+            visibility_index.grant(
+                user_or_group,
+                model,
+                instance.values_list("pk", flat=True),
+                perms,
+                field_name,
+            )
+        perm_cache.invalidate()
+        if group_snapshot.is_snapshotted(user_or_group):
+            group_snapshot.invalidate()
+        shared_cache.bump_model(model._meta.label_lower)
 
 
 @deprecated(details="use add_perms_shortcut(...) instead")
@@ -128,6 +361,9 @@ def has_perms_shortcut(user_or_group, model_or_instance, perms, field_name=None)
     Check if user has all permissions as indicated by perms. For example, when
     perms="rw", returns True only if the user has both read and write
     permissions. Model permission > object permission > field permission.
+
+    Decisions are memoized for the duration of the current request, see
+    perm_cache, and in the shared cache when one is configured, see shared_cache.
     """
     User = get_user_model()
 
@@ -141,47 +377,274 @@ def has_perms_shortcut(user_or_group, model_or_instance, perms, field_name=None)
         raise TypeError(f"model_or_instance has wrong type: {type(model_or_instance)}")
 
     if isinstance(user_or_group, User) and user_or_group.is_superuser:
+        if tracing.is_active():
+            for s in perms.lower():
+                tracing.record(
+                    perm_cache.principal_key(user_or_group),
+                    model._meta.label_lower,
+                    instance.pk if instance is not None else None,
+                    s,
+                    field_name,
+                    True,
+                    "superuser",
+                )
         return True
 
-    def disjunction(s):
-        for u in set([default_groups.anyone, user_or_group]):
+    def sources(s):
+        """Yields the name of every branch granting s, see tracing."""
+        anyone = default_groups.anyone
+        for u in set([anyone, user_or_group]):
+            if u == anyone:
+                principal = "anyone"
+            else:
+                principal = "group" if isinstance(u, Group) else "user"
             for f in set([None, field_name]):
+                suffix = ".field" if f else ""
                 perm = get_permission_for_model(s, model, field_name=f)
+                # object permissions prefetched for the page being rendered
+                checker = (
+                    perm_cache.get_primed_checker(u, instance) if instance else None
+                )
                 if isinstance(u, Group):
+                    snapshot = group_snapshot.get_snapshot(u)
                     # check group model permission
-                    if u.permissions.filter(pk=perm.pk).exists():
-                        yield True
+                    if snapshot:
+                        has_model_perm = perm.pk in snapshot.model_perm_ids
+                    else:
+                        has_model_perm = u.permissions.filter(pk=perm.pk).exists()
+                    if has_model_perm:
+                        yield f"{principal}.model{suffix}"
                     # check group object permission
-                    if (
-                        instance
-                        and gm.GroupObjectPermission.objects.filter(
+                    if not instance:
+                        continue
+                    if checker:
+                        has_object_perm = checker.has_perm(perm.codename, instance)
+                    elif snapshot and snapshot.object_pks is not None:
+                        has_object_perm = snapshot.has_object_perm(perm, instance.pk)
+                    else:
+                        has_object_perm = gm.GroupObjectPermission.objects.filter(
                             group=u,
                             permission=perm,
                             content_type=perm.content_type,
                             object_pk=instance.pk,
                         ).exists()
-                    ):
-                        yield True
+                    if has_object_perm:
+                        yield f"{principal}.object{suffix}"
                 else:
                     # check user model permission
                     name = f"{perm.content_type.app_label}.{perm.codename}"
                     if u.has_perm(name):
-                        yield True
+                        yield f"{principal}.model{suffix}"
+                    # check object permission shared with the logged_in group
+                    snapshot = (
+                        group_snapshot.get_default_snapshot("logged_in")
+                        if instance
+                        else None
+                    )
+                    if (
+                        snapshot
+                        and u.is_active
+                        and snapshot.has_object_perm(perm, instance.pk)
+                        and group_snapshot.is_member(u, snapshot.group_id)
+                    ):
+                        yield f"logged_in.object{suffix}"
                     # check user object permission
-                    if u.has_perm(name, instance):
-                        yield True
-        yield False
+                    if checker:
+                        if checker.has_perm(perm.codename, instance):
+                            yield f"{principal}.object{suffix}"
+                    elif u.has_perm(name, instance):
+                        yield f"{principal}.object{suffix}"
+        # check permission rules
+        if instance and rules.rule_grants(user_or_group, instance, s, field_name):
+            yield "rule"
+
+    def decide(s, key):
+        """Returns the decision on s and its source."""
+        decision = perm_cache.get_decision(key)
+        if decision is not None:
+            return decision, "cache"
+        shared_key = shared_cache.make_cache_key(key)
+        decision = shared_cache.get_decision(shared_key)
+        if decision is not None:
+            source = "shared_cache"
+        else:
+            source = next(sources(s), "denied")
+            decision = source != "denied"
+            shared_cache.set_decision(shared_key, decision)
+        perm_cache.set_decision(key, decision)
+        return decision, source
 
     def conjunction():
         for s in perms.lower():
-            if any(disjunction(s)):
-                yield True
+            key = perm_cache.make_key(user_or_group, model, instance, s, field_name)
+            if tracing.is_active():
+                with tracing.measure() as measurement:
+                    decision, source = decide(s, key)
+                tracing.record(*key, decision, source, measurement)
             else:
-                yield False
+                decision, _source = decide(s, key)
+            yield decision
 
     return all(conjunction())
 
 
+def get_granted_perm_ids(user_or_group, model, permissions, object_pks):
+    """
+    Looks up which of permissions, a list of Permission objects of model, are held
+    by user_or_group or the anyone group, with a fixed number of queries. Returns
+    the ids of the permissions held on the model, and a dict mapping each of
+    object_pks (as strings) to the ids of the permissions held on that object.
+    """
+    principals = set([default_groups.anyone, user_or_group])
+    perm_ids = [perm.pk for perm in permissions]
+
+    # model permissions
+    groups = [u for u in principals if isinstance(u, Group)]
+    users = [u for u in principals if not isinstance(u, Group) and u.is_active]
+    model_perm_ids = set(
+        Permission.objects.filter(group__in=groups, pk__in=perm_ids).values_list(
+            "pk", flat=True
+        )
+    )
+    for u in users:
+        for perm in permissions:
+            if u.has_perm(f"{perm.content_type.app_label}.{perm.codename}"):
+                model_perm_ids.add(perm.pk)
+
+    # object permissions, including those the users have through their groups
+    content_type = ContentType.objects.get_for_model(model, for_concrete_model=False)
+    group_ids = [u.pk for u in groups]
+    if users:
+        group_ids += list(
+            Group.objects.filter(user__in=users).values_list("pk", flat=True)
+        )
+    object_perm_ids = {}
+    for object_pk, perm_id in chain(
+        gm.UserObjectPermission.objects.filter(
+            user__in=users,
+            permission_id__in=perm_ids,
+            content_type=content_type,
+            object_pk__in=object_pks,
+        ).values_list("object_pk", "permission_id"),
+        gm.GroupObjectPermission.objects.filter(
+            group_id__in=group_ids,
+            permission_id__in=perm_ids,
+            content_type=content_type,
+            object_pk__in=object_pks,
+        ).values_list("object_pk", "permission_id"),
+    ):
+        object_perm_ids.setdefault(object_pk, set()).add(perm_id)
+    return model_perm_ids, object_perm_ids
+
+
+def has_perms_many(user_or_group, instances, perms, field_name=None):
+    """
+    Same as has_perms_shortcut(), but checks many instances of one model at once
+    with a fixed number of queries regardless of how many instances are given.
+    Returns a dict mapping each instance's pk to the decision.
+    """
+    instances = list(instances)
+    if not instances:
+        return {}
+    model = instances[0]._meta.model
+    User = get_user_model()
+    if isinstance(user_or_group, User) and user_or_group.is_superuser:
+        return {instance.pk: True for instance in instances}
+
+    with tracing.trace_batch() as trace:
+        letters = perms.lower()
+        perm_table = {
+            (s, f): get_permission_for_model(s, model, field_name=f)
+            for s in letters
+            for f in set([None, field_name])
+        }
+        model_perm_ids, object_perm_ids = get_granted_perm_ids(
+            user_or_group,
+            model,
+            list(perm_table.values()),
+            [str(instance.pk) for instance in instances],
+        )
+
+        # instances matching permission rules, one query per letter
+        rule_pks = {}
+        for s in letters:
+            condition = rules.rule_condition(model, user_or_group, s, field_name)
+            if condition is not None:
+                rule_pks[s] = set(
+                    model._default_manager.filter(
+                        condition, pk__in=[instance.pk for instance in instances]
+                    ).values_list("pk", flat=True)
+                )
+
+        result = {}
+        for instance in instances:
+            granted = model_perm_ids | object_perm_ids.get(str(instance.pk), set())
+            decision = True
+            for s in letters:
+                letter_decision = any(
+                    perm.pk in granted for (t, _f), perm in perm_table.items() if t == s
+                ) or instance.pk in rule_pks.get(s, ())
+                key = perm_cache.make_key(user_or_group, model, instance, s, field_name)
+                perm_cache.set_decision(key, letter_decision)
+                trace(key, letter_decision)
+                decision = decision and letter_decision
+            result[instance.pk] = decision
+    return result
+
+
+def has_field_perms(user_or_group, instance, perms, field_names):
+    """
+    Same as calling has_perms_shortcut(user_or_group, instance, perms, field_name)
+    for every field name in field_names, but with a fixed number of queries
+    regardless of how many fields are given. Returns a dict mapping each field name
+    to the decision.
+    """
+    field_names = list(field_names)
+    User = get_user_model()
+    if isinstance(user_or_group, User) and user_or_group.is_superuser:
+        return {field_name: True for field_name in field_names}
+
+    with tracing.trace_batch() as trace:
+        model = instance._meta.model
+        letters = perms.lower()
+        perm_table = {
+            (s, f): get_permission_for_model(s, model, field_name=f)
+            for s in letters
+            for f in set([None, *field_names])
+        }
+        model_perm_ids, object_perm_ids = get_granted_perm_ids(
+            user_or_group, model, list(perm_table.values()), [str(instance.pk)]
+        )
+        granted = model_perm_ids | object_perm_ids.get(str(instance.pk), set())
+        rule_decisions = rules.rule_grants_many(
+            user_or_group,
+            instance,
+            [
+                (s, field_name)
+                for field_name in field_names
+                for s in letters
+                if perm_table[(s, None)].pk not in granted
+                and perm_table[(s, field_name)].pk not in granted
+            ],
+        )
+
+        result = {}
+        for field_name in field_names:
+            decision = True
+            for s in letters:
+                letter_decision = (
+                    perm_table[(s, None)].pk in granted
+                    or perm_table[(s, field_name)].pk in granted
+                    or rule_decisions[(s, field_name)]
+                )
+                key = perm_cache.make_key(user_or_group, model, instance, s, field_name)
+                perm_cache.set_decision(key, letter_decision)
+                trace(key, letter_decision)
+                decision = decision and letter_decision
+            result[field_name] = decision
+    return result
+
+
 def clear_permissions():
     LOG.info("clearing permissions...")
     with transaction.atomic():
@@ -191,29 +654,253 @@ def clear_permissions():
         # We need the logged_in group to survive migration, otherwise users who are using
         # the site when the migration happens would see permission errors after migration.
         Group.objects.exclude(m.Q(name="anyone") | m.Q(name="logged_in")).delete()
+        visibility_index.clear()
+    permission_registry.clear()
+    shared_cache.bump_registry()
+    perm_cache.invalidate()
+    group_snapshot.invalidate()
+    shared_cache.bump_global()
 
 
-def reset_permissions():
-    with transaction.atomic():
-        LOG.info("resetting permissions...")
+def bulk_assign_grants(grants, batch_size=1000):
+    """
+    Writes PermGrant tuples collected by perm_collector.collect_perms(). Permission
+    rows are inserted with bulk_create, repeated grants are written once.
+    """
+    User = get_user_model()
+    user_rows = set()
+    group_rows = set()
+    user_model_rows = set()
+    group_model_rows = set()
+    model_labels = set()
+    # the visibility index is recomputed for every object that was granted a
+    # permission
+    touched = {}
+    queryset_pks = {}
+    snapshotted = False
+    for grant in grants:
+        snapshotted = snapshotted or group_snapshot.is_snapshotted(grant.user_or_group)
+        content_type = grant.permission.content_type
+        model_labels.add(f"{content_type.app_label}.{content_type.model}")
+        is_group = isinstance(grant.user_or_group, Group)
+        if grant.target is None:
+            rows = group_model_rows if is_group else user_model_rows
+            rows.add((grant.user_or_group.pk, grant.permission.pk))
+            continue
+        if isinstance(grant.target, m.QuerySet):
+            model = grant.target.model
+            if id(grant.target) not in queryset_pks:
+                queryset_pks[id(grant.target)] = list(
+                    grant.target.values_list("pk", flat=True)
+                )
+            object_pks = queryset_pks[id(grant.target)]
+        else:
+            model = grant.target._meta.model
+            object_pks = [grant.target.pk]
+        content_type = ContentType.objects.get_for_model(model)
+        rows = group_rows if is_group else user_rows
+        for object_pk in object_pks:
+            rows.add(
+                (
+                    grant.user_or_group.pk,
+                    grant.permission.pk,
+                    content_type.pk,
+                    str(object_pk),
+                )
+            )
+        touched.setdefault(model, set()).update(object_pks)
+    gm.UserObjectPermission.objects.bulk_create(
+        (
+            gm.UserObjectPermission(
+                user_id=user_id,
+                permission_id=permission_id,
+                content_type_id=content_type_id,
+                object_pk=object_pk,
+            )
+            for user_id, permission_id, content_type_id, object_pk in user_rows
+        ),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    gm.GroupObjectPermission.objects.bulk_create(
+        (
+            gm.GroupObjectPermission(
+                group_id=group_id,
+                permission_id=permission_id,
+                content_type_id=content_type_id,
+                object_pk=object_pk,
+            )
+            for group_id, permission_id, content_type_id, object_pk in group_rows
+        ),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    UserPermission = User.user_permissions.through
+    UserPermission.objects.bulk_create(
+        (
+            UserPermission(user_id=user_id, permission_id=permission_id)
+            for user_id, permission_id in user_model_rows
+        ),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    GroupPermission = Group.permissions.through
+    GroupPermission.objects.bulk_create(
+        (
+            GroupPermission(group_id=group_id, permission_id=permission_id)
+            for group_id, permission_id in group_model_rows
+        ),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    for model, object_pks in touched.items():
+        visibility_index.refresh(model, object_pks)
+    perm_cache.invalidate()
+    if snapshotted:
+        group_snapshot.invalidate()
+    for label in model_labels:
+        shared_cache.bump_model(label)
 
-        clear_permissions()
-        LOG.info("recreating permissions...")
 
-        # reset user permissions
-        from .default_groups import default_groups
-        from .default_users import default_users
+def as_principal_list(users_or_groups):
+    if isinstance(users_or_groups, m.Model):
+        return [users_or_groups]
+    return list(users_or_groups)
 
-        default_groups.setup()
-        default_users.setup()
-        # set user self permission
-        # must be done after all default users are added
-        from django_client_framework.models import AccessControlled
 
-        for model in AccessControlled.__subclasses__():
-            permmanager = model.get_permissionmanager_class()()
-            for instance in model.objects.all():
-                permmanager.reset_perms(instance)
+def as_target_list(targets):
+    if isinstance(targets, (m.Model, m.QuerySet, ModelBase)):
+        return [targets]
+    return list(targets)
+
+
+def get_target_model(target):
+    if isinstance(target, m.Model):
+        return target._meta.model
+    elif isinstance(target, m.QuerySet):
+        return target.model
+    elif target.__class__ is ModelBase:
+        return target
+    raise TypeError(f"target has wrong type: {type(target)}")
+
+
+def add_perms_bulk(users_or_groups, targets, perms, field_names=None):
+    """
+    Grants perms on every target to every user or group. Targets are models,
+    instances or querysets, as in add_perms_shortcut(). If field_names is given,
+    the permissions of each field are granted instead. Every row is inserted with
+    bulk_assign_grants(), or collected inside perm_collector.collect_perms().
+    """
+    users_or_groups = as_principal_list(users_or_groups)
+    grants = []
+    for target in as_target_list(targets):
+        model = get_target_model(target)
+        for s in perms.lower():
+            for field_name in field_names or [None]:
+                perm = get_permission_for_model(s, model, field_name=field_name)
+                grants += [
+                    perm_collector.PermGrant(
+                        user_or_group,
+                        perm,
+                        None if target.__class__ is ModelBase else target,
+                    )
+                    for user_or_group in users_or_groups
+                ]
+    collection = perm_collector.get_collection()
+    if collection is not None:
+        collection += grants
+    else:
+        with transaction.atomic():
+            bulk_assign_grants(grants)
+
+
+def remove_perms_bulk(users_or_groups, targets, perms, field_names=None):
+    """
+    Revokes perms on every target from every user or group, the reverse of
+    add_perms_bulk(). Rows are deleted with one query per permission table.
+    """
+    User = get_user_model()
+    targets = as_target_list(targets)
+    user_ids = set()
+    group_ids = set()
+    snapshotted = False
+    for user_or_group in as_principal_list(users_or_groups):
+        snapshotted = snapshotted or group_snapshot.is_snapshotted(user_or_group)
+        if isinstance(user_or_group, Group):
+            group_ids.add(user_or_group.pk)
+        else:
+            user_ids.add(user_or_group.pk)
+    model_perm_ids = set()
+    # content type id -> (permission ids, object pks)
+    object_perms = {}
+    touched = {}
+    for target in targets:
+        model = get_target_model(target)
+        perm_ids = {
+            get_permission_for_model(s, model, field_name=field_name).pk
+            for s in perms.lower()
+            for field_name in field_names or [None]
+        }
+        if target.__class__ is ModelBase:
+            model_perm_ids |= perm_ids
+            continue
+        if isinstance(target, m.QuerySet):
+            object_pks = list(target.values_list("pk", flat=True))
+        else:
+            object_pks = [target.pk]
+        content_type = ContentType.objects.get_for_model(model)
+        perm_ids_of_type, pks_of_type = object_perms.setdefault(
+            content_type.pk, (set(), set())
+        )
+        perm_ids_of_type |= perm_ids
+        pks_of_type.update(str(pk) for pk in object_pks)
+        touched.setdefault(model, set()).update(object_pks)
+    object_condition = m.Q()
+    for content_type_id, (perm_ids, object_pks) in object_perms.items():
+        object_condition |= m.Q(
+            content_type_id=content_type_id,
+            permission_id__in=perm_ids,
+            object_pk__in=object_pks,
+        )
+    with transaction.atomic():
+        if user_ids and object_perms:
+            gm.UserObjectPermission.objects.filter(
+                object_condition, user_id__in=user_ids
+            ).delete()
+        if group_ids and object_perms:
+            gm.GroupObjectPermission.objects.filter(
+                object_condition, group_id__in=group_ids
+            ).delete()
+        if user_ids and model_perm_ids:
+            User.user_permissions.through.objects.filter(
+                user_id__in=user_ids, permission_id__in=model_perm_ids
+            ).delete()
+        if group_ids and model_perm_ids:
+            Group.permissions.through.objects.filter(
+                group_id__in=group_ids, permission_id__in=model_perm_ids
+            ).delete()
+        for model, object_pks in touched.items():
+            visibility_index.refresh(model, object_pks)
+    perm_cache.invalidate()
+    if snapshotted:
+        group_snapshot.invalidate()
+    for label in {get_target_model(target)._meta.label_lower for target in targets}:
+        shared_cache.bump_model(label)
+
+
+def reset_permissions(chunk_size=1000, processes=1, resume_from=None, progress=None):
+    """
+    Clears and recreates every permission. See rebuild.rebuild_permissions() for
+    the arguments.
+    """
+    from .rebuild import rebuild_permissions
+
+    rebuild_permissions(
+        chunk_size=chunk_size,
+        processes=processes,
+        resume_from=resume_from,
+        progress=progress,
+    )
 
 
 @deprecated(details="use reset_permissions()")
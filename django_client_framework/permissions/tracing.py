@@ -0,0 +1,190 @@
+"""
+Instrumentation of permission decisions.
+
+While tracing is active, every decision made by has_perms_shortcut(),
+has_perms_many() and has_field_perms() is described by a PermissionDecision: the
+principal, the target, the permission letter, the field, whether it was granted,
+the source that answered it, and the queries and time it took. Decisions are sent
+with the permission_decided signal, and added to the TraceSummary of the current
+trace_permissions() block, if any.
+
+Tracing is active while permission_decided has receivers or a trace_permissions()
+block is open, and costs nothing otherwise. Set settings.DCF_PERMISSION_TRACE to
+True to trace every request with PermissionTraceMiddleware: a summary is logged
+when the request finishes and, when settings.DEBUG is on, sent back in the
+X-DCF-Permission-Trace response header.
+
+Sources are "superuser", "cache" and "shared_cache" for memoized decisions,
+"batch" for has_perms_many() and has_field_perms(), "async" for permissions
+granted to ahas_perms_shortcut(), "rule" for permission rules,
+"denied", or "<principal>.<model|object>[.field]" naming the branch of
+has_perms_shortcut()'s disjunction that granted the permission, where principal
+is "anyone", "logged_in", "user" or "group".
+"""
+
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from logging import getLogger
+from time import perf_counter
+from typing import NamedTuple, Optional
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import connections
+from django.dispatch import Signal
+
+LOG = getLogger(__name__)
+
+TRACE_HEADER = "X-DCF-Permission-Trace"
+
+# sent with decision=PermissionDecision(...)
+permission_decided = Signal()
+
+_state = Local()
+
+
+class PermissionDecision(NamedTuple):
+    # (model label, pk) of the user or group
+    principal: tuple
+    model: str
+    # None for model permissions
+    object_pk: object
+    perm: str
+    field_name: Optional[str]
+    granted: bool
+    source: str
+    queries: int
+    elapsed: float
+
+
+class TraceSummary:
+    """Aggregates the decisions made in a trace_permissions() block."""
+
+    def __init__(self):
+        self.decisions = 0
+        self.granted = 0
+        self.queries = 0
+        self.elapsed = 0.0
+        self.sources = Counter()
+
+    def add(self, decision: PermissionDecision):
+        self.decisions += 1
+        self.granted += decision.granted
+        self.queries += decision.queries
+        self.elapsed += decision.elapsed
+        self.sources[decision.source] += 1
+
+    def __str__(self):
+        sources = ",".join(
+            f"{source}:{count}" for source, count in self.sources.most_common()
+        )
+        return (
+            f"decisions={self.decisions}; granted={self.granted};"
+            f" queries={self.queries}; time={self.elapsed * 1000:.1f}ms;"
+            f" sources={sources}"
+        )
+
+
+def get_summary() -> Optional[TraceSummary]:
+    return getattr(_state, "summary", None)
+
+
+def is_active():
+    return get_summary() is not None or permission_decided.has_listeners()
+
+
+class Measurement:
+    queries = 0
+    elapsed = 0.0
+
+
+@contextmanager
+def measure():
+    """Counts the queries run and the time spent inside the block."""
+    measurement = Measurement()
+
+    def count_query(execute, sql, params, many, context):
+        measurement.queries += 1
+        return execute(sql, params, many, context)
+
+    start = perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(count_query))
+        yield measurement
+    measurement.elapsed = perf_counter() - start
+
+
+def record(
+    principal_key,
+    model_label,
+    object_pk,
+    perm,
+    field_name,
+    granted,
+    source,
+    measurement=None,
+):
+    decision = PermissionDecision(
+        principal_key,
+        model_label,
+        object_pk,
+        perm,
+        field_name,
+        granted,
+        source,
+        measurement.queries if measurement else 0,
+        measurement.elapsed if measurement else 0.0,
+    )
+    summary = get_summary()
+    if summary is not None:
+        summary.add(decision)
+    permission_decided.send(sender=None, decision=decision)
+
+
+@contextmanager
+def trace_batch():
+    """
+    Measures a batch of decisions, each reported by calling the yielded function
+    with its perm_cache key and the decision. The queries and time of the batch are
+    attributed to its first decision.
+    """
+    if not is_active():
+        yield lambda key, granted: None
+        return
+    decisions = []
+    with measure() as measurement:
+        yield lambda key, granted: decisions.append((key, granted))
+    for i, (key, granted) in enumerate(decisions):
+        record(*key, granted, "batch", None if i else measurement)
+
+
+@contextmanager
+def trace_permissions():
+    """Collects the decisions made inside the block into the yielded TraceSummary."""
+    previous = get_summary()
+    _state.summary = TraceSummary()
+    try:
+        yield _state.summary
+    finally:
+        _state.summary = previous
+
+
+class PermissionTraceMiddleware:
+    """
+    Traces the permission decisions of every request when
+    settings.DCF_PERMISSION_TRACE is True.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "DCF_PERMISSION_TRACE", False):
+            return self.get_response(request)
+        with trace_permissions() as summary:
+            response = self.get_response(request)
+        LOG.info(f"permissions of {request.method} {request.path}: {summary}")
+        if settings.DEBUG:
+            response[TRACE_HEADER] = str(summary)
+        return response
@@ -0,0 +1,291 @@
+"""
+Materialized visibility index for models using the "index" permission filter
+backend.
+
+The object permissions held by users and groups are mirrored into
+VisibilityEntry rows, one per (principal, object, field) with the granted actions
+as a bitmask, so that filtering a queryset by permission needs a single indexed
+table instead of the guardian tables joined with auth_permission. Groups are not
+expanded into their users: the user's groups are resolved when filtering, so
+changes of group membership never rewrite the index.
+
+The index is kept up to date by add_perms_shortcut(), bulk_assign_grants(),
+PermissionManager.reset_perms() and clear_permissions(). Permissions written by
+other means, such as guardian.shortcuts.remove_perm(), are not mirrored; use
+check_visibility_index() to find drift and rebuild_visibility_index() (or the
+rebuild_visibility_index management command) to repair it.
+"""
+
+from logging import getLogger
+from typing import NamedTuple, Optional
+
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.db import models as m
+from django.db import transaction
+from guardian import models as gm
+
+LOG = getLogger(__name__)
+
+PERM_BITS = {"r": 1, "w": 2, "c": 4, "d": 8}
+
+ACTION_BITS = {"view": 1, "change": 2, "add": 4, "delete": 8}
+
+
+class VisibilityMismatch(NamedTuple):
+    model: str
+    object_pk: str
+    field_name: str
+    user_id: Optional[int]
+    group_id: Optional[int]
+    expected: int
+    actual: int
+
+
+def get_entry_model():
+    from django_client_framework.models import VisibilityEntry
+
+    return VisibilityEntry
+
+
+def is_indexed(model):
+    from .site_permission import get_permission_filter_backend
+
+    return get_permission_filter_backend(model) == "index"
+
+
+def get_indexed_models():
+    """
+    Returns the API and AccessControlled models using the visibility index, ordered
+    by label.
+    """
+    from django_client_framework.api import BaseModelAPI
+
+    from .rebuild import get_access_controlled_models
+
+    models = set(BaseModelAPI.models) | set(get_access_controlled_models())
+    return sorted(
+        (model for model in models if is_indexed(model)),
+        key=lambda model: model._meta.label_lower,
+    )
+
+
+def get_content_type(model):
+    return ContentType.objects.get_for_model(model, for_concrete_model=False)
+
+
+def principal_kwargs(user_or_group):
+    if isinstance(user_or_group, Group):
+        return {"group": user_or_group}
+    else:
+        return {"user": user_or_group}
+
+
+def perms_mask(perms):
+    mask = 0
+    for s in perms.lower():
+        mask |= PERM_BITS[s]
+    return mask
+
+
+def parse_codename(codename, model_name):
+    """
+    Returns the (bit, field_name) of a permission codename created by
+    get_permission_for_model(), or None for other permissions.
+    """
+    action, _, rest = codename.partition("_")
+    if action not in ACTION_BITS or not rest.startswith(model_name):
+        return None
+    rest = rest[len(model_name) :]
+    if not rest:
+        return ACTION_BITS[action], ""
+    if rest.startswith("__"):
+        return ACTION_BITS[action], rest[2:]
+    return None
+
+
+def grant(user_or_group, model, object_pks, perms, field_name=None):
+    """
+    Adds perms to the entries of user_or_group on the objects of model with the
+    given pks, with one insert and one update.
+    """
+    if not is_indexed(model):
+        return
+    Entry = get_entry_model()
+    content_type = get_content_type(model)
+    object_pks = [str(pk) for pk in object_pks]
+    principal = principal_kwargs(user_or_group)
+    Entry.objects.bulk_create(
+        (
+            Entry(
+                content_type=content_type,
+                object_pk=object_pk,
+                field_name=field_name or "",
+                **principal,
+            )
+            for object_pk in object_pks
+        ),
+        ignore_conflicts=True,
+    )
+    Entry.objects.filter(
+        content_type=content_type,
+        object_pk__in=object_pks,
+        field_name=field_name or "",
+        **principal,
+    ).update(perms=m.F("perms").bitor(perms_mask(perms)))
+
+
+def expected_entries(model, object_pks=None):
+    """
+    Computes the entries of model from the guardian tables, optionally limited to
+    the given object pks. Returns a dict mapping (object_pk, field_name, user_id,
+    group_id) to the bitmask.
+    """
+    content_type = get_content_type(model)
+    model_name = model._meta.model_name
+    filters = {"content_type": content_type}
+    if object_pks is not None:
+        filters["object_pk__in"] = [str(pk) for pk in object_pks]
+    entries = {}
+    for rows, is_group in (
+        (gm.UserObjectPermission.objects.filter(**filters).values_list, False),
+        (gm.GroupObjectPermission.objects.filter(**filters).values_list, True),
+    ):
+        principal_field = "group_id" if is_group else "user_id"
+        for object_pk, principal_id, codename in rows(
+            "object_pk", principal_field, "permission__codename"
+        ).iterator():
+            parsed = parse_codename(codename, model_name)
+            if parsed is None:
+                continue
+            bit, field_name = parsed
+            key = (
+                object_pk,
+                field_name,
+                None if is_group else principal_id,
+                principal_id if is_group else None,
+            )
+            entries[key] = entries.get(key, 0) | bit
+    return entries
+
+
+def actual_entries(model, object_pks=None):
+    filters = {"content_type": get_content_type(model)}
+    if object_pks is not None:
+        filters["object_pk__in"] = [str(pk) for pk in object_pks]
+    return {
+        (object_pk, field_name, user_id, group_id): perms
+        for object_pk, field_name, user_id, group_id, perms in get_entry_model()
+        .objects.filter(**filters)
+        .values_list("object_pk", "field_name", "user_id", "group_id", "perms")
+        .iterator()
+    }
+
+
+def write_entries(model, entries, batch_size=1000):
+    Entry = get_entry_model()
+    content_type = get_content_type(model)
+    Entry.objects.bulk_create(
+        (
+            Entry(
+                content_type=content_type,
+                object_pk=object_pk,
+                field_name=field_name,
+                user_id=user_id,
+                group_id=group_id,
+                perms=perms,
+            )
+            for (object_pk, field_name, user_id, group_id), perms in entries.items()
+            if perms
+        ),
+        batch_size=batch_size,
+    )
+
+
+def refresh(model, object_pks):
+    """Recomputes the entries of the objects of model with the given pks."""
+    if not is_indexed(model):
+        return
+    object_pks = [str(pk) for pk in object_pks]
+    get_entry_model().objects.filter(
+        content_type=get_content_type(model), object_pk__in=object_pks
+    ).delete()
+    write_entries(model, expected_entries(model, object_pks))
+
+
+def forget_users(model, object_pks):
+    """
+    Removes the entries users hold on the objects of model with the given pks,
+    mirroring the deletion of their user object permissions.
+    """
+    if not is_indexed(model):
+        return
+    get_entry_model().objects.filter(
+        content_type=get_content_type(model),
+        object_pk__in=[str(pk) for pk in object_pks],
+        user__isnull=False,
+    ).delete()
+
+
+def clear():
+    get_entry_model().objects.all().delete()
+
+
+def rebuild_visibility_index(models=None, batch_size=1000):
+    """
+    Recreates the entries of the given models, all indexed models by default, from
+    the guardian tables. Each model is rebuilt in its own transaction.
+    """
+    for model in get_indexed_models() if models is None else models:
+        with transaction.atomic():
+            get_entry_model().objects.filter(
+                content_type=get_content_type(model)
+            ).delete()
+            entries = expected_entries(model)
+            write_entries(model, entries, batch_size=batch_size)
+        LOG.info(f"rebuilt {len(entries)} visibility entries of {model}")
+
+
+def check_visibility_index(models=None):
+    """
+    Compares the entries of the given models, all indexed models by default, with
+    the guardian tables. Returns a list of VisibilityMismatch, empty if the index
+    is consistent.
+    """
+    mismatches = []
+    for model in get_indexed_models() if models is None else models:
+        expected = expected_entries(model)
+        actual = actual_entries(model)
+        for key in sorted(
+            set(expected) | set(actual), key=lambda key: tuple(map(str, key))
+        ):
+            if expected.get(key, 0) != actual.get(key, 0):
+                mismatches.append(
+                    VisibilityMismatch(
+                        model._meta.label_lower,
+                        *key,
+                        expected=expected.get(key, 0),
+                        actual=actual.get(key, 0),
+                    )
+                )
+    return mismatches
+
+
+def entry_exists(content_type, object_pk, principals, perms, field_name=None):
+    """
+    Returns an Exists expression that is true when an entry of one of principals,
+    a Q over the user and group columns, grants every permission in perms on the
+    object whose primary key is object_pk.
+    """
+    mask = perms_mask(perms)
+    return m.Exists(
+        get_entry_model()
+        .objects.filter(
+            principals,
+            content_type=content_type,
+            object_pk=object_pk,
+            field_name=field_name or "",
+        )
+        .annotate(granted=m.F("perms").bitand(mask))
+        .filter(granted=mask)
+    )
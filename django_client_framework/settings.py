@@ -12,6 +12,7 @@ def install(
     MIDDLEWARE += [
         "django_client_framework.exceptions.handlers.ConvertAPIExceptionToJsonResponse",
         "django_currentuser.middleware.ThreadLocalUserMiddleware",
+        "django_client_framework.permissions.tracing.PermissionTraceMiddleware",
     ]
     REST_FRAMEWORK[
         "EXCEPTION_HANDLER"
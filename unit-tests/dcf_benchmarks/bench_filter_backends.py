@@ -0,0 +1,96 @@
+"""
+Compares the "guardian" and "exists" permission filter backends on a synthetic
+permission table. Not collected by the default test run, run it explicitly with:
+
+    ./manage.py test dcf_benchmarks.bench_filter_backends
+
+The dataset size is controlled by the DCF_BENCH_OBJECTS, DCF_BENCH_USERS and
+DCF_BENCH_PERMS_PER_USER environment variables.
+"""
+
+import os
+import random
+from statistics import median
+from time import perf_counter
+
+from django.contrib.auth.models import Group, User
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django_client_framework import permissions as p
+from guardian.models import GroupObjectPermission, UserObjectPermission
+from dcf_test_app.models import Product
+
+N_OBJECTS = int(os.environ.get("DCF_BENCH_OBJECTS", 5000))
+N_USERS = int(os.environ.get("DCF_BENCH_USERS", 200))
+N_PERMS_PER_USER = int(os.environ.get("DCF_BENCH_PERMS_PER_USER", 500))
+N_ROUNDS = int(os.environ.get("DCF_BENCH_ROUNDS", 5))
+
+
+class BenchFilterBackends(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rand = random.Random(0)
+        p.clear_permissions()
+        Product.objects.bulk_create(
+            Product(barcode=f"product_{i}") for i in range(N_OBJECTS)
+        )
+        User.objects.bulk_create(User(username=f"bench_{i}") for i in range(N_USERS))
+        cls.users = list(User.objects.filter(username__startswith="bench_"))
+        cls.group = Group.objects.create(name="bench_group")
+        cls.group.user_set.add(*cls.users[: N_USERS // 2])
+        ctype = ContentType.objects.get_for_model(Product)
+        view = p.get_permission_for_model("r", Product)
+        change = p.get_permission_for_model("w", Product)
+        pks = list(Product.objects.values_list("pk", flat=True))
+        UserObjectPermission.objects.bulk_create(
+            (
+                UserObjectPermission(
+                    user=user, permission=perm, content_type=ctype, object_pk=str(pk)
+                )
+                for user in cls.users
+                for pk in rand.sample(pks, min(N_PERMS_PER_USER, len(pks)))
+                for perm in (view, change)
+            ),
+            batch_size=5000,
+            ignore_conflicts=True,
+        )
+        GroupObjectPermission.objects.bulk_create(
+            GroupObjectPermission(
+                group=cls.group, permission=view, content_type=ctype, object_pk=str(pk)
+            )
+            for pk in rand.sample(pks, min(N_PERMS_PER_USER, len(pks)))
+        )
+        cls.user = cls.users[0]
+
+    def measure(self, filter_func, perms):
+        timings = []
+        for _ in range(N_ROUNDS):
+            start = perf_counter()
+            with CaptureQueriesContext(connection) as ctx:
+                queryset = filter_func(perms, self.user, Product.objects.all())
+                count = queryset.count()
+                page = list(queryset.order_by("pk")[:50].values_list("pk", flat=True))
+            timings.append(perf_counter() - start)
+        return count, page, median(timings), len(ctx.captured_queries)
+
+    def test_compare_backends(self):
+        print()
+        print(
+            f"objects={N_OBJECTS} users={N_USERS} perms_per_user={N_PERMS_PER_USER}"
+            f" vendor={connection.vendor}"
+        )
+        for perms in ["r", "rw"]:
+            results = {}
+            for name, func in [
+                ("guardian", p.filter_queryset_by_perms_guardian),
+                ("exists", p.filter_queryset_by_perms_exists),
+            ]:
+                count, page, seconds, queries = self.measure(func, perms)
+                results[name] = (count, page)
+                print(
+                    f"  perms={perms:<3} backend={name:<9} rows={count:<6}"
+                    f" queries={queries:<3} median={seconds * 1000:.1f}ms"
+                )
+            self.assertEqual(results["guardian"], results["exists"])
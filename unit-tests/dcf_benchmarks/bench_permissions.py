@@ -0,0 +1,217 @@
+"""
+Benchmarks the permission subsystem on a synthetic dataset. Not collected by the
+default test run, run it explicitly with:
+
+    DCF_BENCH_OUTPUT=results.json ./manage.py test dcf_benchmarks.bench_permissions
+
+The dataset is controlled by these environment variables:
+
+    DCF_BENCH_USERS              users (200)
+    DCF_BENCH_GROUPS             groups, every user joins one of them (10)
+    DCF_BENCH_OBJECTS            products, and stores owned by random users (2000)
+    DCF_BENCH_OBJECT_PERMS       object permissions per user and group (100)
+    DCF_BENCH_FIELD_PERM_RATIO   share of them granted on a field instead (0.1)
+    DCF_BENCH_MODEL_PERM_RATIO   share of users with the model read permission (0.05)
+    DCF_BENCH_OPS                operations per benchmark (200)
+    DCF_BENCH_RESET_ROUNDS       rounds of reset_permissions() (3)
+
+See harness for the reported measurements.
+"""
+
+import copy
+import random
+
+from django.contrib.auth.models import Group, User
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django_client_framework import permissions as p
+from django_client_framework.permissions import group_snapshot
+from django_client_framework.permissions.registry import permission_registry
+from guardian.models import GroupObjectPermission, UserObjectPermission
+from dcf_test_app.models import Brand, Product, Store
+
+from . import harness
+
+N_USERS = harness.env_int("DCF_BENCH_USERS", 200)
+N_GROUPS = harness.env_int("DCF_BENCH_GROUPS", 10)
+N_OBJECTS = harness.env_int("DCF_BENCH_OBJECTS", 2000)
+N_OBJECT_PERMS = harness.env_int("DCF_BENCH_OBJECT_PERMS", 100)
+FIELD_PERM_RATIO = harness.env_float("DCF_BENCH_FIELD_PERM_RATIO", 0.1)
+MODEL_PERM_RATIO = harness.env_float("DCF_BENCH_MODEL_PERM_RATIO", 0.05)
+N_OPS = harness.env_int("DCF_BENCH_OPS", 200)
+N_RESET_ROUNDS = harness.env_int("DCF_BENCH_RESET_ROUNDS", 3)
+
+# logging in costs a session write, so collection requests reuse a few clients
+N_CLIENTS = 20
+
+
+def tearDownModule():
+    harness.save_results()
+
+
+def create_dataset(dataset):
+    """
+    Creates the synthetic dataset, and sets its users, groups and product pks as
+    attributes of dataset.
+    """
+    rand = random.Random(0)
+    p.clear_permissions()
+    brand = Brand.objects.create(name="bench_brand")
+    Product.objects.bulk_create(
+        Product(barcode=f"product_{i}", brand=brand) for i in range(N_OBJECTS)
+    )
+    User.objects.bulk_create(User(username=f"bench_{i}") for i in range(N_USERS))
+    Group.objects.bulk_create(Group(name=f"bench_group_{i}") for i in range(N_GROUPS))
+    dataset.users = list(User.objects.filter(username__startswith="bench_"))
+    dataset.groups = list(Group.objects.filter(name__startswith="bench_group_"))
+    for i, group in enumerate(dataset.groups):
+        group.user_set.add(*dataset.users[i::N_GROUPS])
+    Store.objects.bulk_create(
+        Store(name=f"store_{i}", owner=rand.choice(dataset.users))
+        for i in range(N_OBJECTS)
+    )
+    for user in rand.sample(dataset.users, round(N_USERS * MODEL_PERM_RATIO)):
+        p.add_perms_shortcut(user, Product, "r")
+
+    ctype = ContentType.objects.get_for_model(Product)
+    object_perms = [p.get_permission_for_model(s, Product) for s in "rw"]
+    field_perms = [
+        p.get_permission_for_model(s, Product, field_name="barcode") for s in "rw"
+    ]
+    dataset.product_pks = list(Product.objects.values_list("pk", flat=True))
+
+    def sample_perms():
+        for pk in rand.sample(
+            dataset.product_pks, min(N_OBJECT_PERMS, len(dataset.product_pks))
+        ):
+            perms = field_perms if rand.random() < FIELD_PERM_RATIO else object_perms
+            yield pk, rand.choice(perms)
+
+    UserObjectPermission.objects.bulk_create(
+        (
+            UserObjectPermission(
+                user=user, permission=perm, content_type=ctype, object_pk=str(pk)
+            )
+            for user in dataset.users
+            for pk, perm in sample_perms()
+        ),
+        batch_size=5000,
+        ignore_conflicts=True,
+    )
+    GroupObjectPermission.objects.bulk_create(
+        (
+            GroupObjectPermission(
+                group=group, permission=perm, content_type=ctype, object_pk=str(pk)
+            )
+            for group in dataset.groups
+            for pk, perm in sample_perms()
+        ),
+        batch_size=5000,
+        ignore_conflicts=True,
+    )
+
+
+class BenchPermissions(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_dataset(cls)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        # forget the rows rolled back with the test data
+        permission_registry.clear()
+        p.default_groups.clear_cache()
+
+    def setUp(self):
+        self.rand = random.Random(1)
+        # the permission registry and the default groups only remember committed
+        # rows, which never happens inside a TestCase
+        with self.captureOnCommitCallbacks(execute=True):
+            for s in "rwcd":
+                p.get_permission_for_model(s, Brand)
+                for field_name in [None, "barcode", "brand"]:
+                    p.get_permission_for_model(s, Product, field_name=field_name)
+            p.default_groups.anyone
+            p.default_groups.logged_in
+        print()
+        print(
+            f"users={N_USERS} groups={N_GROUPS} objects={N_OBJECTS}"
+            f" object_perms={N_OBJECT_PERMS} vendor={connection.vendor}"
+        )
+
+    def fresh_users(self, n):
+        # the auth backend memoizes model permissions on user instances, real
+        # requests start without them
+        users = User.objects.in_bulk([user.pk for user in self.users])
+        return [copy.copy(users[self.rand.choice(self.users).pk]) for _ in range(n)]
+
+    def test_collection_get(self):
+        clients = []
+        for user in self.rand.sample(self.users, min(N_CLIENTS, N_USERS)):
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+
+        def get(client):
+            response = client.get("/product?_limit=50")
+            self.assertEqual(200, response.status_code)
+
+        harness.benchmark(
+            "collection_get",
+            get,
+            [(clients[i % len(clients)],) for i in range(N_OPS)],
+        )
+
+    def test_filter_queryset_by_perms_shortcut(self):
+        def filter_queryset(user):
+            queryset = p.filter_queryset_by_perms_shortcut(
+                "r", user, Product.objects.all()
+            )
+            queryset.count()
+            list(queryset.order_by("pk")[:50])
+
+        harness.benchmark(
+            "filter_queryset_by_perms_shortcut",
+            filter_queryset,
+            [(user,) for user in self.fresh_users(N_OPS)],
+        )
+
+    def test_has_perms_shortcut(self):
+        products = Product.objects.in_bulk(self.product_pks)
+        args_list = [
+            (
+                user,
+                products[self.rand.choice(self.product_pks)],
+                self.rand.choice(["r", "rw"]),
+                self.rand.choice([None, "barcode"]),
+            )
+            for user in self.fresh_users(N_OPS)
+        ]
+        harness.benchmark("has_perms_shortcut", p.has_perms_shortcut, args_list)
+
+
+# reset_permissions() is measured on committed rows, since the permission registry
+# only preloads and remembers permissions outside of atomic blocks
+class BenchResetPermissions(TransactionTestCase):
+    def setUp(self):
+        create_dataset(self)
+
+    def tearDown(self):
+        # forget the rows flushed with the test data
+        permission_registry.clear()
+        p.default_groups.clear_cache()
+        group_snapshot.invalidate()
+
+    def test_reset_permissions(self):
+        print()
+        print(
+            f"users={N_USERS} groups={N_GROUPS} objects={N_OBJECTS}"
+            f" object_perms={N_OBJECT_PERMS} vendor={connection.vendor}"
+        )
+        harness.benchmark(
+            "reset_permissions",
+            p.reset_permissions,
+            [() for _ in range(N_RESET_ROUNDS)],
+        )
@@ -0,0 +1,63 @@
+"""
+Compares two benchmark result files written with DCF_BENCH_OUTPUT:
+
+    python -m dcf_benchmarks.compare before.json after.json [--threshold 0.1]
+
+Prints the change of every measurement, and exits with status 1 if the median
+latency or the queries per operation of a benchmark grew by more than threshold.
+"""
+
+import argparse
+import json
+import sys
+
+COLUMNS = ["queries_per_op", "p50_ms", "p90_ms", "p99_ms", "peak_memory_kb"]
+
+GATED_COLUMNS = ["queries_per_op", "p50_ms"]
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def change(before, after):
+    if not before:
+        return 0.0 if not after else float("inf")
+    return (after - before) / before
+
+
+def compare(before, after, threshold):
+    regressions = []
+    print(f"before: {before.get('commit')}  after: {after.get('commit')}")
+    if before.get("parameters") != after.get("parameters"):
+        print("warning: the runs used different parameters")
+    for name in sorted(set(before["results"]) & set(after["results"])):
+        old = before["results"][name]
+        new = after["results"][name]
+        print(name)
+        for column in COLUMNS:
+            delta = change(old[column], new[column])
+            print(
+                f"  {column:<16} {old[column]:>10.2f} {new[column]:>10.2f} {delta:>+8.1%}"
+            )
+            if column in GATED_COLUMNS and delta > threshold:
+                regressions.append(f"{name}.{column}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+    regressions = compare(load(args.before), load(args.after), args.threshold)
+    if regressions:
+        print(f"regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
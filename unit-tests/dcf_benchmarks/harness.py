@@ -0,0 +1,121 @@
+"""
+Measurement helpers shared by the benchmarks.
+
+benchmark() runs an operation repeatedly and records its latency percentiles, the
+queries it runs and the peak memory it allocates. Results are printed, and also
+written as JSON to the path in the DCF_BENCH_OUTPUT environment variable when the
+benchmark module finishes, so that runs on different commits can be compared with:
+
+    python -m dcf_benchmarks.compare before.json after.json
+"""
+
+import json
+import os
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import NamedTuple
+
+from django.db import connection
+from django_client_framework.permissions import tracing
+
+RESULTS = {}
+
+PARAMETERS = {}
+
+
+class BenchmarkResult(NamedTuple):
+    ops: int
+    queries_per_op: float
+    mean_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+    peak_memory_kb: float
+
+
+def env_int(name, default):
+    value = int(os.environ.get(name, default))
+    PARAMETERS[name] = value
+    return value
+
+
+def env_float(name, default):
+    value = float(os.environ.get(name, default))
+    PARAMETERS[name] = value
+    return value
+
+
+def percentile(sorted_values, fraction):
+    index = round(fraction * (len(sorted_values) - 1))
+    return sorted_values[index]
+
+
+def benchmark(name, operation, args_list):
+    """
+    Calls operation(*args) for every tuple of args_list, then measures the memory
+    of the first call again under tracemalloc, which would skew the timings.
+    """
+    timings = []
+    # the test client resets connection.queries on every request, queries are
+    # counted with an execute wrapper instead
+    with tracing.measure() as measurement:
+        for args in args_list:
+            start = perf_counter()
+            operation(*args)
+            timings.append(perf_counter() - start)
+    tracemalloc.start()
+    try:
+        operation(*args_list[0])
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    timings.sort()
+    result = BenchmarkResult(
+        ops=len(timings),
+        queries_per_op=measurement.queries / len(timings),
+        mean_ms=sum(timings) / len(timings) * 1000,
+        p50_ms=percentile(timings, 0.5) * 1000,
+        p90_ms=percentile(timings, 0.9) * 1000,
+        p99_ms=percentile(timings, 0.99) * 1000,
+        max_ms=timings[-1] * 1000,
+        peak_memory_kb=peak / 1024,
+    )
+    RESULTS[name] = result
+    print(
+        f"  {name:<40} ops={result.ops:<5} queries/op={result.queries_per_op:<6.1f}"
+        f" p50={result.p50_ms:.2f}ms p90={result.p90_ms:.2f}ms"
+        f" p99={result.p99_ms:.2f}ms peak={result.peak_memory_kb:.0f}KB"
+    )
+    return result
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results():
+    """Writes every result recorded so far to the path in DCF_BENCH_OUTPUT."""
+    path = os.environ.get("DCF_BENCH_OUTPUT")
+    if not path:
+        return
+    document = {
+        "commit": get_commit(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "vendor": connection.vendor,
+        "parameters": PARAMETERS,
+        "results": {name: result._asdict() for name, result in RESULTS.items()},
+    }
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2, sort_keys=True)
+    print(f"benchmark results written to {path}")
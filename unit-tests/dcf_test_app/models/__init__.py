@@ -5,3 +5,4 @@ from django.db.models import *
 from django_client_framework.models import *
 from .brand import *
 from .product import *
+from .store import *
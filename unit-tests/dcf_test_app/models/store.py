@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.db import models as m
+from django_client_framework import permissions as p
+from django_client_framework.api import register_api_model
+from django_client_framework.models import AccessControlled, Serializable
+from django_client_framework.serializers import ModelSerializer
+
+
+@register_api_model
+class Store(Serializable, AccessControlled):
+    name = m.CharField(max_length=100, blank=True, default="")
+    owner = m.ForeignKey(User, null=True, on_delete=m.SET_NULL, related_name="stores")
+
+    class PermissionManager(AccessControlled.PermissionManager):
+        incremental = True
+
+        def add_perms(self, instance):
+            if instance.owner:
+                p.add_perms_shortcut(instance.owner, instance, "rwd")
+            p.add_perms_shortcut(p.default_groups.logged_in, instance, "r")
+
+    @classmethod
+    def serializer_class(cls):
+        return StoreSerializer
+
+
+class StoreSerializer(ModelSerializer):
+    class Meta:
+        model = Store
+        exclude = []
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 import django_client_framework.settings
 
@@ -82,6 +83,18 @@ DATABASES = {
     }
 }
 
+# Run against a local PostgreSQL server, e.g. for the row-level security tests,
+# with DCF_TEST_POSTGRES_HOST=localhost. The role must not be a superuser.
+if os.environ.get("DCF_TEST_POSTGRES_HOST"):
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "HOST": os.environ["DCF_TEST_POSTGRES_HOST"],
+        "PORT": os.environ.get("DCF_TEST_POSTGRES_PORT", "5432"),
+        "NAME": os.environ.get("DCF_TEST_POSTGRES_DB", "dcf"),
+        "USER": os.environ.get("DCF_TEST_POSTGRES_USER", "dcf"),
+        "PASSWORD": os.environ.get("DCF_TEST_POSTGRES_PASSWORD", ""),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
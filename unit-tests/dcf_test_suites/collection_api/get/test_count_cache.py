@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django_client_framework import permissions as p
+from django_client_framework.api import count_cache
+from dcf_test_app.models import Brand, Product
+
+
+@override_settings(DCF_PERMISSION_CACHE="default", DCF_COUNT_CACHE_TIMEOUT=60)
+class TestCountCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser")
+        self.br1 = Brand.objects.create(name="br1")
+        self.products = [
+            Product.objects.create(barcode=f"pr{i}", brand=self.br1) for i in range(3)
+        ]
+        p.clear_permissions()
+        p.add_perms_shortcut(self.user, self.products[0], "r")
+        p.add_perms_shortcut(self.user, self.products[1], "r")
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(path).json()
+        counts = [q for q in queries.captured_queries if "COUNT(" in q["sql"]]
+        return data, len(counts)
+
+    def test_total_is_cached(self):
+        data, counts = self.count_queries("/product")
+        self.assertEqual(2, data["total"])
+        self.assertFalse(data["approximate"])
+        self.assertEqual(1, counts)
+        data, counts = self.count_queries("/product?_page=1&_limit=1")
+        self.assertEqual(2, data["total"])
+        self.assertEqual(0, counts)
+
+    def test_filters_are_part_of_key(self):
+        self.count_queries("/product")
+        data, counts = self.count_queries("/product?barcode=pr0")
+        self.assertEqual(1, data["total"])
+        self.assertEqual(1, counts)
+
+    def test_permission_change_recounts(self):
+        self.count_queries("/product")
+        p.add_perms_shortcut(self.user, self.products[2], "r")
+        data, counts = self.count_queries("/product")
+        self.assertEqual(3, data["total"])
+        self.assertEqual(1, counts)
+
+    @override_settings(DCF_COUNT_CACHE_TIMEOUT=0)
+    def test_disabled_by_default(self):
+        self.count_queries("/product")
+        data, counts = self.count_queries("/product")
+        self.assertEqual(2, data["total"])
+        self.assertEqual(1, counts)
+
+    @override_settings(DCF_APPROXIMATE_COUNT_THRESHOLD=0)
+    def test_estimate_needs_postgres(self):
+        self.assertIsNone(count_cache.estimate_count(Product.objects.all()))
+        data, _counts = self.count_queries("/product")
+        self.assertEqual(2, data["total"])
+        self.assertFalse(data["approximate"])
+
+    @override_settings(DCF_PERMISSION_FILTER_BACKEND="rls")
+    def test_no_estimate_with_rls(self):
+        # the policies filter the rows, the estimate would count the whole table
+        with mock.patch.object(
+            connection, "vendor", "postgresql"
+        ), CaptureQueriesContext(connection) as ctx:
+            self.assertIsNone(count_cache.estimate_count(Product.objects.all()))
+        self.assertEqual([], ctx.captured_queries)
+
+    def test_estimate_needs_unfiltered_queryset(self):
+        queryset = Product.objects.filter(barcode="pr0")
+        self.assertIsNone(count_cache.estimate_count(queryset))
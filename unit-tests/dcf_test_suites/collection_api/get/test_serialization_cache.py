@@ -0,0 +1,339 @@
+import threading
+from io import StringIO
+from time import sleep, time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django_client_framework import permissions as p
+from django_client_framework import serializers as s
+from django_client_framework.models.abstract import serializable
+from dcf_test_app.models import Brand, Product
+
+
+class ProductForUserSerializer(s.ModelSerializer):
+    viewer = s.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = ["id", "barcode", "viewer"]
+
+    def get_viewer(self, instance):
+        return self.context["request"].user.username
+
+
+class BrandForUserSerializer(ProductForUserSerializer):
+    class Meta:
+        model = Brand
+        fields = ["id", "name", "viewer"]
+
+
+class TestSerializationCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        serializable.reset_serialization_cache_stats()
+        self.br1 = Brand.objects.create(name="br1")
+        self.products = [
+            Product.objects.create(barcode=f"pr{i}", brand=self.br1) for i in range(3)
+        ]
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_page_serialization(self):
+        self.products[1].get_or_create_cached_serialization()
+        with mock.patch.object(
+            cache, "get_many", wraps=cache.get_many
+        ) as get_many, mock.patch.object(
+            cache, "set_many", wraps=cache.set_many
+        ) as set_many:
+            data = Product.get_or_create_cached_serializations(self.products)
+        self.assertListEqual(["pr0", "pr1", "pr2"], [d["barcode"] for d in data])
+        self.assertEqual(1, get_many.call_count)
+        self.assertEqual(1, set_many.call_count)
+        self.assertSetEqual(
+            {
+                self.products[0].cache_key_for_serialization,
+                self.products[2].cache_key_for_serialization,
+            },
+            set(set_many.call_args[0][0]),
+        )
+
+    def test_cached_page_is_reused(self):
+        Product.get_or_create_cached_serializations(self.products)
+        # bypasses the signals invalidating the cache
+        Product.objects.filter(pk=self.products[0].pk).update(barcode="changed")
+        data = Product.get_or_create_cached_serializations(self.products)
+        self.assertEqual("pr0", data[0]["barcode"])
+        self.products[0].refresh_from_db()
+        self.products[0].save()
+        data = Product.get_or_create_cached_serializations(self.products)
+        self.assertEqual("changed", data[0]["barcode"])
+
+    def get_stats(self):
+        return serializable.get_serialization_cache_stats().get(
+            "dcf_test_app.product", {"hits": 0, "misses": 0}
+        )
+
+    def test_stats(self):
+        Product.get_or_create_cached_serializations(self.products[:2])
+        Product.get_or_create_cached_serializations(self.products)
+        self.products[0].get_or_create_cached_serialization()
+        self.assertDictEqual({"hits": 3, "misses": 3}, self.get_stats())
+
+    def test_policies(self):
+        user = User.objects.create_user(username="testuser")
+        p.clear_permissions()
+        p.add_perms_shortcut(user, Product, "r")
+        self.client.force_login(user)
+        for policy, stats in [
+            ("off", {"hits": 0, "misses": 0}),
+            ("object", {"hits": 0, "misses": 3}),
+            ("page", {"hits": 3, "misses": 0}),
+        ]:
+            with self.subTest(policy=policy), mock.patch.object(
+                Product, "serialization_cache_policy", policy
+            ):
+                serializable.reset_serialization_cache_stats()
+                data = self.client.get("/product").json()
+                self.assertEqual(3, len(data["objects"]))
+                self.assertDictEqual(stats, self.get_stats())
+
+    def test_object_api(self):
+        user = User.objects.create_user(username="testuser")
+        p.clear_permissions()
+        p.add_perms_shortcut(user, Product, "r")
+        self.client.force_login(user)
+        path = f"/product/{self.products[0].pk}"
+        # serialized with the request unless the model opts in
+        self.assertEqual("pr0", self.client.get(path).json()["barcode"])
+        self.assertDictEqual({"hits": 0, "misses": 0}, self.get_stats())
+        with mock.patch.object(Product, "serialization_cache_policy", "object"):
+            self.assertEqual("pr0", self.client.get(path).json()["barcode"])
+            self.assertEqual("pr0", self.client.get(path).json()["barcode"])
+        self.assertDictEqual({"hits": 1, "misses": 1}, self.get_stats())
+
+    def test_object_apis_honor_setting(self):
+        user = User.objects.create_user(username="testuser")
+        p.clear_permissions()
+        p.add_perms_shortcut(user, Product, "r")
+        p.add_perms_shortcut(user, Brand, "r")
+        self.client.force_login(user)
+        paths = [
+            f"/product/{self.products[0].pk}",
+            f"/product/{self.products[0].pk}/brand",
+        ]
+        with override_settings(DCF_SERIALIZATION_CACHE_POLICY="off"):
+            for path in paths:
+                self.client.get(path)
+        self.assertDictEqual({"hits": 0, "misses": 0}, self.get_stats())
+        with override_settings(DCF_SERIALIZATION_CACHE_POLICY="page"):
+            for path in paths * 2:
+                self.client.get(path)
+        stats = serializable.get_serialization_cache_stats()
+        for label in ["dcf_test_app.product", "dcf_test_app.brand"]:
+            self.assertDictEqual({"hits": 1, "misses": 1}, stats[label])
+
+    def test_object_api_with_request_context(self):
+        users = [User.objects.create_user(username=f"user{i}") for i in range(2)]
+        p.clear_permissions()
+        path = f"/product/{self.products[0].pk}"
+        with mock.patch.object(
+            Product, "serializer_class", return_value=ProductForUserSerializer
+        ):
+            for user in users:
+                p.add_perms_shortcut(user, Product, "r")
+                self.client.force_login(user)
+                self.assertEqual(user.username, self.client.get(path).json()["viewer"])
+
+    def test_related_object_api_with_request_context(self):
+        users = [User.objects.create_user(username=f"user{i}") for i in range(2)]
+        p.clear_permissions()
+        path = f"/product/{self.products[0].pk}/brand"
+        with mock.patch.object(
+            Brand, "serializer_class", return_value=BrandForUserSerializer
+        ):
+            for user in users:
+                p.add_perms_shortcut(user, Product, "r")
+                p.add_perms_shortcut(user, Brand, "r")
+                self.client.force_login(user)
+                self.assertEqual(user.username, self.client.get(path).json()["viewer"])
+
+    def test_invalid_policy(self):
+        with mock.patch.object(Product, "serialization_cache_policy", "always"):
+            with self.assertRaises(ValueError):
+                Product.serialize_many(self.products)
+
+    def fresh_products(self):
+        return Product.objects.filter(pk__in=[pr.pk for pr in self.products]).order_by(
+            "pk"
+        )
+
+    def test_bump_generation(self):
+        Product.get_or_create_cached_serializations(self.products)
+        Product.objects.filter(pk=self.products[0].pk).update(barcode="changed")
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Product.bump_serialization_generation()
+        # bumped again after commit
+        self.assertEqual(1, len(callbacks))
+        data = Product.get_or_create_cached_serializations(self.fresh_products())
+        self.assertEqual("changed", data[0]["barcode"])
+        self.assertDictEqual({"hits": 0, "misses": 6}, self.get_stats())
+
+    def test_evicted_generation(self):
+        Product.get_or_create_cached_serializations(self.products)
+        Product.objects.filter(pk=self.products[0].pk).update(barcode="changed")
+        cache.delete(serializable.get_serialization_generation_key(Product))
+        data = Product.get_or_create_cached_serializations(self.fresh_products())
+        self.assertEqual("changed", data[0]["barcode"])
+
+    def test_serializer_layout(self):
+        key = self.products[0].cache_key_for_serialization
+        self.assertIn(serializable.get_serializer_layout_hash(Product), key)
+        self.assertNotEqual(
+            serializable.get_serializer_layout_hash(Product),
+            serializable.get_serializer_layout_hash(Brand),
+        )
+        with mock.patch.dict(serializable._layout_hashes, {Product: "changed"}):
+            self.assertNotEqual(key, self.products[0].cache_key_for_serialization)
+
+    def test_command(self):
+        brand_key = self.br1.cache_key_for_serialization
+        product_key = self.products[0].cache_key_for_serialization
+        call_command(
+            "bump_serialization_generation", "dcf_test_app.product", stdout=StringIO()
+        )
+        self.assertEqual(brand_key, self.br1.cache_key_for_serialization)
+        self.assertNotEqual(product_key, self.products[0].cache_key_for_serialization)
+        call_command("bump_serialization_generation", stdout=StringIO())
+        self.assertNotEqual(brand_key, self.br1.cache_key_for_serialization)
+        with self.assertRaises(CommandError):
+            call_command(
+                "bump_serialization_generation", "auth.user", stdout=StringIO()
+            )
+
+
+class TestSerializationStampede(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(barcode="pr0")
+        self.key = self.product.cache_key_for_serialization
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_single_flight(self):
+        calls = []
+
+        def serialize():
+            calls.append(1)
+            sleep(0.2)
+            return {"id": 1}
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    serializable.serialize_once("key", serialize, 60)
+                )
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(calls))
+        self.assertListEqual([{"id": 1}] * 5, results)
+        self.assertEqual({"id": 1}, cache.get("key").data)
+        self.assertIsNone(cache.get("key_lock"))
+
+    @override_settings(DCF_SERIALIZATION_LOCK_WAIT=0.1)
+    def test_locked_by_another_process(self):
+        cache.add(f"{self.key}_lock", 1)
+        data = self.product.get_or_create_cached_serialization()
+        self.assertEqual("pr0", data["barcode"])
+        # left to the holder of the lock
+        self.assertIsNone(cache.get(self.key))
+
+    def test_single_flight_page(self):
+        products = [self.product, Product.objects.create(barcode="pr1")]
+        calls = []
+
+        def serialize(instance):
+            calls.append(instance.pk)
+            sleep(0.2)
+            return {"barcode": instance.barcode}
+
+        results = []
+        with mock.patch.object(serializable, "_serialize_instance", serialize):
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(
+                        Product.get_or_create_cached_serializations(products)
+                    )
+                )
+                for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertCountEqual([pr.pk for pr in products], calls)
+        self.assertListEqual([[{"barcode": "pr0"}, {"barcode": "pr1"}]] * 5, results)
+        self.assertEqual({"barcode": "pr0"}, cache.get(self.key).data)
+        self.assertIsNone(cache.get(f"{self.key}_lock"))
+
+    @override_settings(DCF_SERIALIZATION_LOCK_WAIT=0.1)
+    def test_page_locked_by_another_process(self):
+        other = Product.objects.create(barcode="pr1")
+        cache.add(f"{self.key}_lock", 1)
+        data = Product.get_or_create_cached_serializations([self.product, other])
+        self.assertListEqual(["pr0", "pr1"], [item["barcode"] for item in data])
+        # left to the holder of the lock
+        self.assertIsNone(cache.get(self.key))
+        self.assertEqual(
+            "pr1", cache.get(other.cache_key_for_serialization).data["barcode"]
+        )
+        self.assertIsNone(cache.get(f"{other.cache_key_for_serialization}_lock"))
+
+    def put(self, data, expiry, delta=0.0):
+        cache.set(self.key, serializable.CachedSerialization(data, expiry, delta))
+
+    @override_settings(DCF_SERIALIZATION_EARLY_REFRESH_BETA=1.0)
+    def test_early_refresh(self):
+        self.put({"barcode": "fresh"}, time() + 3600)
+        self.assertEqual(
+            "fresh", self.product.get_or_create_cached_serialization()["barcode"]
+        )
+        self.put({"barcode": "due"}, time())
+        self.assertEqual(
+            "pr0", self.product.get_or_create_cached_serialization()["barcode"]
+        )
+        self.assertEqual("pr0", cache.get(self.key).data["barcode"])
+        self.put({"barcode": "due"}, time())
+        self.assertEqual(
+            "pr0",
+            Product.get_or_create_cached_serializations([self.product])[0]["barcode"],
+        )
+
+    @override_settings(DCF_SERIALIZATION_EARLY_REFRESH_BETA=1.0)
+    def test_early_refresh_locked(self):
+        self.put({"barcode": "due"}, time())
+        cache.add(f"{self.key}_lock", 1)
+        # served stale while another process refreshes it
+        self.assertEqual(
+            "due", self.product.get_or_create_cached_serialization()["barcode"]
+        )
+        self.assertEqual(
+            "due",
+            Product.get_or_create_cached_serializations([self.product])[0]["barcode"],
+        )
+
+    def test_no_early_refresh_by_default(self):
+        self.put({"barcode": "due"}, time())
+        self.assertEqual(
+            "due", self.product.get_or_create_cached_serialization()["barcode"]
+        )
@@ -0,0 +1,126 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django_client_framework import serializers as s
+from django_client_framework.models.abstract import serialization_dependencies
+from dcf_test_app.models import Brand, Product, Store
+
+
+class ProductWithBrandSerializer(s.ModelSerializer):
+    brand_name = s.CharField(source="brand.name", read_only=True)
+
+    class Meta:
+        model = Product
+        fields = ["id", "barcode", "brand_name"]
+
+
+class TestSerializationDependencies(TestCase):
+    def setUp(self):
+        cache.clear()
+        serialization_dependencies.clear_dependency_index()
+        self.addCleanup(serialization_dependencies.clear_dependency_index)
+        self.br1 = Brand.objects.create(name="br1")
+        self.br2 = Brand.objects.create(name="br2")
+        self.products = [
+            Product.objects.create(barcode=f"pr{i}", brand=self.br1) for i in range(3)
+        ]
+
+    def tearDown(self):
+        cache.clear()
+
+    def depend(self, model, *paths):
+        patcher = mock.patch.object(model, "serialization_dependencies", paths)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        serialization_dependencies.clear_dependency_index()
+
+    def is_cached(self, instance):
+        return cache.get(instance.cache_key_for_serialization) is not None
+
+    def test_declared(self):
+        self.depend(Product, "brand__name")
+        Product.get_or_create_cached_serializations(self.products)
+        self.br2.name = "renamed2"
+        self.br2.save()
+        self.assertTrue(all(self.is_cached(pr) for pr in self.products))
+        self.br1.name = "renamed"
+        self.br1.save()
+        self.assertFalse(any(self.is_cached(pr) for pr in self.products))
+
+    def test_inferred(self):
+        with mock.patch.object(
+            Product, "serializer_class", return_value=ProductWithBrandSerializer
+        ):
+            serialization_dependencies.clear_dependency_index()
+            index = serialization_dependencies.get_dependency_index()
+            self.assertIn(
+                (Product, "brand", frozenset(["name"]), False),
+                index.saves[Brand],
+            )
+            Product.get_or_create_cached_serializations(self.products)
+            self.assertEqual("br1", self.products[0].serialize()["brand_name"])
+            self.br1.name = "renamed"
+            self.br1.save()
+            fresh = Product.objects.get(pk=self.products[0].pk)
+            self.assertEqual("renamed", fresh.serialize()["brand_name"])
+
+    def test_update_fields(self):
+        self.depend(Store, "owner__username")
+        user = User.objects.create_user(username="owner")
+        store = Store.objects.create(name="store", owner=user)
+        store.get_or_create_cached_serialization()
+        user.save(update_fields=["last_login"])
+        self.assertTrue(self.is_cached(store))
+        user.save(update_fields=["username"])
+        self.assertFalse(self.is_cached(store))
+
+    def test_reverse_relation(self):
+        self.depend(Brand, "products__barcode")
+        self.br1.get_or_create_cached_serialization()
+        self.br2.get_or_create_cached_serialization()
+        self.products[0].brand = self.br2
+        self.products[0].save()
+        # both the previous and the new brand are invalidated
+        self.assertFalse(self.is_cached(self.br1))
+        self.assertFalse(self.is_cached(self.br2))
+
+    def test_delete(self):
+        self.depend(Product, "brand")
+        Product.get_or_create_cached_serializations(self.products)
+        self.br1.delete()
+        self.assertFalse(any(self.is_cached(pr) for pr in self.products))
+
+    def test_many_to_many(self):
+        self.depend(Store, "owner__groups__name")
+        user = User.objects.create_user(username="owner")
+        group = Group.objects.create(name="group")
+        store = Store.objects.create(name="store", owner=user)
+        other = Store.objects.create(name="other")
+        for action in [
+            lambda: user.groups.add(group),
+            lambda: group.user_set.remove(user),
+            lambda: group.user_set.add(user),
+            lambda: group.user_set.clear(),
+        ]:
+            store.get_or_create_cached_serialization()
+            other.get_or_create_cached_serialization()
+            action()
+            self.assertFalse(self.is_cached(store))
+            self.assertTrue(self.is_cached(other))
+        user.groups.add(group)
+        store.get_or_create_cached_serialization()
+        group.name = "renamed"
+        group.save()
+        self.assertFalse(self.is_cached(store))
+
+    @override_settings(DCF_SERIALIZATION_DEPENDENTS_MAX_KEYS=2)
+    def test_max_keys(self):
+        self.depend(Product, "brand__name")
+        Product.get_or_create_cached_serializations(self.products)
+        prefix = Product.get_serialization_cache_key_prefix()
+        with mock.patch.object(cache, "delete_many") as delete_many:
+            self.br1.save()
+        delete_many.assert_not_called()
+        self.assertNotEqual(prefix, Product.get_serialization_cache_key_prefix())
@@ -0,0 +1,72 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from django_client_framework import permissions as p
+from dcf_test_app.models import Brand, Product
+
+
+class TestAsyncShortcuts(TestCase):
+    def setUp(self):
+        self.br1 = Brand.objects.create(name="br1")
+        self.pr1 = Product.objects.create(barcode="pr1", brand=self.br1)
+        self.pr2 = Product.objects.create(barcode="pr2", brand=self.br1)
+        self.pr3 = Product.objects.create(barcode="pr3", brand=self.br1)
+        p.clear_permissions()
+        self.group = Group.objects.create(name="testgroup")
+        self.user = User.objects.create_user(username="testuser")
+        self.user.groups.add(self.group)
+        p.add_perms_shortcut(self.user, self.pr1, "r")
+        p.add_perms_shortcut(self.group, self.pr2, "rw")
+        p.add_perms_shortcut(p.default_groups.anyone, Brand, "r")
+        p.add_perms_shortcut(self.user, self.pr3, "w", field_name="barcode")
+        self.user = User.objects.get(pk=self.user.pk)
+
+    async def assert_agrees(
+        self, user_or_group, model_or_instance, perms, field_name=None
+    ):
+        expected = await sync_to_async(p.has_perms_shortcut)(
+            user_or_group, model_or_instance, perms, field_name
+        )
+        self.assertEqual(
+            expected,
+            await p.ahas_perms_shortcut(
+                user_or_group, model_or_instance, perms, field_name
+            ),
+        )
+
+    async def test_agrees_with_has_perms_shortcut(self):
+        anyone = await sync_to_async(lambda: p.default_groups.anyone)()
+        for principal in [self.user, self.group, anyone]:
+            for target in [Product, Brand, self.pr1, self.pr2, self.pr3, self.br1]:
+                for perms in ["r", "w", "rw", "d"]:
+                    with self.subTest(principal=principal, target=target, perms=perms):
+                        await self.assert_agrees(principal, target, perms)
+        await self.assert_agrees(self.user, self.pr3, "w", field_name="barcode")
+        await self.assert_agrees(self.user, self.pr3, "w", field_name="brand")
+
+    async def test_gather(self):
+        results = await asyncio.gather(
+            *[
+                p.ahas_perms_shortcut(self.user, product, "r")
+                for product in [self.pr1, self.pr2, self.pr3]
+            ]
+        )
+        self.assertListEqual([True, True, False], results)
+
+    async def test_superuser(self):
+        superuser = await sync_to_async(User.objects.create_superuser)(username="admin")
+        self.assertTrue(await p.ahas_perms_shortcut(superuser, self.pr3, "rwcd"))
+
+    async def test_add_and_filter(self):
+        await p.aadd_perms_shortcut(self.user, self.pr3, "r")
+        queryset = await p.afilter_queryset_by_perms_shortcut(
+            "r", self.user, Product.objects.order_by("pk")
+        )
+        pks = await sync_to_async(list)(queryset.values_list("pk", flat=True))
+        self.assertListEqual([self.pr1.pk, self.pr2.pk, self.pr3.pk], pks)
+
+    async def test_wrong_type(self):
+        with self.assertRaises(TypeError):
+            await p.ahas_perms_shortcut(self.user, "product", "r")
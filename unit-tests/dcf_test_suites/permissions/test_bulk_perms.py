@@ -0,0 +1,91 @@
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django_client_framework import permissions as p
+from django_client_framework.permissions import perm_collector
+from dcf_test_app.models import Brand, Product
+
+
+class TestBulkPerms(TestCase):
+    def setUp(self):
+        self.br1 = Brand.objects.create(name="br1")
+        self.products = [
+            Product.objects.create(barcode=f"pr{i}", brand=self.br1) for i in range(3)
+        ]
+        p.clear_permissions()
+        self.group = Group.objects.create(name="testgroup")
+        self.users = [User.objects.create_user(username=f"user{i}") for i in range(3)]
+
+    def count_statements(self, ctx, statement, table="guardian_"):
+        return len(
+            [
+                q
+                for q in ctx.captured_queries
+                if q["sql"].startswith(statement) and table in q["sql"]
+            ]
+        )
+
+    def fresh(self, user):
+        # the auth backend memoizes model permissions on user instances
+        return User.objects.get(pk=user.pk)
+
+    def test_add_perms_bulk(self):
+        with CaptureQueriesContext(connection) as ctx:
+            p.add_perms_bulk(self.users + [self.group], Product.objects.all(), "rw")
+        # one insert into each object permission table
+        self.assertEqual(2, self.count_statements(ctx, "INSERT"))
+        for user in self.users:
+            for product in self.products:
+                self.assertTrue(p.has_perms_shortcut(user, product, "rw"))
+                self.assertFalse(p.has_perms_shortcut(user, product, "d"))
+        self.assertTrue(p.has_perms_shortcut(self.group, self.products[0], "rw"))
+        self.assertFalse(p.has_perms_shortcut(self.users[0], Product, "r"))
+
+    def test_add_perms_bulk_is_idempotent(self):
+        p.add_perms_bulk(self.users, self.products, "r")
+        p.add_perms_bulk(self.users, self.products, "r")
+        self.assertTrue(p.has_perms_shortcut(self.users[0], self.products[0], "r"))
+
+    def test_model_and_field_perms(self):
+        p.add_perms_bulk(self.users, [Product, Brand], "r")
+        p.add_perms_bulk(
+            self.group, self.products[0], "w", field_names=["barcode", "brand"]
+        )
+        for user in self.users:
+            self.assertTrue(p.has_perms_shortcut(self.fresh(user), Product, "r"))
+            self.assertTrue(p.has_perms_shortcut(self.fresh(user), Brand, "r"))
+        for field_name in ["barcode", "brand"]:
+            self.assertTrue(
+                p.has_perms_shortcut(
+                    self.group, self.products[0], "w", field_name=field_name
+                )
+            )
+        self.assertFalse(p.has_perms_shortcut(self.group, self.products[0], "w"))
+
+    def test_remove_perms_bulk(self):
+        p.add_perms_bulk(self.users + [self.group], self.products, "rw")
+        p.add_perms_bulk(self.users + [self.group], Brand, "r")
+        with CaptureQueriesContext(connection) as ctx:
+            p.remove_perms_bulk(self.users[:2] + [self.group], self.products[:2], "w")
+        self.assertEqual(2, self.count_statements(ctx, "DELETE"))
+        p.remove_perms_bulk(self.users[0], Brand, "r")
+        for user in self.users[:2]:
+            for product in self.products[:2]:
+                self.assertTrue(p.has_perms_shortcut(user, product, "r"))
+                self.assertFalse(p.has_perms_shortcut(user, product, "w"))
+            self.assertTrue(p.has_perms_shortcut(user, self.products[2], "w"))
+        self.assertTrue(p.has_perms_shortcut(self.users[2], self.products[0], "w"))
+        self.assertFalse(p.has_perms_shortcut(self.group, self.products[0], "w"))
+        self.assertFalse(p.has_perms_shortcut(self.fresh(self.users[0]), Brand, "r"))
+        self.assertTrue(p.has_perms_shortcut(self.fresh(self.users[1]), Brand, "r"))
+
+    def test_collected(self):
+        with perm_collector.collect_perms() as grants:
+            p.add_perms_bulk(self.users, self.products[0], "rw")
+        self.assertEqual(6, len(grants))
+        self.assertFalse(p.has_perms_shortcut(self.users[0], self.products[0], "r"))
+
+    def test_wrong_type(self):
+        with self.assertRaises(TypeError):
+            p.add_perms_bulk(self.users, ["product"], "r")
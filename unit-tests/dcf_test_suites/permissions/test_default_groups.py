@@ -0,0 +1,59 @@
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from django_client_framework.permissions import default_groups, default_users
+from django_client_framework.permissions.default_users import DefaultUsers
+
+
+class TestDefaultGroups(TestCase):
+    def setUp(self):
+        default_groups.clear_cache()
+
+    def tearDown(self):
+        default_groups.clear_cache()
+
+    def test_committed_group_is_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            anyone = default_groups.anyone
+        with self.assertNumQueries(0):
+            self.assertEqual(anyone, default_groups.anyone)
+
+    def test_uncommitted_group_is_not_cached(self):
+        default_groups.anyone
+        with self.assertNumQueries(1):
+            default_groups.anyone
+
+    def test_deleted_group_is_forgotten(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            anyone = default_groups.anyone
+        Group.objects.filter(pk=anyone.pk).delete()
+        self.assertNotEqual(anyone.pk, default_groups.anyone.pk)
+
+    def test_unknown_group(self):
+        with self.assertRaises(AttributeError):
+            default_groups.nobody
+
+
+class TestDefaultUsers(TestCase):
+    def setUp(self):
+        DefaultUsers.usernames["robot"] = lambda user: None
+        default_users.clear_cache()
+
+    def tearDown(self):
+        DefaultUsers.usernames.pop("robot")
+        # creating a user also caches the anyone group
+        default_groups.clear_cache()
+        default_users.clear_cache()
+
+    def test_committed_user_is_cached_and_copied(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            robot = default_users.robot
+        with self.assertNumQueries(0):
+            cached = default_users.robot
+        self.assertEqual(robot, cached)
+        self.assertIsNot(cached, default_users.robot)
+
+    def test_deleted_user_is_forgotten(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            robot = default_users.robot
+        User.objects.filter(pk=robot.pk).delete()
+        self.assertNotEqual(robot.pk, default_users.robot.pk)
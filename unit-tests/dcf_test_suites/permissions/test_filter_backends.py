@@ -0,0 +1,95 @@
+from django.contrib.auth.models import Group, User
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django_client_framework import permissions as p
+from dcf_test_app.models import Brand, Product
+
+
+class TestFilterBackends(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser")
+        self.brand = Brand.objects.create(name="br1")
+        self.products = [
+            Product.objects.create(barcode=f"pr{i}", brand=self.brand) for i in range(6)
+        ]
+        p.clear_permissions()
+        self.group = Group.objects.create(name="staff")
+
+    def assertSameResult(self, perms, user_or_group, field_name=None):
+        queryset = Product.objects.all()
+        guardian = p.filter_queryset_by_perms_guardian(
+            perms, user_or_group, queryset, field_name
+        )
+        exists = p.filter_queryset_by_perms_exists(
+            perms, user_or_group, queryset, field_name
+        )
+        self.assertEqual(
+            sorted(guardian.values_list("pk", flat=True)),
+            sorted(exists.values_list("pk", flat=True)),
+        )
+        return sorted(exists.values_list("pk", flat=True))
+
+    def test_no_perms(self):
+        self.assertEqual([], self.assertSameResult("r", self.user))
+
+    def test_object_perms(self):
+        p.add_perms_shortcut(self.user, self.products[0], "rw")
+        p.add_perms_shortcut(self.user, self.products[1], "r")
+        self.assertEqual(
+            [self.products[0].pk, self.products[1].pk],
+            self.assertSameResult("r", self.user),
+        )
+        self.assertEqual([self.products[0].pk], self.assertSameResult("rw", self.user))
+
+    def test_mixed_model_and_object_perms(self):
+        p.add_perms_shortcut(self.user, Product, "r")
+        p.add_perms_shortcut(self.user, self.products[2], "w")
+        self.assertEqual([self.products[2].pk], self.assertSameResult("rw", self.user))
+
+    def test_field_perms(self):
+        p.add_perms_shortcut(self.user, self.products[3], "w", field_name="barcode")
+        self.assertEqual([], self.assertSameResult("w", self.user))
+        self.assertEqual(
+            [self.products[3].pk], self.assertSameResult("w", self.user, "barcode")
+        )
+
+    def test_group_and_anyone_perms(self):
+        self.user.groups.add(self.group)
+        p.add_perms_shortcut(self.group, self.products[4], "r")
+        p.add_perms_shortcut(p.default_groups.anyone, self.products[5], "r")
+        self.assertEqual(
+            [self.products[4].pk, self.products[5].pk],
+            self.assertSameResult("r", self.user),
+        )
+        self.assertEqual(
+            [self.products[4].pk, self.products[5].pk],
+            self.assertSameResult("r", self.group),
+        )
+
+    def test_global_perm_returns_all_rows(self):
+        p.add_perms_shortcut(p.default_groups.anyone, Product, "r")
+        queryset = Product.objects.all()
+        self.assertIs(
+            queryset, p.filter_queryset_by_perms_exists("r", self.user, queryset)
+        )
+
+    def test_backend_selection(self):
+        self.assertEqual("guardian", p.get_permission_filter_backend(Product))
+        with override_settings(DCF_PERMISSION_FILTER_BACKEND="exists"):
+            self.assertEqual("exists", p.get_permission_filter_backend(Product))
+            Product.permission_filter_backend = "guardian"
+            try:
+                self.assertEqual("guardian", p.get_permission_filter_backend(Product))
+            finally:
+                del Product.permission_filter_backend
+        with override_settings(DCF_PERMISSION_FILTER_BACKEND="nope"):
+            with self.assertRaises(ImproperlyConfigured):
+                p.get_permission_filter_backend(Product)
+
+    @override_settings(DCF_PERMISSION_FILTER_BACKEND="exists")
+    def test_collection_api_with_exists_backend(self):
+        p.add_perms_shortcut(self.user, self.products[1], "r")
+        self.client.force_login(self.user)
+        data = self.client.get("/product").json()
+        self.assertEqual(1, data["total"])
+        self.assertEqual(self.products[1].pk, data["objects"][0]["id"])
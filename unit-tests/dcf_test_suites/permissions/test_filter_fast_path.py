@@ -0,0 +1,55 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django_client_framework import permissions as p
+from dcf_test_app.models import Brand, Product
+
+
+class TestFilterFastPath(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser")
+        self.brand = Brand.objects.create(name="br1")
+        self.products = [
+            Product.objects.create(barcode=f"pr{i}", brand=self.brand) for i in range(3)
+        ]
+        p.clear_permissions()
+
+    def assertUnfiltered(self, user, perms="r", field_name=None):
+        queryset = Product.objects.all()
+        self.assertIs(
+            queryset,
+            p.filter_queryset_by_perms_shortcut(perms, user, queryset, field_name),
+        )
+
+    def assertNoGuardianJoin(self, client):
+        with CaptureQueriesContext(connection) as ctx:
+            data = client.get("/product").json()
+        self.assertEqual(3, data["total"])
+        for query in ctx.captured_queries:
+            if "dcf_test_app_product" in query["sql"]:
+                self.assertNotIn("guardian", query["sql"])
+
+    def test_superuser(self):
+        superuser = User.objects.create_superuser(username="admin")
+        self.assertUnfiltered(superuser)
+        self.client.force_login(superuser)
+        self.assertNoGuardianJoin(self.client)
+
+    def test_model_perm(self):
+        p.add_perms_shortcut(self.user, Product, "r")
+        self.assertUnfiltered(self.user)
+
+    def test_model_field_perm(self):
+        p.add_perms_shortcut(self.user, Product, "r", field_name="barcode")
+        self.assertUnfiltered(self.user, field_name="barcode")
+
+    def test_anyone_model_perm(self):
+        p.add_perms_shortcut(p.default_groups.anyone, Product, "r")
+        self.assertUnfiltered(self.user)
+        self.assertNoGuardianJoin(self.client)
+
+    def test_object_perm_still_filters(self):
+        p.add_perms_shortcut(self.user, self.products[0], "r")
+        self.client.force_login(self.user)
+        self.assertEqual(1, self.client.get("/product").json()["total"])
@@ -0,0 +1,112 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django_client_framework import permissions as p
+from django_client_framework.permissions import group_snapshot, shared_cache
+from guardian.models import GroupObjectPermission
+from dcf_test_app.models import Brand, Product, Store
+
+
+# snapshots are only loaded outside of atomic blocks
+class TestGroupSnapshot(TransactionTestCase):
+    def setUp(self):
+        p.clear_permissions()
+        self.user = User.objects.create_user(username="testuser")
+        self.br1 = Brand.objects.create(name="br1")
+        self.pr1 = Product.objects.create(barcode="pr1", brand=self.br1)
+        self.pr2 = Product.objects.create(barcode="pr2", brand=self.br1)
+        p.add_perms_shortcut(p.default_groups.anyone, Brand, "r")
+        p.add_perms_shortcut(p.default_groups.anyone, self.pr1, "r")
+        p.add_perms_shortcut(p.default_groups.logged_in, self.pr2, "w")
+
+    def tearDown(self):
+        group_snapshot.invalidate()
+
+    def test_snapshot(self):
+        snapshot = group_snapshot.get_snapshot(p.default_groups.anyone)
+        self.assertIn(
+            p.get_permission_for_model("r", Brand).pk, snapshot.model_perm_ids
+        )
+        view = p.get_permission_for_model("r", Product)
+        self.assertTrue(snapshot.has_object_perm(view, self.pr1.pk))
+        self.assertFalse(snapshot.has_object_perm(view, self.pr2.pk))
+        with self.assertRaises(TypeError):
+            snapshot.object_pks[view.pk] = frozenset()
+
+    def test_public_checks_use_no_guardian_query(self):
+        anyone = p.default_groups.anyone
+        group_snapshot.get_snapshot(anyone)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(p.has_perms_shortcut(anyone, Brand, "r"))
+            self.assertTrue(p.has_perms_shortcut(anyone, self.pr1, "r"))
+            self.assertFalse(p.has_perms_shortcut(anyone, self.pr2, "r"))
+        for query in ctx.captured_queries:
+            self.assertNotIn("guardian", query["sql"])
+            self.assertNotIn("auth_group_permissions", query["sql"])
+
+    def test_logged_in_members(self):
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(p.has_perms_shortcut(user, self.pr2, "w"))
+        user.groups.add(p.default_groups.logged_in)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(p.has_perms_shortcut(user, self.pr2, "w"))
+        user.is_active = False
+        self.assertFalse(p.has_perms_shortcut(user, self.pr2, "w"))
+
+    def test_invalidated_on_change(self):
+        anyone = p.default_groups.anyone
+        self.assertFalse(p.has_perms_shortcut(anyone, self.pr2, "r"))
+        p.add_perms_shortcut(anyone, self.pr2, "r")
+        self.assertTrue(p.has_perms_shortcut(anyone, self.pr2, "r"))
+        self.assertFalse(p.has_perms_shortcut(anyone, Product, "d"))
+        anyone.permissions.add(p.get_permission_for_model("d", Product))
+        self.assertTrue(p.has_perms_shortcut(anyone, Product, "d"))
+        p.remove_perms_bulk(anyone, self.pr2, "r")
+        self.assertFalse(p.has_perms_shortcut(anyone, self.pr2, "r"))
+
+    @override_settings(DCF_GROUP_SNAPSHOT_MAX_OBJECT_PERMS=1)
+    def test_size_cap(self):
+        p.add_perms_shortcut(p.default_groups.anyone, self.pr2, "r")
+        snapshot = group_snapshot.get_snapshot(p.default_groups.anyone)
+        self.assertIsNone(snapshot.object_pks)
+        self.assertTrue(p.has_perms_shortcut(p.default_groups.anyone, self.pr2, "r"))
+
+    @override_settings(DCF_PROCESS_CACHE_CHECK_INTERVAL=0)
+    def test_invalidated_by_another_process(self):
+        anyone = p.default_groups.anyone
+        self.assertTrue(p.has_perms_shortcut(anyone, self.pr1, "r"))
+        row = GroupObjectPermission.objects.get(group=anyone, object_pk=self.pr1.pk)
+        # another process revokes the grant, bypassing the signals of this one
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {GroupObjectPermission._meta.db_table} WHERE id = %s",
+                [row.pk],
+            )
+        self.assertTrue(p.has_perms_shortcut(anyone, self.pr1, "r"))
+        shared_cache.bump_snapshots()
+        self.assertFalse(p.has_perms_shortcut(anyone, self.pr1, "r"))
+
+    def test_kept_on_other_principals(self):
+        snapshot = group_snapshot.get_snapshot(p.default_groups.anyone)
+        p.add_perms_shortcut(self.user, self.pr2, "r")
+        p.add_perms_bulk(self.user, [self.pr1, self.pr2], "w")
+        p.remove_perms_bulk(self.user, self.pr2, "rw")
+        self.assertIs(snapshot, group_snapshot.get_snapshot(p.default_groups.anyone))
+        p.add_perms_bulk(p.default_groups.anyone, self.pr2, "r")
+        self.assertIsNot(snapshot, group_snapshot.get_snapshot(p.default_groups.anyone))
+
+    def test_invalidated_by_incremental_reset(self):
+        logged_in = p.default_groups.logged_in
+        group_snapshot.get_snapshot(logged_in)
+        store = Store.objects.create(name="s1")
+        self.assertTrue(p.has_perms_shortcut(logged_in, store, "r"))
+        self.assertEqual(
+            [store.pk],
+            [
+                st.pk
+                for st in p.filter_queryset_by_perms_shortcut(
+                    "r", logged_in, Store.objects.all()
+                )
+            ],
+        )
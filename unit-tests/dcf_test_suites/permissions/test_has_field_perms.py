@@ -0,0 +1,94 @@
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django_client_framework import permissions as p
+from dcf_test_app.models import Brand, Product
+
+
+class TestHasFieldPerms(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser")
+        self.br1 = Brand.objects.create(name="br1")
+        self.br2 = Brand.objects.create(name="br2")
+        self.product = Product.objects.create(barcode="pr1", brand=self.br1)
+        p.clear_permissions()
+        self.group = Group.objects.create(name="staff")
+        self.user.groups.add(self.group)
+
+    def assertAgreesWithHasPerms(self, user_or_group, perms):
+        fields = ["barcode", "brand"]
+        result = p.has_field_perms(user_or_group, self.product, perms, fields)
+        expected = {
+            field: p.has_perms_shortcut(user_or_group, self.product, perms, field)
+            for field in fields
+        }
+        self.assertDictEqual(expected, result)
+        return result
+
+    def test_mixed_sources(self):
+        p.add_perms_shortcut(self.user, self.product, "w", field_name="barcode")
+        p.add_perms_shortcut(self.group, self.product, "r", field_name="brand")
+        p.add_perms_shortcut(p.default_groups.anyone, self.product, "r")
+        for perms in ["r", "w", "rw"]:
+            self.assertAgreesWithHasPerms(self.user, perms)
+            self.assertAgreesWithHasPerms(self.group, perms)
+
+    def test_object_perm_covers_fields(self):
+        p.add_perms_shortcut(self.user, self.product, "w")
+        result = self.assertAgreesWithHasPerms(self.user, "w")
+        self.assertTrue(all(result.values()))
+
+    def test_query_count_does_not_grow(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            # let the permission registry remember the field permissions
+            p.has_field_perms(self.user, self.product, "w", ["barcode", "brand"])
+        with CaptureQueriesContext(connection) as few:
+            p.has_field_perms(self.user, self.product, "w", ["barcode"])
+        with CaptureQueriesContext(connection) as many:
+            p.has_field_perms(self.user, self.product, "w", ["barcode", "brand"])
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+    def test_patch_checks_every_field(self):
+        p.add_perms_shortcut(self.user, self.product, "r")
+        p.add_perms_shortcut(self.user, self.product, "w", field_name="barcode")
+        self.client.force_login(self.user)
+        resp = self.client.patch(
+            f"/product/{self.product.pk}",
+            {"barcode": "new", "brand_id": self.br2.pk},
+            content_type="application/json",
+        )
+        self.assertEqual(403, resp.status_code)
+        resp = self.client.patch(
+            f"/product/{self.product.pk}",
+            {"barcode": "new"},
+            content_type="application/json",
+        )
+        self.assertEqual(201, resp.status_code)
+        self.product.refresh_from_db()
+        self.assertEqual("new", self.product.barcode)
+
+    def test_patch_checks_related_objects(self):
+        p.add_perms_shortcut(self.user, self.product, "rw")
+        p.add_perms_shortcut(self.user, self.br1, "w", field_name="products")
+        self.client.force_login(self.user)
+        resp = self.client.patch(
+            f"/product/{self.product.pk}",
+            {"brand_id": self.br2.pk},
+            content_type="application/json",
+        )
+        self.assertEqual(404, resp.status_code)
+        p.add_perms_shortcut(self.user, self.br2, "r")
+        resp = self.client.patch(
+            f"/product/{self.product.pk}",
+            {"brand_id": self.br2.pk},
+            content_type="application/json",
+        )
+        self.assertEqual(403, resp.status_code)
+        p.add_perms_shortcut(self.user, self.br2, "w", field_name="products")
+        resp = self.client.patch(
+            f"/product/{self.product.pk}",
+            {"brand_id": self.br2.pk},
+            content_type="application/json",
+        )
+        self.assertEqual(201, resp.status_code)
@@ -0,0 +1,61 @@
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django_client_framework import permissions as p
+from dcf_test_app.models import Brand, Product
+
+
+class TestHasPermsMany(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser")
+        self.brand = Brand.objects.create(name="br1")
+        self.products = [
+            Product.objects.create(barcode=f"pr{i}", brand=self.brand) for i in range(8)
+        ]
+        p.clear_permissions()
+        self.group = Group.objects.create(name="staff")
+        self.user.groups.add(self.group)
+
+    def assertAgreesWithHasPerms(self, user_or_group, perms, field_name=None):
+        result = p.has_perms_many(user_or_group, self.products, perms, field_name)
+        expected = {
+            product.pk: p.has_perms_shortcut(user_or_group, product, perms, field_name)
+            for product in self.products
+        }
+        self.assertDictEqual(expected, result)
+        return result
+
+    def test_empty(self):
+        self.assertDictEqual({}, p.has_perms_many(self.user, [], "r"))
+
+    def test_mixed_sources(self):
+        p.add_perms_shortcut(self.user, self.products[0], "rw")
+        p.add_perms_shortcut(self.user, self.products[1], "r")
+        p.add_perms_shortcut(self.group, self.products[2], "w")
+        p.add_perms_shortcut(p.default_groups.anyone, self.products[3], "rw")
+        p.add_perms_shortcut(self.user, self.products[4], "w", field_name="barcode")
+        for perms in ["r", "w", "rw"]:
+            for field_name in [None, "barcode"]:
+                self.assertAgreesWithHasPerms(self.user, perms, field_name)
+                self.assertAgreesWithHasPerms(self.group, perms, field_name)
+
+    def test_model_perms(self):
+        p.add_perms_shortcut(self.group, Product, "r")
+        p.add_perms_shortcut(self.user, self.products[5], "w")
+        result = self.assertAgreesWithHasPerms(self.user, "rw")
+        self.assertEqual([self.products[5].pk], [pk for pk, ok in result.items() if ok])
+
+    def test_superuser(self):
+        superuser = User.objects.create_superuser(username="admin")
+        result = p.has_perms_many(superuser, self.products, "rwcd")
+        self.assertTrue(all(result.values()))
+
+    def test_query_count_does_not_grow(self):
+        p.add_perms_shortcut(self.user, self.products[0], "w")
+        p.has_perms_many(self.user, self.products[:1], "rw", "barcode")
+        with CaptureQueriesContext(connection) as few:
+            p.has_perms_many(self.user, self.products[:2], "rw", "barcode")
+        with CaptureQueriesContext(connection) as many:
+            p.has_perms_many(self.user, self.products, "rw", "barcode")
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
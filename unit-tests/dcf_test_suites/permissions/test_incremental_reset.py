@@ -0,0 +1,104 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django_client_framework import permissions as p
+from django_client_framework.models import AccessControlled
+from django_client_framework.permissions import visibility_index
+from guardian.models import GroupObjectPermission, UserObjectPermission
+from dcf_test_app.models import Brand, Store
+
+
+class TestIncrementalReset(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice")
+        self.bob = User.objects.create_user(username="bob")
+        self.store = Store.objects.create(name="store", owner=self.alice)
+        self.manager = Store.get_permissionmanager_class()()
+
+    def user_perms(self):
+        return set(
+            self.store.userobjectpermissions.values_list(
+                "user__username", "permission__codename"
+            )
+        )
+
+    def test_initial_perms(self):
+        self.assertSetEqual(
+            {
+                ("alice", "view_store"),
+                ("alice", "change_store"),
+                ("alice", "delete_store"),
+            },
+            self.user_perms(),
+        )
+        self.assertTrue(
+            GroupObjectPermission.objects.filter(
+                group=p.default_groups.logged_in, object_pk=str(self.store.pk)
+            ).exists()
+        )
+        self.assertTrue(p.has_perms_shortcut(self.alice, self.store, "rwd"))
+
+    def test_unchanged_save_writes_nothing(self):
+        rows = list(UserObjectPermission.objects.values_list("pk", flat=True))
+        self.store.name = "renamed"
+        with CaptureQueriesContext(connection) as ctx:
+            self.store.save()
+        writes = [
+            q["sql"]
+            for q in ctx.captured_queries
+            if q["sql"].startswith(("INSERT", "DELETE", "UPDATE"))
+        ]
+        self.assertEqual(1, len(writes))
+        self.assertTrue(writes[0].startswith('UPDATE "dcf_test_app_store"'))
+        self.assertListEqual(
+            rows, list(UserObjectPermission.objects.values_list("pk", flat=True))
+        )
+
+    def test_owner_change_only_writes_difference(self):
+        self.store.owner = self.bob
+        self.store.save()
+        self.assertSetEqual(
+            {("bob", "view_store"), ("bob", "change_store"), ("bob", "delete_store")},
+            self.user_perms(),
+        )
+        self.assertFalse(p.has_perms_shortcut(self.alice, self.store, "w"))
+        self.assertTrue(p.has_perms_shortcut(self.bob, self.store, "w"))
+
+    def test_extra_rows_are_removed(self):
+        p.add_perms_shortcut(self.bob, self.store, "w")
+        self.manager.reset_perms(self.store)
+        self.assertFalse(p.has_perms_shortcut(self.bob, self.store, "w"))
+
+    def test_non_incremental_reset(self):
+        class Manager(Store.PermissionManager):
+            incremental = False
+
+        p.add_perms_shortcut(self.bob, self.store, "w")
+        Manager().reset_perms(self.store)
+        self.assertFalse(p.has_perms_shortcut(self.bob, self.store, "w"))
+        self.assertTrue(p.has_perms_shortcut(self.alice, self.store, "w"))
+        self.assertTrue(issubclass(Manager, AccessControlled.PermissionManager))
+
+    @override_settings(DCF_PERMISSION_FILTER_BACKEND="index")
+    def test_grants_on_other_objects(self):
+        brand = Brand.objects.create(name="br1")
+
+        class Manager(Store.PermissionManager):
+            def add_perms(self, instance):
+                super().add_perms(instance)
+                p.add_perms_shortcut(instance.owner, brand, "r")
+
+        self.assertFalse(p.has_perms_shortcut(self.alice, brand, "r"))
+        Manager().reset_perms(self.store)
+        self.assertTrue(p.has_perms_shortcut(self.alice, brand, "r"))
+        self.assertEqual(
+            [brand.pk],
+            [
+                br.pk
+                for br in p.filter_queryset_by_perms_shortcut(
+                    "r", self.alice, Brand.objects.all()
+                )
+            ],
+        )
+        self.assertListEqual([], visibility_index.check_visibility_index([Brand]))
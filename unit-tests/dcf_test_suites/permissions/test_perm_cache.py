@@ -0,0 +1,126 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django_client_framework import permissions as p
+from django_client_framework.permissions import perm_cache
+from dcf_test_app.models import Brand, Product
+
+
+class TestPermCache(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser")
+        self.br1 = Brand.objects.create(name="br1")
+        self.pr1 = Product.objects.create(barcode="pr1", brand=self.br1)
+        p.clear_permissions()
+
+    def test_no_cache_outside_scope(self):
+        self.assertFalse(perm_cache.is_active())
+        p.has_perms_shortcut(self.user, self.pr1, "r")
+        self.assertIsNone(
+            perm_cache.get_decision(
+                perm_cache.make_key(self.user, Product, self.pr1, "r")
+            )
+        )
+
+    def test_decision_is_memoized(self):
+        with perm_cache.permission_cache_scope():
+            self.assertFalse(p.has_perms_shortcut(self.user, self.pr1, "r"))
+            self.assertFalse(p.has_perms_shortcut(self.user, self.pr1, "w"))
+            with self.assertNumQueries(0):
+                self.assertFalse(p.has_perms_shortcut(self.user, self.pr1, "rw"))
+                self.assertFalse(p.has_perms_shortcut(self.user, self.pr1, "w"))
+
+    def test_add_perms_invalidates(self):
+        with perm_cache.permission_cache_scope():
+            self.assertFalse(p.has_perms_shortcut(self.user, self.pr1, "r"))
+            p.add_perms_shortcut(self.user, self.pr1, "r")
+            self.assertTrue(p.has_perms_shortcut(self.user, self.pr1, "r"))
+
+    def test_field_and_instance_are_part_of_key(self):
+        pr2 = Product.objects.create(barcode="pr2", brand=self.br1)
+        p.add_perms_shortcut(self.user, self.pr1, "w", field_name="barcode")
+        with perm_cache.permission_cache_scope():
+            self.assertFalse(p.has_perms_shortcut(self.user, self.pr1, "w"))
+            self.assertTrue(p.has_perms_shortcut(self.user, self.pr1, "w", "barcode"))
+            self.assertFalse(p.has_perms_shortcut(self.user, pr2, "w", "barcode"))
+
+    def test_scope_closed_after_request(self):
+        self.client.force_login(self.user)
+        self.client.get("/product")
+        self.assertFalse(perm_cache.is_active())
+
+    def test_prefetch_object_perms(self):
+        products = [
+            Product.objects.create(barcode=f"pr{i}", brand=self.br1) for i in range(5)
+        ]
+        p.add_perms_shortcut(self.user, products[0], "r")
+        p.add_perms_shortcut(p.default_groups.anyone, products[1], "r")
+        p.add_perms_shortcut(self.user, products[2], "w", field_name="barcode")
+        user = User.objects.get(pk=self.user.pk)
+        expected = [
+            p.has_perms_shortcut(user, product, "r") for product in products
+        ] + [p.has_perms_shortcut(user, products[2], "w", "barcode")]
+        self.assertListEqual([True, True, False, False, False, True], expected)
+        with perm_cache.permission_cache_scope():
+            perm_cache.prefetch_object_perms(user, products)
+            with CaptureQueriesContext(connection) as ctx:
+                decisions = [
+                    p.has_perms_shortcut(user, product, "r") for product in products
+                ] + [p.has_perms_shortcut(user, products[2], "w", "barcode")]
+            self.assertListEqual(expected, decisions)
+            # only the model permission checks are left
+            for query in ctx.captured_queries:
+                self.assertNotIn("guardian", query["sql"])
+
+    def test_prefetch_is_dropped_on_change(self):
+        with perm_cache.permission_cache_scope():
+            perm_cache.prefetch_object_perms(self.user, [self.pr1])
+            self.assertIsNotNone(perm_cache.get_primed_checker(self.user, self.pr1))
+            p.add_perms_shortcut(self.user, self.pr1, "r")
+            self.assertIsNone(perm_cache.get_primed_checker(self.user, self.pr1))
+            self.assertTrue(p.has_perms_shortcut(self.user, self.pr1, "r"))
+
+    def test_no_prefetch_outside_scope(self):
+        perm_cache.prefetch_object_perms(self.user, [self.pr1])
+        self.assertIsNone(perm_cache.get_primed_checker(self.user, self.pr1))
+
+    def test_deferred_object_perms(self):
+        products = [
+            Product.objects.create(barcode=f"pr{i}", brand=self.br1) for i in range(3)
+        ]
+        p.add_perms_shortcut(self.user, products[0], "r")
+        user = User.objects.get(pk=self.user.pk)
+        with perm_cache.permission_cache_scope():
+            with self.assertNumQueries(0):
+                perm_cache.defer_object_perms(user, products)
+            self.assertTrue(p.has_perms_shortcut(user, products[0], "r"))
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertFalse(p.has_perms_shortcut(user, products[1], "r"))
+                self.assertFalse(p.has_perms_shortcut(user, products[2], "r"))
+            for query in ctx.captured_queries:
+                self.assertNotIn("guardian", query["sql"])
+
+    def test_collection_get_runs_no_query_after_page(self):
+        products = [
+            Product.objects.create(barcode=f"pr{i}", brand=self.br1) for i in range(3)
+        ]
+        for product in products:
+            p.add_perms_shortcut(self.user, product, "r")
+        self.client.force_login(self.user)
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        # the test client resets connection.queries on every request
+        with connection.execute_wrapper(record):
+            response = self.client.get("/product")
+        self.assertEqual(3, response.json()["total"])
+        page_select = max(
+            i
+            for i, sql in enumerate(statements)
+            if sql.startswith('SELECT "dcf_test_app_product"."id"')
+        )
+        self.assertListEqual([], statements[page_select + 1 :])
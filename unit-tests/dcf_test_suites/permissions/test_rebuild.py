@@ -0,0 +1,114 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth.models import Permission, User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django_client_framework import permissions as p
+from django_client_framework.permissions.rebuild import (
+    create_permissions,
+    rebuild_permissions,
+)
+from guardian.models import GroupObjectPermission, UserObjectPermission
+from dcf_test_app.models import Store
+
+
+class TestRebuildPermissions(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f"user{i}") for i in range(5)]
+        self.stores = [
+            Store.objects.create(name=f"store{i}", owner=self.users[i % 5])
+            for i in range(12)
+        ]
+        self.expected_user_rows = self.user_rows()
+        self.expected_group_rows = self.group_rows()
+        p.clear_permissions()
+
+    def user_rows(self):
+        return set(
+            UserObjectPermission.objects.values_list(
+                "user_id", "permission__codename", "object_pk"
+            )
+        )
+
+    def group_rows(self):
+        return set(
+            GroupObjectPermission.objects.values_list(
+                "group__name", "permission__codename", "object_pk"
+            )
+        )
+
+    def test_rebuild_in_chunks(self):
+        reported = []
+        rebuild_permissions(chunk_size=5, progress=reported.append)
+        self.assertSetEqual(self.expected_user_rows, self.user_rows())
+        self.assertSetEqual(self.expected_group_rows, self.group_rows())
+        self.assertListEqual([5, 10, 12], [progress.done for progress in reported])
+        self.assertEqual(self.stores[-1].pk, reported[-1].last_pk)
+        self.assertTrue(p.has_perms_shortcut(self.users[0], self.stores[0], "rwd"))
+
+    def test_resume(self):
+        rebuild_permissions(
+            chunk_size=5,
+            resume_from=("dcf_test_app.store", self.stores[5].pk),
+            progress=lambda progress: None,
+        )
+        self.assertSetEqual(
+            {row for row in self.expected_user_rows if int(row[2]) > self.stores[5].pk},
+            self.user_rows(),
+        )
+
+    def test_resume_unknown_model(self):
+        with self.assertRaises(ValueError):
+            rebuild_permissions(resume_from=("dcf_test_app.nope", 1))
+
+    def test_reset_permissions_command(self):
+        out = StringIO()
+        call_command("reset_permissions", "--chunk-size=4", stdout=out)
+        self.assertSetEqual(self.expected_user_rows, self.user_rows())
+        self.assertIn("dcf_test_app.store: 12/12 instances", out.getvalue())
+
+    @skipUnless(connection.vendor == "sqlite", "sqlite only")
+    def test_processes_on_sqlite(self):
+        with self.assertRaises(ValueError):
+            rebuild_permissions(processes=2)
+        with self.assertRaises(CommandError):
+            call_command("reset_permissions", "--processes=2", stdout=StringIO())
+
+    def test_create_permissions(self):
+        create_permissions()
+        count = Permission.objects.count()
+        create_permissions()
+        self.assertEqual(count, Permission.objects.count())
+        with CaptureQueriesContext(connection) as queries:
+            for s in "rwcd":
+                p.get_permission_for_model(s, Store)
+                p.get_permission_for_model(s, Store, field_name="owner")
+        self.assertFalse([q for q in queries.captured_queries if "INSERT" in q["sql"]])
+
+
+# the chunks are rebuilt in their own transactions
+class TestRebuildLookups(TransactionTestCase):
+    def tearDown(self):
+        p.default_groups.clear_cache()
+
+    def count_lookups(self, chunk_size):
+        with CaptureQueriesContext(connection) as queries:
+            rebuild_permissions(chunk_size=chunk_size, progress=lambda progress: None)
+        return len(
+            [
+                q
+                for q in queries.captured_queries
+                if '"auth_permission"."codename" =' in q["sql"]
+                or 'FROM "auth_group" WHERE "auth_group"."name" =' in q["sql"]
+            ]
+        )
+
+    def test_lookups_do_not_grow(self):
+        users = [User.objects.create_user(username=f"user{i}") for i in range(5)]
+        for i in range(12):
+            Store.objects.create(name=f"store{i}", owner=users[i % 5])
+        # the first chunk used to look up permissions and groups for every instance
+        self.assertEqual(self.count_lookups(2), self.count_lookups(12))
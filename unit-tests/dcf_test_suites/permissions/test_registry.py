@@ -0,0 +1,85 @@
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, TransactionTestCase, override_settings
+from django_client_framework import permissions as p
+from django_client_framework.permissions import shared_cache
+from django_client_framework.permissions.registry import permission_registry
+from dcf_test_app.models import Product
+
+
+class TestPermissionRegistry(TestCase):
+    def setUp(self):
+        permission_registry.clear()
+
+    def tearDown(self):
+        permission_registry.clear()
+
+    def test_committed_permission_served_from_memory(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            perm = p.get_permission_for_model("w", Product, field_name="barcode")
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                perm, p.get_permission_for_model("w", Product, field_name="barcode")
+            )
+            self.assertEqual(
+                "dcf_test_app.change_product__barcode",
+                p.get_permission_for_model(
+                    "w", Product, string=True, field_name="barcode"
+                ),
+            )
+
+    def test_uncommitted_permission_not_remembered(self):
+        p.get_permission_for_model("w", Product, field_name="barcode")
+        with self.assertNumQueries(1):
+            p.get_permission_for_model("w", Product, field_name="barcode")
+
+    def test_deleted_permission_is_forgotten(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            perm = p.get_permission_for_model("r", Product, field_name="brand")
+        perm.delete()
+        new_perm = p.get_permission_for_model("r", Product, field_name="brand")
+        self.assertNotEqual(perm.pk, new_perm.pk)
+        self.assertTrue(Permission.objects.filter(pk=new_perm.pk).exists())
+
+    def test_clear_permissions_clears_registry(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            perm = p.get_permission_for_model("r", Product)
+        p.clear_permissions()
+        self.assertEqual(
+            perm.codename,
+            permission_registry.get_permission(
+                ContentType.objects.get_for_model(Product), "view_product"
+            ).codename,
+        )
+        self.assertFalse(Permission.objects.filter(pk=perm.pk).exists())
+
+    @override_settings(DCF_PROCESS_CACHE_CHECK_INTERVAL=0)
+    def test_cleared_by_another_process(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            perm = p.get_permission_for_model("r", Product)
+        # another process recreates the permission, bypassing the signals of
+        # this one
+        Permission.objects.filter(pk=perm.pk).update(codename="dead")
+        new_perm = Permission.objects.create(
+            content_type=perm.content_type, codename=perm.codename
+        )
+        self.assertEqual(perm.pk, p.get_permission_for_model("r", Product).pk)
+        shared_cache.bump_registry()
+        self.assertEqual(new_perm.pk, p.get_permission_for_model("r", Product).pk)
+
+
+# the registry only preloads outside of atomic blocks
+class TestPermissionRegistryPreload(TransactionTestCase):
+    def tearDown(self):
+        permission_registry.clear()
+
+    @override_settings(DCF_PROCESS_CACHE_CHECK_INTERVAL=0)
+    def test_preload_after_own_clear(self):
+        perm = p.get_permission_for_model("r", Product)
+        p.clear_permissions()
+        Permission.objects.create(
+            content_type=perm.content_type, codename=perm.codename
+        )
+        permission_registry.preload()
+        with self.assertNumQueries(0):
+            p.get_permission_for_model("r", Product)
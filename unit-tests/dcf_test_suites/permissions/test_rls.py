@@ -0,0 +1,128 @@
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django_client_framework import permissions as p
+from django_client_framework.permissions import rls
+from dcf_test_app.models import Brand, Product
+
+
+def can_use_rls():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT rolsuper OR rolbypassrls FROM pg_roles WHERE rolname = current_user"
+        )
+        return not cursor.fetchone()[0]
+
+
+@override_settings(DCF_PERMISSION_FILTER_BACKEND="rls")
+class TestRowLevelSecurityFallback(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser")
+        self.brand = Brand.objects.create(name="br1")
+        self.products = [
+            Product.objects.create(barcode=f"pr{i}", brand=self.brand) for i in range(3)
+        ]
+        p.clear_permissions()
+
+    def test_without_principal_filters_with_exists(self):
+        p.add_perms_shortcut(self.user, self.products[1], "r")
+        self.assertFalse(rls.is_principal(self.user, Product))
+        queryset = p.filter_queryset_by_perms_shortcut(
+            "r", self.user, Product.objects.all()
+        )
+        self.assertEqual([self.products[1].pk], [pr.pk for pr in queryset])
+
+    def test_principal_only_set_for_reads(self):
+        self.client.force_login(self.user)
+        with mock.patch.object(rls, "set_principal") as set_principal:
+            self.client.post("/product", {"barcode": "pr3"})
+            self.client.patch(
+                f"/product/{self.products[0].pk}",
+                {"barcode": "renamed"},
+                content_type="application/json",
+            )
+            set_principal.assert_not_called()
+            self.client.get("/product")
+            set_principal.assert_called_once()
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "row-level security needs PostgreSQL, set DCF_TEST_POSTGRES_HOST",
+)
+@override_settings(DCF_PERMISSION_FILTER_BACKEND="rls")
+class TestRowLevelSecurity(TestCase):
+    def setUp(self):
+        if not can_use_rls():
+            self.skipTest("policies never apply to superusers and BYPASSRLS roles")
+        self.user = User.objects.create_user(username="testuser")
+        self.other = User.objects.create_user(username="other")
+        self.brand = Brand.objects.create(name="br1")
+        self.products = [
+            Product.objects.create(barcode=f"pr{i}", brand=self.brand) for i in range(4)
+        ]
+        p.clear_permissions()
+        p.default_groups.setup()
+        call_command("install_rls_policies")
+        self.addCleanup(rls.clear_principal)
+
+    def visible_barcodes(self):
+        return sorted(Product.objects.values_list("barcode", flat=True))
+
+    def test_policy_filters_rows(self):
+        p.add_perms_shortcut(self.user, self.products[0], "r")
+        p.add_perms_shortcut(p.default_groups.anyone, self.products[1], "r")
+        rls.set_principal(self.user)
+        self.assertTrue(rls.is_principal(self.user, Product))
+        self.assertEqual(["pr0", "pr1"], self.visible_barcodes())
+        rls.set_principal(self.other)
+        self.assertEqual(["pr1"], self.visible_barcodes())
+        rls.clear_principal()
+        self.assertEqual(["pr0", "pr1", "pr2", "pr3"], self.visible_barcodes())
+
+    def test_model_perm_shows_every_row(self):
+        p.add_perms_shortcut(self.user, Product, "r")
+        rls.set_principal(self.user)
+        self.assertEqual(["pr0", "pr1", "pr2", "pr3"], self.visible_barcodes())
+
+    def test_collection_api(self):
+        p.add_perms_shortcut(self.user, self.products[2], "r")
+        self.client.force_login(self.user)
+        data = self.client.get("/product").json()
+        self.assertEqual(1, data["total"])
+        self.assertEqual(self.products[2].pk, data["objects"][0]["id"])
+        self.assertFalse(rls.is_principal(self.user, Product))
+
+    def test_writes_after_install(self):
+        p.add_perms_shortcut(self.user, Product, "rw")
+        rls.set_principal(self.user)
+        product = Product.objects.create(barcode="pr4", brand=self.brand)
+        Product.objects.filter(pk=product.pk).update(barcode="renamed")
+        product.refresh_from_db()
+        self.assertEqual("renamed", product.barcode)
+        product.delete()
+        self.assertFalse(Product.objects.filter(barcode="renamed").exists())
+        rls.clear_principal()
+        self.assertEqual(["pr0", "pr1", "pr2", "pr3"], self.visible_barcodes())
+
+    def test_writes_without_principal(self):
+        Product.objects.create(barcode="pr4", brand=self.brand)
+        Product.objects.filter(barcode="pr4").update(barcode="renamed")
+        Product.objects.filter(barcode="renamed").delete()
+        self.assertEqual(["pr0", "pr1", "pr2", "pr3"], self.visible_barcodes())
+
+    def test_write_without_read_perm(self):
+        p.add_perms_shortcut(self.user, Product, "w")
+        self.client.force_login(self.user)
+        resp = self.client.patch(
+            f"/product/{self.products[0].pk}",
+            {"barcode": "renamed"},
+            content_type="application/json",
+        )
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual("renamed", Product.objects.get(pk=self.products[0].pk).barcode)
@@ -0,0 +1,130 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.db.models import F, Q
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django_client_framework import permissions as p
+from django_client_framework.permissions.rules import evaluate_predicate
+from dcf_test_app.models import Store
+
+
+class TestPermissionRules(TestCase):
+    rules = [
+        p.PermissionRule("r", Q(name__startswith="public")),
+        p.PermissionRule(
+            "rw",
+            lambda user_or_group: (
+                Q(owner=user_or_group) if isinstance(user_or_group, User) else None
+            ),
+        ),
+        p.PermissionRule("w", Q(name="signboard"), field_name="name"),
+    ]
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner")
+        self.user = User.objects.create_user(username="user")
+        self.owned = Store.objects.create(name="owned", owner=self.owner)
+        self.public = Store.objects.create(name="public store")
+        self.signboard = Store.objects.create(name="signboard")
+        self.private = Store.objects.create(name="private")
+        p.clear_permissions()
+        patcher = mock.patch.object(Store.PermissionManager, "rules", self.rules)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def visible(self, perms, user, field_name=None):
+        queryset = p.filter_queryset_by_perms_shortcut(
+            perms, user, Store.objects.all(), field_name
+        )
+        return sorted(queryset.values_list("name", flat=True))
+
+    def test_has_perms(self):
+        self.assertTrue(p.has_perms_shortcut(self.owner, self.owned, "rw"))
+        self.assertFalse(p.has_perms_shortcut(self.user, self.owned, "r"))
+        self.assertTrue(p.has_perms_shortcut(self.user, self.public, "r"))
+        self.assertFalse(p.has_perms_shortcut(self.user, self.public, "w"))
+        self.assertFalse(p.has_perms_shortcut(self.user, self.signboard, "w"))
+        self.assertTrue(p.has_perms_shortcut(self.user, self.signboard, "w", "name"))
+        self.assertFalse(p.has_perms_shortcut(self.user, Store, "r"))
+
+    def test_filter(self):
+        self.assertEqual(["owned", "public store"], self.visible("r", self.owner))
+        self.assertEqual(["public store"], self.visible("r", self.user))
+        self.assertEqual(["signboard"], self.visible("w", self.user, "name"))
+        self.assertEqual([], self.visible("rw", self.user))
+
+    def test_rules_coexist_with_rows(self):
+        p.add_perms_shortcut(self.user, self.public, "w")
+        p.add_perms_shortcut(self.user, self.private, "r")
+        self.assertEqual(["private", "public store"], self.visible("r", self.user))
+        self.assertEqual(["public store"], self.visible("rw", self.user))
+        self.assertTrue(p.has_perms_shortcut(self.user, self.public, "rw"))
+
+    def test_model_perms_skip_rules(self):
+        p.add_perms_shortcut(self.user, Store, "r")
+        queryset = Store.objects.all()
+        self.assertIs(
+            queryset, p.filter_queryset_by_perms_shortcut("r", self.user, queryset)
+        )
+
+    def test_has_perms_many(self):
+        stores = [self.owned, self.public, self.signboard, self.private]
+        for user in [self.owner, self.user]:
+            for perms in ["r", "w", "rw"]:
+                self.assertDictEqual(
+                    {
+                        store.pk: p.has_perms_shortcut(user, store, perms)
+                        for store in stores
+                    },
+                    p.has_perms_many(user, stores, perms),
+                )
+
+    def test_has_field_perms(self):
+        fields = ["name", "owner", "id"]
+        with self.captureOnCommitCallbacks(execute=True):
+            # let the permission registry remember the field permissions
+            p.has_field_perms(self.user, self.public, "rw", fields)
+        for store in [self.owned, self.public, self.signboard]:
+            for perms in ["r", "w", "rw"]:
+                self.assertDictEqual(
+                    {
+                        field: p.has_perms_shortcut(self.user, store, perms, field)
+                        for field in fields
+                    },
+                    p.has_field_perms(self.user, store, perms, fields),
+                )
+        # the predicates evaluated by the database share a single query
+        with CaptureQueriesContext(connection) as few:
+            p.has_field_perms(self.user, self.public, "r", fields[:1])
+        with CaptureQueriesContext(connection) as many:
+            p.has_field_perms(self.user, self.public, "rw", fields)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+    def test_evaluate_predicate(self):
+        self.assertTrue(evaluate_predicate(Q(owner=self.owner), self.owned))
+        self.assertTrue(evaluate_predicate(Q(owner_id=self.owner.pk), self.owned))
+        self.assertFalse(evaluate_predicate(~Q(owner=self.owner), self.owned))
+        self.assertTrue(
+            evaluate_predicate(Q(owner__isnull=True) | Q(name="x"), self.public)
+        )
+        self.assertTrue(evaluate_predicate(Q(name__in=["owned"], pk__gt=0), self.owned))
+        # cannot be evaluated in Python
+        self.assertIsNone(evaluate_predicate(Q(name__startswith="o"), self.owned))
+        self.assertIsNone(evaluate_predicate(Q(owner__username="owner"), self.owned))
+        self.assertIsNone(evaluate_predicate(Q(name=F("name")), self.owned))
+
+    def test_group_principal(self):
+        # a group and a user sharing a pk
+        pk = max(User.objects.latest("pk").pk, Group.objects.latest("pk").pk) + 1
+        owner = User.objects.create_user(username="twin", pk=pk)
+        group = Group.objects.create(name="twin", pk=pk)
+        store = Store.objects.create(name="twin store", owner=owner)
+        self.assertFalse(evaluate_predicate(Q(owner=group), store))
+        self.assertFalse(evaluate_predicate(Q(owner__in=[group]), store))
+        self.assertTrue(evaluate_predicate(Q(owner__in=[group, owner]), store))
+        self.assertTrue(p.has_perms_shortcut(owner, store, "rw"))
+        self.assertFalse(p.has_perms_shortcut(group, store, "r"))
+        self.assertEqual(["public store"], self.visible("r", group))
+        self.assertEqual(["public store", "twin store"], self.visible("r", owner))
@@ -0,0 +1,92 @@
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django_client_framework import permissions as p
+from django_client_framework.permissions import shared_cache
+from dcf_test_app.models import Brand, Product
+
+
+@override_settings(DCF_PERMISSION_CACHE="default")
+class TestSharedCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser")
+        self.br1 = Brand.objects.create(name="br1")
+        self.pr1 = Product.objects.create(barcode="pr1", brand=self.br1)
+        p.clear_permissions()
+
+    def tearDown(self):
+        cache.clear()
+
+    def fresh_user(self):
+        # the auth backend memoizes model permissions on user instances
+        return User.objects.get(pk=self.user.pk)
+
+    def test_decision_is_shared(self):
+        self.assertFalse(p.has_perms_shortcut(self.fresh_user(), self.pr1, "r"))
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertFalse(p.has_perms_shortcut(user, self.pr1, "r"))
+
+    @override_settings(DCF_PERMISSION_CACHE=None)
+    def test_disabled_by_default(self):
+        self.assertIsNone(shared_cache.get_cache())
+        p.has_perms_shortcut(self.fresh_user(), self.pr1, "r")
+        user = self.fresh_user()
+        with CaptureQueriesContext(connection) as queries:
+            p.has_perms_shortcut(user, self.pr1, "r")
+        self.assertTrue(queries.captured_queries)
+
+    def test_add_perms_bumps_model_generation(self):
+        self.assertFalse(p.has_perms_shortcut(self.fresh_user(), self.pr1, "r"))
+        p.add_perms_shortcut(self.user, self.pr1, "r")
+        self.assertTrue(p.has_perms_shortcut(self.fresh_user(), self.pr1, "r"))
+
+    def test_group_membership_bumps_principal_generation(self):
+        group = Group.objects.create(name="readers")
+        p.add_perms_shortcut(group, Product, "r")
+        self.assertFalse(p.has_perms_shortcut(self.fresh_user(), self.pr1, "r"))
+        self.user.groups.add(group)
+        self.assertTrue(p.has_perms_shortcut(self.fresh_user(), self.pr1, "r"))
+        group.user_set.remove(self.user)
+        self.assertFalse(p.has_perms_shortcut(self.fresh_user(), self.pr1, "r"))
+
+    def test_user_change_bumps_principal_generation(self):
+        p.add_perms_shortcut(self.user, self.pr1, "r")
+        self.assertTrue(p.has_perms_shortcut(self.fresh_user(), self.pr1, "r"))
+        user = self.fresh_user()
+        user.save(update_fields=["last_login"])
+        with self.assertNumQueries(0):
+            self.assertTrue(p.has_perms_shortcut(user, self.pr1, "r"))
+        user.is_active = False
+        user.save()
+        self.assertFalse(self.fresh_user().has_perm("view_product", self.pr1))
+        self.assertFalse(p.has_perms_shortcut(self.fresh_user(), self.pr1, "r"))
+
+    def test_clear_permissions_bumps_global_generation(self):
+        p.add_perms_shortcut(self.user, self.pr1, "r")
+        self.assertTrue(p.has_perms_shortcut(self.fresh_user(), self.pr1, "r"))
+        p.clear_permissions()
+        self.assertFalse(p.has_perms_shortcut(self.fresh_user(), self.pr1, "r"))
+
+    def test_generation_bumped_again_on_commit(self):
+        key = shared_cache.model_generation_key("dcf_test_app.product")
+        with self.captureOnCommitCallbacks(execute=True):
+            p.add_perms_shortcut(self.user, self.pr1, "r")
+            self.assertEqual(cache.get(key), 1)
+        self.assertEqual(cache.get(key), 2)
+
+    def test_snapshot_generation_in_keys(self):
+        key = ("auth.user", self.user.pk)
+        generations = shared_cache.get_generations("dcf_test_app.product", key)
+        shared_cache.bump_snapshots()
+        self.assertNotEqual(
+            generations, shared_cache.get_generations("dcf_test_app.product", key)
+        )
+        # the snapshots of this process follow the generation read for the key
+        self.assertEqual(
+            cache.get(shared_cache.snapshot_generation_key()),
+            shared_cache.snapshot_watch.current(),
+        )
@@ -0,0 +1,73 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django_client_framework import permissions as p
+from django_client_framework.permissions import perm_cache, tracing
+from dcf_test_app.models import Brand, Product
+
+
+class TestTracing(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser")
+        self.br1 = Brand.objects.create(name="br1")
+        self.pr1 = Product.objects.create(barcode="pr1", brand=self.br1)
+        p.clear_permissions()
+
+    def test_inactive_by_default(self):
+        self.assertFalse(tracing.is_active())
+        self.assertIsNone(tracing.get_summary())
+
+    def test_sources(self):
+        p.add_perms_shortcut(self.user, self.pr1, "r")
+        p.add_perms_shortcut(p.default_groups.anyone, Product, "w")
+        p.add_perms_shortcut(self.user, self.pr1, "d", field_name="barcode")
+        decisions = []
+
+        def receiver(decision, **kwargs):
+            decisions.append(decision)
+
+        tracing.permission_decided.connect(receiver)
+        try:
+            p.has_perms_shortcut(self.user, self.pr1, "rwdc", field_name="barcode")
+        finally:
+            tracing.permission_decided.disconnect(receiver)
+        self.assertListEqual(
+            [
+                ("r", True, "user.object"),
+                ("w", True, "anyone.model"),
+                ("d", True, "user.object.field"),
+                ("c", False, "denied"),
+            ],
+            [(d.perm, d.granted, d.source) for d in decisions],
+        )
+        decision = decisions[0]
+        self.assertEqual(("auth.user", self.user.pk), decision.principal)
+        self.assertEqual(("dcf_test_app.product", self.pr1.pk), decision[1:3])
+        self.assertEqual("barcode", decision.field_name)
+        self.assertGreater(decision.queries, 0)
+        self.assertGreater(decision.elapsed, 0)
+
+    def test_summary(self):
+        superuser = User.objects.create_superuser(username="admin")
+        with tracing.trace_permissions() as summary:
+            with perm_cache.permission_cache_scope():
+                p.has_perms_shortcut(self.user, self.pr1, "r")
+                p.has_perms_shortcut(self.user, self.pr1, "r")
+            p.has_perms_shortcut(superuser, self.pr1, "rw")
+            p.has_perms_many(self.user, [self.pr1], "rw")
+        self.assertEqual(6, summary.decisions)
+        self.assertEqual(2, summary.granted)
+        self.assertDictEqual(
+            {"denied": 1, "cache": 1, "superuser": 2, "batch": 2},
+            dict(summary.sources),
+        )
+        self.assertGreater(summary.queries, 0)
+        self.assertIn("decisions=6; granted=2;", str(summary))
+
+    def test_response_header(self):
+        p.add_perms_shortcut(self.user, self.pr1, "r")
+        self.client.force_login(self.user)
+        self.assertNotIn(tracing.TRACE_HEADER, self.client.get("/product"))
+        with override_settings(DCF_PERMISSION_TRACE=True, DEBUG=True):
+            with self.assertLogs("django_client_framework.permissions.tracing"):
+                response = self.client.get("/product")
+        self.assertIn("decisions=", response[tracing.TRACE_HEADER])
@@ -0,0 +1,114 @@
+from io import StringIO
+
+from django.contrib.auth.models import Group, User
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django_client_framework import permissions as p
+from django_client_framework.models import VisibilityEntry
+from django_client_framework.permissions import visibility_index
+from guardian import shortcuts as gs
+from dcf_test_app.models import Brand, Product, Store
+
+
+@override_settings(DCF_PERMISSION_FILTER_BACKEND="index")
+class TestVisibilityIndex(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser")
+        self.brand = Brand.objects.create(name="br1")
+        self.products = [
+            Product.objects.create(barcode=f"pr{i}", brand=self.brand) for i in range(6)
+        ]
+        p.clear_permissions()
+        self.group = Group.objects.create(name="staff")
+
+    def assertSameResult(self, perms, user_or_group, field_name=None):
+        queryset = Product.objects.all()
+        guardian = p.filter_queryset_by_perms_guardian(
+            perms, user_or_group, queryset, field_name
+        )
+        index = p.filter_queryset_by_perms_index(
+            perms, user_or_group, queryset, field_name
+        )
+        self.assertEqual(
+            sorted(guardian.values_list("pk", flat=True)),
+            sorted(index.values_list("pk", flat=True)),
+        )
+        self.assertListEqual([], visibility_index.check_visibility_index([Product]))
+        return sorted(index.values_list("pk", flat=True))
+
+    def test_entries_are_bitmasks(self):
+        p.add_perms_shortcut(self.user, self.products[0], "r")
+        p.add_perms_shortcut(self.user, self.products[0], "wd")
+        self.assertEqual(1, VisibilityEntry.objects.count())
+        self.assertEqual(1 | 2 | 8, VisibilityEntry.objects.get().perms)
+
+    def test_object_perms(self):
+        p.add_perms_shortcut(self.user, self.products[0], "rw")
+        p.add_perms_shortcut(self.user, self.products[1], "r")
+        self.assertEqual(
+            [self.products[0].pk, self.products[1].pk],
+            self.assertSameResult("r", self.user),
+        )
+        self.assertEqual([self.products[0].pk], self.assertSameResult("rw", self.user))
+
+    def test_queryset_and_field_perms(self):
+        p.add_perms_shortcut(
+            self.user, Product.objects.filter(pk__in=[self.products[2].pk]), "r"
+        )
+        p.add_perms_shortcut(self.user, self.products[3], "w", field_name="barcode")
+        self.assertEqual([self.products[2].pk], self.assertSameResult("r", self.user))
+        self.assertEqual([], self.assertSameResult("w", self.user))
+        self.assertEqual(
+            [self.products[3].pk], self.assertSameResult("w", self.user, "barcode")
+        )
+
+    def test_group_membership(self):
+        p.add_perms_shortcut(self.group, self.products[4], "r")
+        p.add_perms_shortcut(p.default_groups.anyone, self.products[5], "r")
+        self.assertEqual([self.products[5].pk], self.assertSameResult("r", self.user))
+        self.user.groups.add(self.group)
+        self.assertEqual(
+            [self.products[4].pk, self.products[5].pk],
+            self.assertSameResult("r", self.user),
+        )
+
+    def test_reset_perms(self):
+        owner = User.objects.create_user(username="owner")
+        store = Store.objects.create(name="store", owner=owner)
+        store.owner = self.user
+        store.save()
+        Store.get_permissionmanager_class()().reset_perms(store)
+        self.assertListEqual([], visibility_index.check_visibility_index([Store]))
+        visible = p.filter_queryset_by_perms_index("w", owner, Store.objects.all())
+        self.assertFalse(visible.exists())
+
+    def test_check_and_rebuild(self):
+        p.add_perms_shortcut(self.user, self.products[0], "rw")
+        gs.remove_perm(
+            p.get_permission_for_model("w", Product), self.user, self.products[0]
+        )
+        mismatches = visibility_index.check_visibility_index([Product])
+        self.assertEqual(1, len(mismatches))
+        self.assertEqual((1, 3), (mismatches[0].expected, mismatches[0].actual))
+        with self.assertRaises(CommandError):
+            call_command(
+                "rebuild_visibility_index",
+                "dcf_test_app.product",
+                "--check",
+                stdout=StringIO(),
+            )
+        call_command("rebuild_visibility_index", stdout=StringIO())
+        self.assertListEqual([], visibility_index.check_visibility_index([Product]))
+        self.assertEqual([], self.assertSameResult("w", self.user))
+
+    def test_collection_api(self):
+        p.add_perms_shortcut(self.user, self.products[1], "r")
+        self.client.force_login(self.user)
+        data = self.client.get("/product").json()
+        self.assertEqual(1, data["total"])
+        self.assertEqual(self.products[1].pk, data["objects"][0]["id"])
+
+    @override_settings(DCF_PERMISSION_FILTER_BACKEND="guardian")
+    def test_not_maintained_for_other_backends(self):
+        p.add_perms_shortcut(self.user, self.products[0], "r")
+        self.assertFalse(VisibilityEntry.objects.exists())